@@ -0,0 +1,85 @@
+"""
+Micro-benchmark for DocstringProcessor.revert_stubber_mods
+
+Compares the per-line cost of the original implementation (one `re.sub` per rule per line)
+with the compiled RevertEngine, using all docstrings from docs/stubs.
+
+usage: python benchmarks/bench_revert_stubber_mods.py [--repeat 5]
+"""
+
+import argparse
+import ast
+import re
+import sys
+import timeit
+from pathlib import Path
+from typing import List
+
+DOCS_PATH = Path(__file__).parent.parent / "docs"
+sys.path.insert(0, str(DOCS_PATH))
+
+from stub_docs import RevertEngine  # noqa: E402
+from stub_docs.revert_rules import default_rules  # noqa: E402
+
+# the replacement rules, as (pattern, replacement) as in the original implementation
+REVERTS = [(rule.pattern, rule.replace) for rule in default_rules() if not rule.remove]
+
+
+def collect_docstrings(stub_path: Path) -> List[List[str]]:
+    """All module, class and function docstrings from the stubs, as lists of lines"""
+    docstrings = []
+    for stub in sorted(stub_path.rglob("*.pyi")):
+        tree = ast.parse(stub.read_text(encoding="utf-8"))
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                if doc := ast.get_docstring(node, clean=True):
+                    docstrings.append(doc.splitlines())
+    return docstrings
+
+
+def legacy_revert(lines: List[str], reverts=REVERTS):
+    """The implementation before the RevertEngine was introduced"""
+    for i, l in enumerate(lines):
+        for old, new in reverts:
+            lines[i] = re.sub(old, new, lines[i])
+
+
+def compiled_revert(lines: List[str], engine=RevertEngine(REVERTS)):
+    engine.apply(lines)
+
+
+def run(docstrings: List[List[str]], func, repeat: int) -> float:
+    """best time for a single run over all docstrings, in seconds"""
+
+    def once():
+        for doc in docstrings:
+            func(doc.copy())
+
+    return min(timeit.repeat(once, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docstrings = collect_docstrings(DOCS_PATH / "stubs")
+    n_lines = sum(len(doc) for doc in docstrings)
+
+    # both implementations must produce the same result
+    for doc in docstrings:
+        legacy, compiled = doc.copy(), doc.copy()
+        legacy_revert(legacy)
+        compiled_revert(compiled)
+        assert legacy == compiled, doc
+
+    print(f"{len(docstrings)} docstrings, {n_lines} lines")
+    before = run(docstrings, legacy_revert, args.repeat)
+    after = run(docstrings, compiled_revert, args.repeat)
+    print(f"before : {before * 1e9 / n_lines:8.1f} ns/line  ({before * 1e3:.2f} ms)")
+    print(f"after  : {after * 1e9 / n_lines:8.1f} ns/line  ({after * 1e3:.2f} ms)")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Synthetic stub corpora for the benchmarks, at a multiple of the size of docs/stubs.
+
+At scale n the corpus has n copies of each stub package, the first under its own name, the others as `{name}_{i}`.
+The corpus also has a micropython-lib style folder with the same modules, to copy with the ModuleCollector:
+single file packages as `foo/foo.py`, and the other packages with a manifest.py.
+"""
+
+import ast
+import shutil
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+DOCS_PATH = Path(__file__).parent.parent / "docs"
+STUB_PATH = DOCS_PATH / "stubs"
+sys.path.insert(0, str(DOCS_PATH))
+
+from bench_revert_stubber_mods import collect_docstrings  # noqa: E402
+from stub_docs import ModuleOrigin  # noqa: E402
+
+SCALES = (1, 10, 100)
+
+
+def package_name(name: str, copy: int) -> str:
+    return name if copy == 0 else f"{name}_{copy}"
+
+
+@dataclass
+class Corpus:
+    scale: int
+    root: Path
+    stub_path: Path
+    lib_path: Path
+    # (qualified module name, docstring lines) of all modules
+    module_docstrings: List[Tuple[str, List[str]]] = field(default_factory=list)
+    # the docstrings of all modules, classes and functions
+    docstrings: List[List[str]] = field(default_factory=list)
+    # a micropython-lib origin for every third top-level module, to add the notes
+    origins: Dict[str, ModuleOrigin] = field(default_factory=dict)
+
+    @property
+    def n_lines(self) -> int:
+        return sum(len(doc) for doc in self.docstrings)
+
+
+def module_docstrings(stub_path: Path) -> List[Tuple[str, List[str]]]:
+    """The module docstrings of the stubs, by module name, in the form of autodoc-process-docstring"""
+    docstrings = []
+    for stub in sorted(stub_path.rglob("*.pyi")):
+        parts = stub.relative_to(stub_path).with_suffix("").parts
+        name = ".".join(parts[:-1] if parts[-1] == "__init__" else parts)
+        doc = ast.get_docstring(ast.parse(stub.read_text(encoding="utf-8")), clean=True)
+        docstrings.append((name, (doc or "").splitlines() + [""]))
+    return docstrings
+
+
+def write_lib(package: Path, dest: Path, name: str):
+    """The stub package in the form of a micropython-lib package"""
+    files = sorted(package.rglob("*.pyi"))
+    folder = dest / name
+    folder.mkdir(parents=True, exist_ok=True)
+    if len(files) == 1:
+        shutil.copyfile(files[0], folder / f"{name}.py")
+        return
+    (folder / "manifest.py").write_text(
+        f'metadata(version="1.0.0", description="{name} for MicroPython")\npackage("{name}")\n', encoding="utf-8"
+    )
+    for file in files:
+        target = folder / name / file.relative_to(package).with_suffix(".py")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(file, target)
+
+
+def make_corpus(scale: int, root: Path, stub_path: Path = STUB_PATH) -> Corpus:
+    """Create a corpus of `scale` copies of the stub packages in root"""
+    corpus = Corpus(scale, root, root / "stubs", root / "lib")
+    sources = sorted(p for p in stub_path.iterdir() if p.is_dir())
+    for copy in range(scale):
+        for package in sources:
+            name = package_name(package.name, copy)
+            shutil.copytree(package, corpus.stub_path / name, dirs_exist_ok=True)
+            write_lib(package, corpus.lib_path, name)
+    # the docstrings are the same in every copy, only parse them once
+    base_docstrings = collect_docstrings(stub_path)
+    base_modules = module_docstrings(stub_path)
+    for copy in range(scale):
+        corpus.docstrings.extend(base_docstrings)
+        for name, lines in base_modules:
+            top, _, rest = name.partition(".")
+            corpus.module_docstrings.append((".".join(filter(None, [package_name(top, copy), rest])), lines))
+    for name in [name for name, _ in corpus.module_docstrings if "." not in name][::3]:
+        corpus.origins[name] = ModuleOrigin(
+            corpus.lib_path / name / f"{name}.py",
+            corpus.stub_path / name / "__init__.pyi",
+            category="python-stdlib",
+            repo=f"https://github.com/micropython/micropython-lib/tree/master/python-stdlib/{name}",
+            version="1.0.0",
+            license="MIT",
+            description=f"{name} for MicroPython",
+        )
+    return corpus
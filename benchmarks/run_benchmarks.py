@@ -0,0 +1,194 @@
+"""
+Run the benchmarks of the docs build pipeline, and compare the results with a baseline.
+
+The benchmarks are defined in suite.py, and run at 1x, 10x and 100x the size of docs/stubs, see corpus.py.
+The best time of the samples is compared with the baseline, and a benchmark that is more than
+`--threshold` times slower fails the run, so that the regression gate can run in CI.
+
+usage:
+    python benchmarks/run_benchmarks.py                       # run all, compare with benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py -k revert --scale 1   # only the matching benchmarks, at 1x
+    python benchmarks/run_benchmarks.py --save-baseline       # store the results as the new baseline
+    python benchmarks/run_benchmarks.py --output results.json --threshold 1.5
+
+Timings are only comparable on the same machine, rebase the baseline when the machine changes.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from corpus import SCALES, Corpus, make_corpus  # noqa: E402
+from suite import BENCHMARKS, Benchmark  # noqa: E402
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+VERSION = 1
+# a sample of a repeatable benchmark runs the function at least this long, to even out the timer resolution
+MIN_SAMPLE_TIME = 0.2
+DEFAULT_THRESHOLD = 1.5
+
+
+def machine_info() -> Dict[str, str]:
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def result_name(name: str, scale: Optional[int]) -> str:
+    return name if scale is None else f"{name}[{scale}x]"
+
+
+def time_benchmark(bench: Benchmark, corpus: Optional[Corpus], tmp: Path, repeat: int) -> Dict[str, float]:
+    """The best and median seconds for a single run of a benchmark, over a number of samples"""
+    repeat = bench.repeat or repeat
+    times = []
+    if bench.cold:
+        # a fresh setup for every sample, one run each
+        for _ in range(repeat):
+            run, items = bench.setup(corpus, tmp)
+            times.append(timeit.Timer(run).timeit(number=1))
+        number = 1
+    else:
+        run, items = bench.setup(corpus, tmp)
+        # warm up, and find how many runs take MIN_SAMPLE_TIME
+        run()
+        started = time.perf_counter()
+        run()
+        number = max(1, int(MIN_SAMPLE_TIME / max(time.perf_counter() - started, 1e-9)))
+        timer = timeit.Timer(run)
+        times = [timer.timeit(number=number) / number for _ in range(repeat)]
+    gc.collect()
+    return {
+        "seconds": min(times),
+        "median": statistics.median(times),
+        "samples": len(times),
+        "number": number,
+        "items": items,
+        "unit": bench.unit,
+    }
+
+
+def run_benchmarks(selected: List[Benchmark], scales: Tuple[int, ...], repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="stub_docs_bench_") as tmp_dir:
+        tmp = Path(tmp_dir)
+        for bench in [b for b in selected if not b.scales]:
+            results[bench.name] = report(bench.name, time_benchmark(bench, None, tmp / bench.name, repeat))
+        for scale in scales:
+            benches = [b for b in selected if scale in b.scales]
+            if not benches:
+                continue
+            started = time.perf_counter()
+            corpus = make_corpus(scale, tmp / f"{scale}x")
+            print(f"corpus {scale}x: {corpus.n_lines} docstring lines, {time.perf_counter() - started:.1f} s to create")
+            for bench in benches:
+                name = result_name(bench.name, scale)
+                results[name] = report(name, time_benchmark(bench, corpus, tmp / f"{scale}x-{bench.name}", repeat))
+    return results
+
+
+def report(name: str, result: Dict[str, float]) -> Dict[str, float]:
+    unit = result["unit"].split()[-1].rstrip("s")
+    print(
+        f"  {name:<40} {result['seconds'] * 1e3:10.2f} ms  {result['seconds'] / result['items'] * 1e6:10.2f} us/{unit}"
+        f"  (median {result['median'] * 1e3:.2f} ms, {result['samples']}x{result['number']})"
+    )
+    return result
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float
+) -> List[Tuple[str, float, float, float]]:
+    """The benchmarks that are more than threshold times slower than the baseline: (name, baseline, now, ratio)"""
+    regressions = []
+    for name, result in results.items():
+        if (base := baseline.get(name)) is None or not base["seconds"]:
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        if ratio > threshold:
+            regressions.append((name, base["seconds"], result["seconds"], ratio))
+    return regressions
+
+
+def read_results(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if data.get("version") == VERSION else {}
+
+
+def write_results(path: Path, results: Dict[str, Dict[str, float]], merge: bool = False):
+    """Write the results, with the machine they ran on. With merge, the other results in the file are kept"""
+    previous = read_results(path).get("results", {}) if merge else {}
+    data = {
+        "version": VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_info(),
+        "results": {**previous, **results},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", default="", help="only the benchmarks whose name matches this regex")
+    parser.add_argument("--scale", type=int, nargs="+", default=list(SCALES), choices=SCALES)
+    parser.add_argument("--repeat", type=int, default=5, help="the number of samples")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results in the baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD, help="fail on benchmarks this many times slower"
+    )
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    args = parser.parse_args(argv)
+
+    selected = [bench for name, bench in BENCHMARKS.items() if re.search(args.pattern, name)]
+    if args.list:
+        for bench in selected:
+            scales = ", ".join(f"{scale}x" for scale in bench.scales) or "reduced tree"
+            print(f"{bench.name:<32} {scales}{', cold' if bench.cold else ''}")
+        return 0
+
+    results = run_benchmarks(selected, tuple(args.scale), args.repeat)
+    if args.output:
+        write_results(args.output, results)
+    if args.save_baseline:
+        write_results(args.baseline, results, merge=True)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    baseline = read_results(args.baseline)
+    if not baseline:
+        print(f"no baseline in {args.baseline}, save one with --save-baseline")
+        return 0
+    if baseline["machine"] != machine_info():
+        print(f"the baseline is from another machine, {baseline['machine']['platform']}")
+    regressions = compare(results, baseline["results"], args.threshold)
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION {name}: {before * 1e3:.2f} ms -> {after * 1e3:.2f} ms, {ratio:.2f}x slower")
+    if regressions:
+        return 1
+    print(f"no regressions beyond {args.threshold:.2f}x the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+The benchmarks of the docs build pipeline, run them with run_benchmarks.py.
+
+Each benchmark is a setup function, named `time_<benchmark>` as in asv, that gets a synthetic corpus and a scratch folder,
+and returns the function to time and the number of items it processes.
+The setup is not timed. It runs once per benchmark, or before every sample for a `cold` benchmark,
+that changes its input or must start from scratch.
+"""
+
+import ast
+import difflib
+import shutil
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from corpus import DOCS_PATH, SCALES, STUB_PATH, Corpus
+
+sys.path.insert(0, str(DOCS_PATH.parent / "tests"))
+
+from diff_filters import filter_diff  # noqa: E402
+from stub_docs import DocstringProcessor, ModuleCollector, ModuleOrigin, generate_library_index  # noqa: E402
+
+Run = Callable[[], Any]
+Setup = Callable[[Optional[Corpus], Path], Tuple[Run, int]]
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Setup
+    # the corpus scales to run at, none for a benchmark that does not use a corpus
+    scales: Tuple[int, ...] = SCALES
+    cold: bool = False
+    # the number of samples, instead of the --repeat of the runner
+    repeat: Optional[int] = None
+    # what the items are, for the time per item
+    unit: str = "items"
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(scales: Tuple[int, ...] = SCALES, cold: bool = False, repeat: Optional[int] = None, unit: str = "items"):
+    def register(setup: Setup) -> Setup:
+        name = setup.__name__.removeprefix("time_")
+        BENCHMARKS[name] = Benchmark(name, setup, scales, cold, repeat, unit)
+        return setup
+
+    return register
+
+
+################################################################################################################
+# stub_docs
+################################################################################################################
+
+
+@benchmark(cold=True, unit="files")
+def time_copy_modules(corpus: Corpus, tmp: Path):
+    """Copy the micropython-lib style folder to an empty folder"""
+    dest = tmp / "copy_modules"
+    shutil.rmtree(dest, ignore_errors=True)
+    collector = ModuleCollector(dest)
+    n_files = sum(1 for _ in corpus.lib_path.rglob("*.py")) - sum(1 for _ in corpus.lib_path.rglob("manifest.py"))
+    return lambda: collector.copy_modules(corpus.lib_path, dest), n_files
+
+
+@benchmark(unit="files")
+def time_copy_modules_unchanged(corpus: Corpus, tmp: Path):
+    """Copy the micropython-lib style folder again, when none of the modules changed"""
+    dest = tmp / "copy_modules_unchanged"
+    collector = ModuleCollector(dest)
+    collector.copy_modules(corpus.lib_path, dest)
+    n_files = sum(1 for _ in dest.rglob("*.py"))
+    return lambda: collector.copy_modules(corpus.lib_path, dest), n_files
+
+
+@benchmark(unit="packages")
+def time_packages_from(corpus: Corpus, tmp: Path):
+    collector = ModuleCollector(tmp)
+    return lambda: collector.packages_from(corpus.stub_path), len(collector.packages_from(corpus.stub_path))
+
+
+@benchmark(unit="lines")
+def time_revert_stubber_mods(corpus: Corpus, tmp: Path):
+    processor = DocstringProcessor()
+
+    def run():
+        for doc in corpus.docstrings:
+            processor.revert_stubber_mods(list(doc))
+
+    return run, corpus.n_lines
+
+
+@benchmark(unit="modules")
+def time_process_docstring(corpus: Corpus, tmp: Path):
+    """Process the module docstrings, one autodoc-process-docstring call each, with a micropython-lib note for some"""
+    processor = DocstringProcessor(corpus.origins)
+
+    def run():
+        for name, lines in corpus.module_docstrings:
+            processor.process_docstring(None, "module", name, None, None, list(lines))
+
+    return run, len(corpus.module_docstrings)
+
+
+@benchmark(unit="modules")
+def time_generate_library_index(corpus: Corpus, tmp: Path):
+    """Render the index of all top-level modules, the index file is unchanged after the first run"""
+    modules = [
+        ModuleOrigin(corpus.lib_path / name / f"{name}.py", path.parent / "__init__.pyi", category="python-stdlib")
+        for path in sorted(corpus.stub_path.glob("*/__init__.pyi"))
+        for name in [path.parent.name]
+    ]
+    output = tmp / "library_index.rst"
+    return lambda: generate_library_index(modules, "micropython-lib", str(output)), len(modules)
+
+
+################################################################################################################
+# compare_html
+################################################################################################################
+
+
+def page_lines(stub: Path) -> Tuple[List[str], List[str]]:
+    """
+    The (web, local) lines of a synthetic page for a stub file,
+    with the kind of differences that the filters of compare_html are made for.
+    """
+    web, local = [], []
+    for node in ast.walk(ast.parse(stub.read_text(encoding="utf-8"))):
+        if isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef):
+                    args = [a.arg for a in item.args.args if a.arg != "self"]
+                    # the web pages have the class name, and fewer parameters than the stubs
+                    web.append(f"{node.name}.{item.name}({', '.join(args[:2])})")
+                    local.append(f"{item.name}({', '.join(args)})")
+                elif isinstance(item, ast.AnnAssign) and isinstance(item.target, ast.Name):
+                    # the stubs have values for the data
+                    web.append(f"{node.name}.{item.target.id}")
+                    local.append(f"{node.name}.{item.target.id}: int = 0")
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef)) and (doc := ast.get_docstring(node)):
+            lines = doc.splitlines()
+            web.extend(lines)
+            local.extend(lines)
+    return web, local
+
+
+@benchmark(unit="diff lines")
+def time_filter_diff(corpus: Corpus, tmp: Path):
+    """The compare_html filter chain, on the diff of a synthetic page per stub file"""
+    # the pages are the same in every copy of the stubs
+    diffs = [list(difflib.ndiff(*page_lines(stub))) for stub in sorted(STUB_PATH.rglob("*.pyi"))] * corpus.scale
+
+    def run():
+        for diff in diffs:
+            filter_diff(diff)
+
+    return run, sum(len(diff) for diff in diffs)
+
+
+################################################################################################################
+# sphinx-build
+################################################################################################################
+
+# a reduced tree: a few packages, and the library pages that document them
+REDUCED_PACKAGES = ("machine", "micropython", "os", "sys", "time", "vfs")
+REDUCED_PAGES = ("machine.rst", "machine.Pin.rst", "micropython.rst", "os.rst", "sys.rst", "time.rst", "vfs.rst")
+
+REDUCED_CONF = f"""
+import sys
+sys.path.insert(0, {str(DOCS_PATH)!r})
+
+project = "stub_docs benchmark"
+extensions = ["autoapi.extension", "stub_docs", "sphinx.ext.napoleon"]
+exclude_patterns = ["build"]
+default_role = "any"
+rst_epilog = ".. include:: /templates/replace.inc"
+autoapi_dirs = [f"stubs/{{name}}" for name in {REDUCED_PACKAGES!r}]
+autoapi_root = "modules"
+autoapi_keep_files = True
+autoapi_member_order = "groupwise"
+autoapi_options = ["members", "undoc-members", "private-members", "special-members", "show-inheritance", "show-module-summary"]
+autoapi_template_dir = {str(DOCS_PATH / "autoapi_templates")!r}
+stub_docs_reference_aliases = {{"_typeshed.Incomplete": ""}}
+"""
+
+REDUCED_INDEX = """
+Library
+=======
+
+.. toctree::
+   :glob:
+
+   library/*
+"""
+
+
+def reduced_tree(tmp: Path) -> Path:
+    """The source folder of a docs build with a few packages, without network access"""
+    src = tmp / "reduced"
+    if src.exists():
+        return src
+    for name in REDUCED_PACKAGES:
+        shutil.copytree(STUB_PATH / name, src / "stubs" / name)
+    for page in REDUCED_PAGES:
+        (src / "library").mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(DOCS_PATH / "library" / page, src / "library" / page)
+    shutil.copytree(DOCS_PATH / "templates", src / "templates")
+    (src / "conf.py").write_text(REDUCED_CONF, encoding="utf-8")
+    (src / "index.rst").write_text(REDUCED_INDEX, encoding="utf-8")
+    return src
+
+
+def n_stubs(src: Path) -> int:
+    return sum(1 for _ in (src / "stubs").rglob("*.pyi"))
+
+
+def sphinx_build(src: Path) -> Run:
+    command = [sys.executable, "-m", "sphinx", "-b", "html", "-q", str(src), str(src / "build")]
+    # the warnings of the stubs are not of interest here
+    return lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@benchmark(scales=(), cold=True, repeat=3, unit="stub files")
+def time_sphinx_build_clean(corpus: None, tmp: Path):
+    """A clean sphinx-build of the reduced tree"""
+    src = reduced_tree(tmp)
+    shutil.rmtree(src / "build", ignore_errors=True)
+    shutil.rmtree(src / "modules", ignore_errors=True)
+    return sphinx_build(src), n_stubs(src)
+
+
+@benchmark(scales=(), cold=True, repeat=3, unit="stub files")
+def time_sphinx_build_one_stub_changed(corpus: None, tmp: Path):
+    """An incremental sphinx-build of the reduced tree, after a docstring of one stub changed"""
+    src = reduced_tree(tmp)
+    build = sphinx_build(src)
+    if not (src / "build").exists():
+        build()
+    stub = src / "stubs" / "machine" / "Pin.pyi"
+    with open(stub, "a", encoding="utf-8") as f:
+        f.write(f'\ndef changed_{stub.stat().st_size}() -> None:\n    """Changed."""\n')
+    return build, n_stubs(src)
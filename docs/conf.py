@@ -14,7 +14,6 @@ release = "1"
 # -- General configuration ---------------------------------------------------
 # https://www.sphinx-doc.org/en/master/usage/configuration.html#general-configuration
 
-from dataclasses import dataclass
 import sys
 import os
 import sphinx.util.logging
@@ -45,6 +44,7 @@ html_context = {
 
 extensions = [
     "autoapi.extension",
+    "stub_docs",  # stub / micropython-lib docstring processing
     "sphinx.ext.intersphinx",
     "sphinx.ext.napoleon",
     "restore_section",  # Jimmo's extension
@@ -82,6 +82,8 @@ rst_epilog = """
 """
 # -----------------------------------------------------------------------------
 # Configuration for intersphinx: refer to the Python standard library.
+# The inventories are loaded from the vendored store in docs/intersphinx, when present,
+# refresh it with `python -m stub_docs.inventories refresh`, set STUB_DOCS_OFFLINE=1 to never fetch an inventory.
 intersphinx_mapping = {
     "python": ("https://docs.python.org/3.5", None),
     # "python": ("https://docs.python.org/3", None),
@@ -93,8 +95,11 @@ intersphinx_mapping = {
 
 # -----------------------------------------------------------------------------
 from pathlib import Path
-from typing import Any, List
-from sphinx.application import Sphinx
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # only for the type hints, Sphinx has loaded these by the time they are needed
+    from sphinx.application import Sphinx
 
 #  https://sphinx-autoapi.readthedocs.io/en/latest/reference/config.html#confval-autoapi_options
 autoapi_options = [
@@ -131,14 +136,7 @@ else:
 
 # -----------------------------------------------------------------------------
 # add stubs/modulename/__init__.pyi
-from stub_docs import (
-    ModuleCollector,
-    SKIP_MODULES,
-    generate_library_index,
-    DocstringProcessor,
-    PythonObject,
-    ModuleOrigin,
-)
+from stub_docs import MetadataIndex, ModuleCollector, ModuleOrigin, generate_library_index
 
 stub_path = Path(__file__).parent / "stubs"
 temp_path = Path(__file__).parent / "stubs-temp"
@@ -158,7 +156,7 @@ MPY_LIB_MAP = {
 }
 
 
-# TODO: avoid name conflicts with the stubs
+# name conflicts with the stubs are reported by the stub_docs extension, see stub_docs_skip_shadowed
 def copy_modules_from_lib(dest_path: Path, mc: ModuleCollector) -> dict[str, ModuleOrigin]:
     """
     Copy all modules from the micropython-lib folder to a destination folder.
@@ -170,24 +168,28 @@ def copy_modules_from_lib(dest_path: Path, mc: ModuleCollector) -> dict[str, Mod
     # there are a few modules in the micropython-lib that have the same name as the stubs but have a different implementation.
     # note sure what the side effects will be for the documentation and linking though ...
     # examples are : heapq
-    mpy_lib = {}
     mpy_lib_modules = {}
+    # the folders are scanned and copied concurrently
+    # copy the modules to a subfolder to avoid name conflicts with the stubs
+    # and remember which module is copied from where, to be able to reference
+    mpy_lib = mc.copy_modules_from(
+        {mpy_lib_path / folder_name: dest_path / display_name for folder_name, display_name in MPY_LIB_MAP.items()},
+        ext=".py",
+    )
     for folder_name, display_name in MPY_LIB_MAP.items():
-        # copy the modules to a subfolder to avoid name conflicts with the stubs
-        # and remember which module is copied from where, to be able to reference
-        (dest_path / display_name).mkdir(exist_ok=True, parents=True)
-        mpy_lib[folder_name] = mc.copy_modules(
-            mpy_lib_path / folder_name, dest_path / display_name, ext=".py"
-        )
-        for mod in mpy_lib[folder_name]:
+        for mod in mpy_lib[mpy_lib_path / folder_name]:
             mod.category = folder_name
             mod.repo = mod.github_url_from_path(mpy_lib_path)
             mpy_lib_modules[mod.name] = mod
 
         # Create an index.rst file for the modules in the micropython-lib
         # Disabled for now - re-use the autogenerated indexes for the micropython-lib 'compound modules'.
-        # generate_library_index(mpy_lib[folder_name], display_name, f"mpy-lib/{display_name}.rst")
+        # generate_library_index(mpy_lib[mpy_lib_path / folder_name], display_name, f"mpy-lib/{display_name}.rst")
 
+    # fill in the description, version, license ... from the manifests and the module docstrings
+    index = MetadataIndex(dest_path / MetadataIndex.FILENAME)
+    index.update(mpy_lib_modules.values())
+    index.save()
     return mpy_lib_modules
 
 
@@ -203,24 +205,10 @@ mpy_lib_modules = {}
 #     (sub_path / "__init__.py").touch()
 #     autoapi_dirs.append(sub_path)
 
-ds_pp = DocstringProcessor(mpy_lib_modules)
-
-
-# -----------------------------------------------------------------------------
-from autoapi._objects import PythonPackage
-import pathlib
-
-
-def autoapi_skip_hook(
-    app: sphinx, what: str, name: str, obj: PythonObject, skip: bool, options: dict
-):
-    """`
-    Determine whether to skip a member in the AutoAPI documentation.
-
-    Return True to skip the member, False to include it, None to defer to the default implementation.
-    """
-
-    return None
+# picked up by the stub_docs extension to add the micropython-lib notes to the docstrings
+stub_docs_mpy_lib_modules = mpy_lib_modules
+# reported when profiling the build (STUB_DOCS_PROFILE=1)
+stub_docs_copy_timings = mc.timings
 
 
 # -----------------------------------------------------------------------------
@@ -259,29 +247,11 @@ python_display_short_literal_types = True
 python_use_unqualified_type_names = True  # Experimental
 
 # -----------------------------------------------------------------------------
-# Q&D FIX For  WARNING: toctree contains reference to nonexisting document
-
-from sphinx.environment import BuildEnvironment
-from docutils.nodes import inline
-from sphinx.addnodes import pending_xref
-
-
-def on_missing_reference(
-    app: Sphinx,
-    env: BuildEnvironment,
-    node: pending_xref,
-    contnode: inline,
-):
-    """
-    Handle/suppress missing `any` references.
-    This allows us to use `any` as a type hint without sphinx complaining.
-    """
-    # https://www.sphinx-doc.org/en/master/extdev/event_callbacks.html#event-missing-reference
-    # https://github.com/sphinx-doc/sphinx/issues/2709
-    if node["reftype"] == "any":
-        return contnode
-    else:
-        return None
+# Missing references are resolved by the stub_docs extension, ahead of intersphinx.
+# Map a target to another target, or to "" to render it as text without looking it up.
+stub_docs_reference_aliases = {
+    "_typeshed.Incomplete": "",
+}
 
 
 # -- Options for HTML output ----------------------------------------------
@@ -385,10 +355,8 @@ htmlhelp_basename = "MicroPythondoc"
 # -----------------------------------------------------------------------------
 
 
-def setup(sphinx: Sphinx):
-    # several autodoc events also fire with autoapi :)
-    sphinx.connect("autodoc-process-docstring", ds_pp.process_docstring)
+def setup(sphinx: "Sphinx"):
+    # docstring processing and the autoapi hooks are connected by the stub_docs extension
     # sphinx.connect("autodoc-process-signature", process_signature) # not used
-    sphinx.connect("autoapi-skip-member", autoapi_skip_hook)
-
-    sphinx.connect("missing-reference", on_missing_reference)
+    # missing references are resolved by the stub_docs extension
+    pass
@@ -0,0 +1,50 @@
+"""
+Document the MicroPython stubs and the micropython-lib modules with Sphinx and autoapi.
+
+Add `stub_docs` to `extensions` in conf.py, after `autoapi.extension`.
+
+The names are imported from their modules on first use,
+so that importing the package, or a part of it, does not load Sphinx, autoapi or Jinja2.
+"""
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .collector import SKIP_MODULES, CopyManifest, ModuleCollector, ModuleOrigin
+    from .docstrings import DocstringProcessor, PythonObject
+    from .extension import setup
+    from .library_index import generate_library_index
+    from .metadata_index import MetadataIndex
+    from .revert_rules import RevertEngine, RevertRule, load_rules
+
+# name -> module
+_EXPORTS = {
+    "SKIP_MODULES": "collector",
+    "CopyManifest": "collector",
+    "DocstringProcessor": "docstrings",
+    "MetadataIndex": "metadata_index",
+    "ModuleCollector": "collector",
+    "ModuleOrigin": "collector",
+    "PythonObject": "docstrings",
+    "RevertEngine": "revert_rules",
+    "RevertRule": "revert_rules",
+    "generate_library_index": "library_index",
+    "load_rules": "revert_rules",
+    "setup": "extension",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # a relative import, rather than importlib.import_module, so it is included in `python -X importtime`
+    module = __import__(_EXPORTS[name], globals(), None, [name], 1)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
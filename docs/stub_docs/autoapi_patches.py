@@ -0,0 +1,48 @@
+"""
+The single place where stub_docs replaces methods of autoapi and Sphinx.
+
+autoapi has no hooks for parsing, mapping and rendering, so the parse cache, the batched docstrings,
+the changed pages and the profiler wrap private methods of `autoapi._mapper.Mapper`.
+These were written against sphinx-autoapi 3.3.3, that is pinned in docs/requirements.txt.
+A method that no longer exists is not patched, with a warning, rather than failing the build,
+and a method that is already wrapped, by an earlier build in the same process, is not wrapped again.
+"""
+
+from typing import Any, Callable
+
+import autoapi
+import autoapi._mapper
+import sphinx.util.logging
+
+log = sphinx.util.logging.getLogger(__name__)
+
+# the sphinx-autoapi version that the Mapper patches were written against
+AUTOAPI_VERSION = "3.3.3"
+
+
+def patch_method(owner: Any, name: str, wrap: Callable[[Callable], Callable], marker: str) -> bool:
+    """
+    Replace a method of a class or object with `wrap(method)`, once.
+    The marker attribute is set on the wrapper, and is copied by the wrappers that use `functools.wraps`.
+    Returns True if the method was replaced.
+    """
+    method = getattr(owner, name, None)
+    if not callable(method):
+        log.warning(
+            f"[stub_docs] {getattr(owner, '__qualname__', type(owner).__qualname__)}.{name} not found, not patched "
+            f"(sphinx-autoapi {getattr(autoapi, '__version__', '?')}, written against {AUTOAPI_VERSION})",
+            type="stub_docs",
+            subtype="autoapi_patch",
+        )
+        return False
+    if getattr(method, marker, False):
+        return False
+    wrapper = wrap(method)
+    setattr(wrapper, marker, True)
+    setattr(owner, name, wrapper)
+    return True
+
+
+def patch_mapper(name: str, wrap: Callable[[Callable], Callable], marker: str) -> bool:
+    """Replace a method of the autoapi Mapper with `wrap(method)`, once"""
+    return patch_method(autoapi._mapper.Mapper, name, wrap, marker)
@@ -0,0 +1,348 @@
+import codecs
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .manifest import MANIFEST_FILE, ManifestCache, ManifestError, ManifestGraph, PackageManifest
+
+
+class LazyLogger:
+    """The Sphinx logger, imported on first use, so the collector can be imported without Sphinx"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.logger = None
+
+    def __getattr__(self, attr: str):
+        if self.logger is None:
+            import sphinx.util.logging
+
+            self.logger = sphinx.util.logging.getLogger(self.name)
+        return getattr(self.logger, attr)
+
+
+log = LazyLogger(__name__)
+
+# the docs folder
+DOCS_PATH = Path(__file__).parent.parent
+
+SKIP_MODULES = [
+    "__pycache__",
+    "__builtins__",  # This module does not actually exists, is used by Pyright to resolve custom builtins
+]
+
+
+@dataclass
+class ModuleOrigin:
+    """Dataclass to hold the origin of a module"""
+
+    origin_path: Path
+    # the copied module file, foo/__init__.py for both modules and packages
+    path: Path
+    category: str = ""
+    author: str = ""
+    license: str = ""
+    repo: str = ""
+    url: str = ""
+    version: str = ""
+    description: str = ""
+
+    @property
+    def name(self) -> str:
+        return self.origin_path.stem
+
+    def github_url_from_path(
+        self,
+        mpy_lib_path: Path,
+        repo: str = "https://github.com/micropython/micropython-lib",
+        branch: str = "master",
+    ) -> str:
+        return f"{repo}/tree/{branch}/{self.origin_path.resolve().relative_to(mpy_lib_path.resolve()).as_posix()}"
+
+
+class CopyManifest:
+    """
+    Record of the modules copied into a destination folder.
+
+    Each entry is keyed on the destination path (relative to the folder) and holds the
+    source path, size, mtime and content hash of the module it was copied from,
+    the module name that the copy got a docstring for, and the version of that transform.
+    This allows unchanged modules to be skipped, and modules that were deleted upstream to be pruned,
+    so that autoapi and Sphinx do not see a fresh mtime on every build.
+    """
+
+    FILENAME = ".stub_docs_manifest.json"
+    # bump when copy_file changes what it writes, to copy all modules again
+    TRANSFORM_VERSION = 1
+
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+        self.entries: Dict[str, dict] = {}
+        manifest_file = folder / self.FILENAME
+        if manifest_file.exists():
+            with contextlib.suppress(ValueError, OSError):
+                self.entries = json.loads(manifest_file.read_text(encoding="utf-8"))
+
+    @staticmethod
+    def file_hash(path: Path) -> str:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+
+    def key(self, dest_path: Path) -> str:
+        return dest_path.relative_to(self.folder).as_posix()
+
+    def is_current(self, src_path: Path, dest_path: Path, mod_name: Optional[str] = None) -> bool:
+        """Check if dest_path is an up-to-date copy of src_path, made for mod_name"""
+        entry = self.entries.get(self.key(dest_path))
+        if not entry or entry["source"] != str(src_path) or not dest_path.exists():
+            return False
+        if entry.get("mod_name") != mod_name or entry.get("transform") != self.TRANSFORM_VERSION:
+            return False
+        stat = src_path.stat()
+        if entry["size"] != stat.st_size:
+            return False
+        if entry["mtime"] == stat.st_mtime_ns:
+            return True
+        # touched, but possibly not changed
+        if entry["sha256"] != self.file_hash(src_path):
+            return False
+        entry["mtime"] = stat.st_mtime_ns
+        return True
+
+    def record(self, src_path: Path, dest_path: Path, mod_name: Optional[str] = None):
+        stat = src_path.stat()
+        self.entries[self.key(dest_path)] = {
+            "source": str(src_path),
+            "mod_name": mod_name,
+            "transform": self.TRANSFORM_VERSION,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "sha256": self.file_hash(src_path),
+        }
+
+    def prune(self, keep: List[Path]) -> List[Path]:
+        """Remove the copies that are no longer present in the source folder"""
+        keep_keys = {self.key(p) for p in keep}
+        pruned = []
+        for key in [k for k in self.entries if k not in keep_keys]:
+            del self.entries[key]
+            dest_path = self.folder / key
+            dest_path.unlink(missing_ok=True)
+            with contextlib.suppress(OSError):
+                # only removes the module folder if it is empty
+                dest_path.parent.rmdir()
+            pruned.append(dest_path)
+        return pruned
+
+    def save(self):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.folder / self.FILENAME, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+
+
+class ModuleCollector:
+    """
+    Collect modules from a folder and copy them to a destination folder in a package form for autoapi
+    """
+
+    def __init__(self, temp_path: Path) -> None:
+        self.temp_path = temp_path
+        # seconds spent in copy_modules, by source folder
+        self.timings: Dict[str, float] = {}
+        # the package manifests and their requirements, by source folder
+        self.graphs: Dict[str, ManifestGraph] = {}
+
+    def copy_module_to_path(self, mod_path: Path, dest_path: Path, ext=".pyi") -> ModuleOrigin:
+        """
+        Copy a module to a folder
+
+        source form : module.py
+        destination form : module/__init__.pyi
+        """
+        mod_name = mod_path.stem
+        dest_path = dest_path / mod_name / f"__init__{ext}"
+        self.copy_file(mod_path, dest_path, mod_name)
+        return ModuleOrigin(mod_path, dest_path)
+
+    @staticmethod
+    def copy_file(src_path: Path, dest_path: Path, mod_name: Optional[str] = None):
+        """
+        Copy a file, if a mod_name is given a module docstring is added when the file does not start with one.
+
+        Only the first line is read to check for a module docstring, the rest is copied as bytes,
+        so the source is never decoded or buffered as a whole.
+        """
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(src_path, "rb") as src:
+            first_line = src.readline().removeprefix(codecs.BOM_UTF8)
+            add_docstring = mod_name is not None and not first_line.startswith(b'"""')
+            if add_docstring:
+                with open(dest_path, "wb") as dest:
+                    # Add a basic module docstring, to enable docstring pre-processing.
+                    dest.write(f'"""\n{mod_name} for MicroPython."""\n'.encode("utf-8"))
+                    dest.write(first_line)
+                    shutil.copyfileobj(src, dest)
+        if not add_docstring:
+            # copyfile uses sendfile / fcopyfile where the platform supports it
+            shutil.copyfile(src_path, dest_path)
+
+    def copy_modules(
+        self, lib_path: Path, temp_path: Path, ext=".py", only: Optional[Iterable[str]] = None
+    ) -> List[ModuleOrigin]:
+        """
+        Copy all modules from a micropython-lib folder to a destination folder
+        restructure the module to a package for autoapi
+
+        Packages with a manifest.py are copied as declared in the manifest, for other folders only
+        the module with the same name as the folder is copied.
+        With `only`, only those packages and the packages they require are copied.
+        """
+        if not lib_path.is_absolute():
+            lib_path = DOCS_PATH / lib_path
+
+        start = time.perf_counter()
+        # only (re)copy modules that changed since the previous build
+        copy_manifest = CopyManifest(temp_path)
+        manifest_cache = ManifestCache(temp_path)
+        manifest_files, lib_py = self.scan(lib_path, ext)
+        packages = []
+        for manifest_file in manifest_files:
+            try:
+                packages.append(manifest_cache.load(manifest_file))
+            except ManifestError as e:
+                log.warning(f"[stub_docs] {e}")
+                # fall back to the module with the same name as the folder
+                if (fallback := manifest_file.parent / f"{manifest_file.parent.name}{ext}").exists():
+                    lib_py.append(fallback)
+        manifest_cache.save()
+        graph = self.graphs[lib_path.name] = ManifestGraph(packages)
+        if only is not None:
+            only = list(only)
+            packages = [graph.packages[name] for name in graph.closure(only)]
+            lib_py = [p for p in lib_py if p.stem in only]
+
+        # {dest: (source, name of the module if it needs a module docstring)}
+        copies: Dict[Path, Tuple[Path, Optional[str]]] = {}
+        origins: Dict[str, ModuleOrigin] = {}
+        # copy only modules that have the same name as the parent folder
+        # .../foo/foo.py -> .../foo/__init__.py
+        # ../foo/test.py     not copied
+        for p in lib_py:
+            dest_path = temp_path / p.stem / f"__init__{ext}"
+            copies.setdefault(dest_path, (p, p.stem))
+            origins.setdefault(p.stem, ModuleOrigin(p, dest_path))
+        for package in packages:
+            for source, dest in package.files:
+                src_path = package.path.parent / source
+                dest = Path(dest)
+                if len(dest.parts) == 1:
+                    # a module: foo.py -> foo/__init__.py
+                    dest_path = temp_path / dest.stem / f"__init__{ext}"
+                    copies.setdefault(dest_path, (src_path, dest.stem))
+                    origins.setdefault(dest.stem, self.origin_from(package, src_path, dest_path))
+                else:
+                    # a file in a package: foo/bar.py
+                    dest_path = temp_path / (dest.with_suffix(ext) if dest.suffix == ".py" else dest)
+                    copies.setdefault(dest_path, (src_path, None))
+                    if dest.parts[0] not in origins:
+                        # like a module, the path of a package is its __init__ file: foo/__init__.py
+                        origins[dest.parts[0]] = self.origin_from(
+                            package, src_path.parents[len(dest.parts) - 2], temp_path / dest.parts[0] / f"__init__{ext}"
+                        )
+        # do not copy the errno module, it is a special case
+        # TODO: Need to avoid copying in modules that are already documented as part of the micropython library
+        # or at least avoid name conflicts
+        skipped = 0
+        for dest_path, (src_path, mod_name) in copies.items():
+            if copy_manifest.is_current(src_path, dest_path, mod_name):
+                skipped += 1
+                continue
+            self.copy_file(src_path, dest_path, mod_name)
+            copy_manifest.record(src_path, dest_path, mod_name)
+
+        pruned = copy_manifest.prune(list(copies))
+        copy_manifest.save()
+        self.timings[lib_path.name] = self.timings.get(lib_path.name, 0.0) + time.perf_counter() - start
+        log.info(
+            f"[stub_docs] {lib_path.name}: {len(origins)} modules, "
+            f"copied {len(copies) - skipped}, unchanged {skipped}, pruned {len(pruned)} files"
+        )
+        if graph.missing:
+            log.debug(f"[stub_docs] {lib_path.name}: requires packages from other folders: {sorted(graph.missing)}")
+        return sorted(origins.values(), key=lambda mod: mod.origin_path)
+
+    @staticmethod
+    def origin_from(package: PackageManifest, origin_path: Path, path: Path) -> ModuleOrigin:
+        """The origin of a module declared in a package manifest, with the metadata of the manifest"""
+        return ModuleOrigin(
+            origin_path,
+            path,
+            author=package.metadata.get("author", ""),
+            license=package.metadata.get("license", ""),
+            url=package.metadata.get("url", ""),
+            version=package.metadata.get("version", ""),
+            description=package.metadata.get("description", ""),
+        )
+
+    def find_modules(self, lib_path: Path, ext=".py") -> List[Path]:
+        """
+        Find the modules that have the same name as their folder: .../foo/foo.py
+        Folders with a manifest.py are not included, see `scan`.
+        Returns the modules sorted by path.
+        """
+        return self.scan(lib_path, ext)[1]
+
+    def scan(self, lib_path: Path, ext=".py") -> Tuple[List[Path], List[Path]]:
+        """
+        Find the package manifests, and the modules that have the same name as their folder: .../foo/foo.py
+        Walks the folders with os.scandir, only the names of the entries are checked, files are not stat-ed.
+        The folders below a manifest.py belong to that package, and are not walked.
+        Returns the manifests and the modules sorted by path.
+        """
+        manifests = []
+        modules = []
+        folders = [lib_path]
+        while folders:
+            folder = folders.pop()
+            try:
+                with os.scandir(folder) as scan:
+                    entries = list(scan)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            if any(entry.name == MANIFEST_FILE for entry in entries):
+                manifests.append(folder / MANIFEST_FILE)
+                continue
+            for entry in entries:
+                if entry.name == f"{folder.name}{ext}":
+                    modules.append(folder / entry.name)
+                elif (
+                    entry.is_dir(follow_symlinks=False)
+                    and entry.name not in SKIP_MODULES
+                    and not entry.name.startswith(".")
+                ):
+                    folders.append(folder / entry.name)
+        return sorted(manifests), sorted(modules)
+
+    def copy_modules_from(
+        self, lib_paths: Dict[Path, Path], ext=".py", max_workers: Optional[int] = None
+    ) -> Dict[Path, List[ModuleOrigin]]:
+        """
+        Copy the modules of several micropython-lib folders concurrently, {lib_path: temp_path}
+        Returns the modules copied from each lib_path, in the order of lib_paths.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or len(lib_paths) or 1) as pool:
+            futures = {
+                lib_path: pool.submit(self.copy_modules, lib_path, temp_path, ext)
+                for lib_path, temp_path in lib_paths.items()
+            }
+            return {lib_path: future.result() for lib_path, future in futures.items()}
+
+    def packages_from(self, stub_path: Path, skip=SKIP_MODULES):
+        """Create a list of packages from a folder to be used in autoapi_dirs"""
+        return [p for p in stub_path.glob("*") if p.stem not in skip and p.is_dir()]
@@ -0,0 +1,246 @@
+"""
+Track which stub files each document depends on, so that an incremental build only redoes the pages of the stubs that changed.
+
+The stub files of a top-level package are noted as dependencies of the documents that document it:
+the pages that autoapi generates for the package, and the pages with autoapi directives for it, such as `library/machine.rst`.
+Sphinx reads these documents again when one of the stub files is newer than the document.
+
+autoapi renders the pages of all packages again when any of the stubs changed.
+A digest of the stub files of each package, and of the templates and settings that go into the pages, is kept in the environment,
+the pages of the packages whose digest did not change are not rendered again.
+The pages that are rendered are only written when their content changed,
+so that the pages of the other packages keep their mtime, and Sphinx does not read them again.
+"""
+
+import functools
+import hashlib
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+
+import autoapi
+import autoapi._mapper
+import sphinx.util.logging
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
+
+from .autoapi_patches import patch_mapper
+
+log = sphinx.util.logging.getLogger(__name__)
+
+# the types of the autoapi settings that are part of the digest, a function has no stable repr
+SETTING_TYPES = (str, int, float, bool, list, tuple, dict, type(None))
+
+
+def package_of(dir_root: str, path: str) -> str:
+    """The top-level package of a source file that autoapi found in dir_root"""
+    first = Path(os.path.relpath(path, dir_root)).parts[0]
+    return first.split(".", 1)[0]
+
+
+def stub_packages(source_files: Iterable[Tuple[str, str]]) -> Dict[str, List[str]]:
+    """The source files of each top-level package, from the (dir_root, path) pairs that autoapi found"""
+    packages: Dict[str, List[str]] = {}
+    for dir_root, path in source_files:
+        packages.setdefault(package_of(dir_root, path), []).append(os.path.abspath(path))
+    return {package: sorted(files) for package, files in packages.items()}
+
+
+def settings_digest(app: "Sphinx") -> str:
+    """A digest of everything other than the stubs that determines the autoapi pages"""
+    h = hashlib.sha256(autoapi.__version__.encode())
+    for name in sorted(option.name for option in app.config if option.name.startswith("autoapi_")):
+        if isinstance(value := getattr(app.config, name), SETTING_TYPES):
+            h.update(repr((name, value)).encode())
+    if template_dir := app.config.autoapi_template_dir:
+        for template in sorted(Path(app.srcdir, template_dir).rglob("*")):
+            if template.is_file():
+                h.update(str(template).encode())
+                h.update(template.read_bytes())
+    if processor := getattr(app.env, "stub_docs_processor", None):
+        h.update(processor.rules_digest.encode())
+        h.update(repr(sorted(processor.mpy_lib_modules.items())).encode())
+    return h.hexdigest()
+
+
+def package_digests(packages: Dict[str, List[str]], settings: str) -> Dict[str, str]:
+    """A digest of the content of the stub files of each package, and of the settings"""
+    digests = {}
+    for package, files in packages.items():
+        h = hashlib.sha256(settings.encode())
+        for path in files:
+            h.update(path.encode())
+            try:
+                with open(path, "rb") as f:
+                    h.update(f.read())
+            except OSError:
+                h.update(b"\0missing")
+        digests[package] = h.hexdigest()
+    return digests
+
+
+def skip_render(**kwargs) -> str:
+    # autoapi does not write a page that renders empty
+    return ""
+
+
+class PageWriter:
+    """
+    Write the autoapi pages only when their content changed, so that Sphinx does not read the unchanged pages again.
+    autoapi writes every page that renders, a page that is unchanged is rendered empty instead.
+    """
+
+    def __init__(self, source_suffix: str) -> None:
+        self.source_suffix = source_suffix
+        self.written: List[str] = []
+        self.unchanged: List[str] = []
+        self.skipped: List[str] = []
+
+    def page_path(self, obj, dir_root) -> str:
+        return f"{obj.output_dir(dir_root) / obj.output_filename()}{self.source_suffix}"
+
+    def skip(self, obj):
+        """Do not render the page, the page file from the previous build is still up to date"""
+        obj.render = skip_render
+        self.skipped.append(obj.name)
+
+    def compare(self, obj, path: str):
+        """Render the page, and only let autoapi write it when it differs from the page file"""
+        render = obj.render
+
+        def render_changed(**kwargs) -> str:
+            rst = render(**kwargs)
+            if rst and same_content(path, rst.encode("utf-8")):
+                self.unchanged.append(obj.name)
+                return ""
+            if rst:
+                self.written.append(obj.name)
+            return rst
+
+        obj.render = render_changed
+
+    @staticmethod
+    def restore(objects: Iterable):
+        for obj in objects:
+            obj.__dict__.pop("render", None)
+
+
+def same_content(path: str, content: bytes) -> bool:
+    try:
+        if os.path.getsize(path) != len(content):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == content
+    except OSError:
+        return False
+
+
+def changed_pages_output(output_rst):
+    """
+    Wrap autoapi's `Mapper.output_rst` to only render the pages of the packages whose stubs changed,
+    and to only write the pages whose content changed.
+    """
+
+    @functools.wraps(output_rst)
+    def output_changed_pages(self: autoapi._mapper.Mapper, source_suffix):
+        app = self.app
+        if not app.config.stub_docs_skip_unchanged_pages:
+            return output_rst(self, source_suffix)
+        packages = stub_packages(getattr(app.env, "autoapi_source_files", []))
+        digests = package_digests(packages, settings_digest(app))
+        previous = getattr(app.env, "stub_docs_page_digests", {})
+        writer = PageWriter(source_suffix)
+        for name, obj in self.objects_to_render.items():
+            path = writer.page_path(obj, self.dir_root)
+            package = name.split(".", 1)[0]
+            if package in digests and previous.get(package) == digests[package] and os.path.exists(path):
+                writer.skip(obj)
+            else:
+                writer.compare(obj, path)
+        try:
+            output_rst(self, source_suffix)
+        finally:
+            writer.restore(self.objects_to_render.values())
+        app.env.stub_docs_page_digests = digests
+        changed = sorted(package for package, digest in digests.items() if previous.get(package) != digest)
+        log.info(
+            f"[stub_docs] autoapi pages: {len(writer.written)} written, {len(writer.unchanged)} unchanged, "
+            f"{len(writer.skipped)} not rendered, {len(changed)} of {len(digests)} packages changed"
+        )
+        if changed and len(changed) < len(digests):
+            log.verbose(f"[stub_docs]   changed packages: {', '.join(changed)}")
+        for name in writer.written:
+            log.verbose(f"[stub_docs]   written: {name}")
+
+    return output_changed_pages
+
+
+def unchanged_index_output(output_top_rst):
+    """Wrap autoapi's `Mapper._output_top_rst` to keep the mtime of the index page when its content did not change"""
+
+    @functools.wraps(output_top_rst)
+    def output_top_rst_unchanged(self: autoapi._mapper.Mapper):
+        if not self.app.config.stub_docs_skip_unchanged_pages:
+            return output_top_rst(self)
+        path = os.path.join(self.dir_root, "index.rst")
+        try:
+            with open(path, "rb") as f:
+                before = f.read()
+            stat = os.stat(path)
+        except OSError:
+            return output_top_rst(self)
+        output_top_rst(self)
+        # autoapi renders the index straight to the file
+        if same_content(path, before):
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    return output_top_rst_unchanged
+
+
+def install_changed_pages():
+    """Patch the autoapi Mapper to only render and write the pages that changed, once"""
+    patch_mapper("output_rst", changed_pages_output, "stub_docs_changed_pages")
+    patch_mapper("_output_top_rst", unchanged_index_output, "stub_docs_changed_pages")
+
+
+def documented_packages(app: "Sphinx", docname: str) -> List[str]:
+    """
+    The top-level packages that a document documents: the package of a page that autoapi generates,
+    and the packages of the autoapi directives in a document.
+    A generated page is read again when its stubs change, also when its page file did not change,
+    as the objects that it defines are resolved against the objects of the other pages of the package.
+    """
+    packages = set()
+    parts = docname.split("/")
+    if len(parts) > 2 and parts[0] == app.config.autoapi_root.strip("/"):
+        # modules/machine/Pin/index
+        packages.add(parts[1])
+    refs = getattr(app.env, "stub_docs_autoapi_refs", {}).get(docname, ())
+    packages.update(ref.split(".", 1)[0] for ref in refs)
+    return sorted(packages)
+
+
+def on_builder_inited(app: "Sphinx"):
+    """The stub files of each package, after autoapi found them"""
+    app.env.stub_docs_stub_packages = stub_packages(getattr(app.env, "autoapi_source_files", []))
+
+
+def on_source_read(app: "Sphinx", docname: str, source: List[str]):
+    """Note the stub files of the packages that a document documents as its dependencies"""
+    packages = getattr(app.env, "stub_docs_stub_packages", {})
+    for package in documented_packages(app, docname):
+        for path in packages.get(package, ()):
+            # relative to the source folder, like the dependencies that Sphinx notes itself
+            app.env.note_dependency(os.path.relpath(path, app.srcdir))
+
+
+def setup_dependencies(app: "Sphinx"):
+    # do not render the autoapi pages of the packages whose stubs, templates and settings did not change,
+    # and only write the pages whose content changed
+    app.add_config_value("stub_docs_skip_unchanged_pages", True, "", types=[bool])
+    install_changed_pages()
+    # after autoapi found the stubs
+    app.connect("builder-inited", on_builder_inited, priority=600)
+    # after the autoapi directives of the document are recorded
+    app.connect("source-read", on_source_read, priority=600)
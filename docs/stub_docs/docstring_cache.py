@@ -0,0 +1,104 @@
+"""
+Content-addressed cache of the processed module docstrings.
+
+The stub docstrings rarely change between builds, so the result of processing them is kept,
+keyed on a hash of the input lines, the revert rules and the origin of the module.
+The entries are kept in memory, and stored in a single JSON file in least to most recently used order,
+so that the next build, or a concurrent build, starts with the processed docstrings of the previous one.
+The number of entries is bounded, the least recently used entries are evicted first.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Optional
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class DocstringCache:
+    """LRU cache of processed docstring lines, with an optional on-disk store"""
+
+    VERSION = 1
+
+    def __init__(self, cache_file: Optional[Path] = None, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        self.loaded = 0
+        if cache_file:
+            self.entries.update(self.read(cache_file))
+            self.loaded = len(self.entries)
+            self.evict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getstate__(self):
+        # the entries are stored in the cache file, not in the pickled build environment
+        state = self.__dict__.copy()
+        state["entries"] = OrderedDict()
+        return state
+
+    @classmethod
+    def read(cls, cache_file: Path) -> List[List[Any]]:
+        """The [key, lines] entries in a cache file, least recently used first"""
+        with contextlib.suppress(ValueError, OSError, KeyError, TypeError):
+            data = json.loads(cache_file.read_text(encoding="utf-8"))
+            if data["version"] == cls.VERSION:
+                return data["entries"]
+        return []
+
+    @staticmethod
+    def key(lines: List[str], *context: Any) -> str:
+        """The key of the lines of a docstring, and of everything else that determines the processed lines"""
+        h = hashlib.sha256(repr(context).encode())
+        h.update("\n".join(lines).encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """A copy of the processed lines, or None"""
+        if (lines := self.entries.get(key)) is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return list(lines)
+
+    def put(self, key: str, lines: List[str]):
+        self.entries[key] = list(lines)
+        self.entries.move_to_end(key)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache holds at most max_entries"""
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def save(self):
+        """
+        Store the entries in the cache file.
+        Entries that another build stored in the meantime are kept, as less recently used than those of this build.
+        """
+        if not self.cache_file:
+            return
+        entries = OrderedDict((key, lines) for key, lines in self.read(self.cache_file) if key not in self.entries)
+        entries.update(self.entries)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temp file first, so that concurrent builds never read a partial file
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_file.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "entries": list(entries.items())}, f, separators=(",", ":"))
+            os.replace(tmp_name, self.cache_file)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_name)
@@ -0,0 +1,149 @@
+import dataclasses
+import difflib
+import hashlib
+import time
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from .collector import ModuleOrigin
+from .docstring_cache import DocstringCache
+from .revert_rules import RevertEngine, RevertRule, default_rules
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
+
+    # TODO: - make nice / explain
+    from autoapi._objects import TopLevelPythonPythonMapper as PythonObject
+
+
+def __getattr__(name: str):
+    # autoapi is only imported when PythonObject is used, not to process docstrings
+    if name == "PythonObject":
+        from autoapi._objects import TopLevelPythonPythonMapper
+
+        return TopLevelPythonPythonMapper
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+################################################################################################################
+# Docstring preprocessing
+################################################################################################################
+
+
+class DocstringProcessor:
+    # bump when the processing changes, to invalidate the cached docstrings
+    CACHE_VERSION = 1
+
+    def __init__(
+        self,
+        mpy_lib_modules: dict[str, ModuleOrigin] | None = None,
+        cache: Optional[DocstringCache] = None,
+        reverts: Optional[Sequence[RevertRule]] = None,
+    ):
+
+        # the micropython-lib modules by the qualified name they are documented under, and their origin
+        self.mpy_lib_modules = mpy_lib_modules or {}
+        # revert some of the changes that stubber does to the docstrings to improve the readability
+        self.reverts = list(default_rules() if reverts is None else reverts)
+        self.revert_engine = RevertEngine(self.reverts)
+        # the processed docstrings, keyed on their content, the rules and the module origin
+        self.cache = cache
+        self.rules_digest = hashlib.sha256(repr((self.CACHE_VERSION, self.reverts)).encode()).hexdigest()
+
+    def revert_stubber_mods(self, lines: List[str]):
+        """
+        Revert some of the changes that stubber does to the docstrings to improve the readability
+
+        - Remove line starting with "MicroPython Module" from the micropython-stubs
+          as that is pointing to this generated page
+        - reinstate the ".. note::" directive
+
+        The rules are defined in reverts.toml.
+        """
+        self.revert_engine.apply(lines)
+
+    def add_micropython_lib_note(self, lines: List[str], name: str):
+        """
+        Add a note to the docstring of a module from the micropython-lib repository.
+        The name is the qualified name of the documented module.
+        """
+        if (mod := self.mpy_lib_modules.get(name)) is None:
+            return
+        lines.extend(
+            (
+                "",
+                ".. tip::",
+                f"    This is a `{mod.category}` module from the ``micropython-lib`` repository.",
+                f"    It can be installed to a MicroPython board using::",
+                "",
+                f"        mpremote mip install {mod.name}",
+                "",
+                f"    Source: {mod.repo}",
+            )
+        )
+        if details := ", ".join(
+            f"{label} {value}" for label, value in (("Version", mod.version), ("License", mod.license)) if value
+        ):
+            lines.extend(("", f"    {details}"))
+
+    def process_docstring(
+        self,
+        app: "Sphinx",
+        what: str,  # "module", "class", "exception", "function", "method", "attribute" ( "package", 'data' with autoapi)
+        name: str,
+        obj: "PythonObject",  # Always None with autoapi
+        options: dict,  # Always None with autoapi
+        lines: List[str],
+    ):
+        """
+        Process the docstring of a module from the micropython-lib repository.
+
+        Note:
+            `lines` must  be modified in place, rather than a new value being assigned.
+            To modify the contents of the lines list in-place, you can use list methods like:
+            append(), extend(), or index assignment (lines[index] = value).
+
+        """
+        if what in {"package", "module"}:
+            self.process_module_docstring(name, lines)
+
+    def process_module_docstring(self, name: str, lines: List[str]):
+        """Process the docstring lines of a module or package, in place"""
+        origin = self.mpy_lib_modules.get(name)
+        if self.cache is not None:
+            key = self.cache.key(lines, self.rules_digest, origin and dataclasses.astuple(origin))
+            if (cached := self.cache.get(key)) is not None:
+                lines[:] = cached
+                return
+
+        if origin:
+            self.add_micropython_lib_note(lines, name)
+        self.revert_stubber_mods(lines)
+
+        if self.cache is not None:
+            self.cache.put(key, lines)
+
+    def process_docstrings(
+        self,
+        docstrings: Iterable[Tuple[str, List[str]]],
+        timed: Optional[Callable[[str, float, float], None]] = None,
+    ) -> int:
+        """
+        Process the docstrings of modules and packages in one pass, rather than one `autodoc-process-docstring` call per object.
+        The lines are modified in place.
+        `timed` is called with the name, the start time and the duration in seconds of each module, for the profiler.
+
+        Returns the number of lines that were changed, added or removed.
+        """
+        changed = 0
+        for name, lines in docstrings:
+            before = list(lines)
+            start = time.time()
+            t = time.perf_counter()
+            self.process_module_docstring(name, lines)
+            if timed:
+                timed(name, start, time.perf_counter() - t)
+            if lines != before:
+                # not the lines that only moved up or down, as lines before them were removed or added
+                opcodes = difflib.SequenceMatcher(None, before, lines, autojunk=False).get_opcodes()
+                changed += sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in opcodes if tag != "equal")
+        return changed
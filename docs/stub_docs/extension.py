@@ -0,0 +1,243 @@
+"""
+Sphinx extension that wires the stub_docs processing into a Sphinx build.
+
+All state lives on the Sphinx application or the build environment, never in this module,
+so that the extension can be used with parallel reading and writing (`sphinx-build -j auto`).
+"""
+
+import functools
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set
+
+import autoapi._mapper
+import sphinx.util.logging
+
+from . import parse_cache
+from .autoapi_patches import patch_mapper
+from .dependencies import setup_dependencies
+from .docstring_cache import DEFAULT_MAX_ENTRIES, DocstringCache
+from .docstrings import DocstringProcessor
+from .inventories import setup_inventories
+from .name_index import ModuleNameIndex
+from .profiling import current_profile, setup_profiling
+from .references import setup_references
+from .revert_rules import RevertEngine, RevertRuleError, default_rules, load_rules
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
+    from sphinx.environment import BuildEnvironment
+
+    from .docstrings import PythonObject
+
+log = sphinx.util.logging.getLogger(__name__)
+
+# .. autoapimodule:: machine
+# .. autoapiclass:: machine.Pin
+RE_AUTOAPI_DIRECTIVE = re.compile(r"^\s*\.\. autoapi\w+::\s*([\w.]+)", re.MULTILINE)
+
+
+def on_builder_inited(app: "Sphinx"):
+    """
+    Index the module names and create the docstring processor for this build.
+    This must run before autoapi parses and maps the stubs, as that is when the docstrings are processed.
+    """
+    autoapi_dirs = app.config.autoapi_dirs
+    if isinstance(autoapi_dirs, str):
+        autoapi_dirs = [autoapi_dirs]
+    names = ModuleNameIndex.build(
+        [Path(app.srcdir, folder) for folder in autoapi_dirs], app.config.stub_docs_mpy_lib_modules
+    )
+    report_name_conflicts(names)
+    if app.config.stub_docs_skip_shadowed and (shadowed := names.shadowed()):
+        # do not let autoapi parse and document the same modules twice
+        app.config.autoapi_dirs = [f for f in autoapi_dirs if Path(app.srcdir, f) not in shadowed]
+    app.env.stub_docs_names = names
+    app.env.stub_docs_processor = DocstringProcessor(names.lib_modules, docstring_cache(app), revert_rules(app))
+    if not app.config.stub_docs_batch_docstrings and not app.stub_docs_docstring_listener:
+        # process each docstring as autoapi maps it
+        app.stub_docs_docstring_listener = app.connect("autodoc-process-docstring", process_docstring)
+    if not hasattr(app.env, "stub_docs_autoapi_refs"):
+        app.env.stub_docs_autoapi_refs = {}
+
+
+def revert_rules(app: "Sphinx"):
+    """The default revert rules, extended or overridden by the rule files in `stub_docs_revert_rules`"""
+    try:
+        return load_rules(*(Path(app.srcdir, f) for f in app.config.stub_docs_revert_rules), rules=default_rules())
+    except RevertRuleError as e:
+        log.warning(f"[stub_docs] {e}, using the default revert rules", type="stub_docs", subtype="revert_rules")
+        return default_rules()
+
+
+def docstring_cache(app: "Sphinx") -> Optional[DocstringCache]:
+    """The cache of processed docstrings, stored next to the doctrees unless configured otherwise"""
+    if not app.config.stub_docs_docstring_cache:
+        return None
+    cache_file = app.config.stub_docs_docstring_cache_file or Path(app.doctreedir) / "stub_docs_docstrings.json"
+    return DocstringCache(Path(cache_file), app.config.stub_docs_docstring_cache_size)
+
+
+def on_build_finished(app: "Sphinx", exception: Optional[Exception]):
+    processor = getattr(app.env, "stub_docs_processor", None)
+    if processor is None:
+        return
+    report_revert_rules(processor.revert_engine)
+    if (cache := processor.cache) is None:
+        return
+    if exception is None:
+        cache.save()
+    log.info(
+        f"[stub_docs] docstring cache: {cache.hits} hits, {cache.misses} misses, {cache.evictions} evicted, "
+        f"{len(cache)} entries in {cache.cache_file}"
+    )
+
+
+def report_revert_rules(engine: RevertEngine):
+    if not engine.lines:
+        return
+    log.info(
+        f"[stub_docs] revert rules: {sum(engine.hits)} lines changed in {engine.lines} lines, "
+        f"{sum(engine.seconds) * 1e3:.1f} ms in the rules"
+    )
+    for stat in engine.stats():
+        log.verbose(f"[stub_docs]   {stat['name']:<24} {stat['hits']:>6} hits {stat['seconds'] * 1e3:8.2f} ms")
+
+
+def report_name_conflicts(names: ModuleNameIndex):
+    conflicts = names.conflicts
+    for name, folders in sorted(conflicts.items()):
+        if name.rpartition(".")[0] in conflicts:
+            # reported with its package
+            continue
+        log.warning(
+            f"[stub_docs] {name} is provided by {len(folders)} autoapi folders, only {folders[0]} is documented: "
+            + ", ".join(str(f) for f in folders[1:]),
+            type="stub_docs",
+            subtype="name_conflict",
+        )
+    for short_name, qualified_name in sorted(names.clashes.items()):
+        if qualified_name:
+            log.info(f"[stub_docs] micropython-lib module {short_name} is documented as {qualified_name}")
+        else:
+            log.info(f"[stub_docs] micropython-lib module {short_name} is not documented, the name is taken by a stub")
+
+
+def process_docstring(
+    app: "Sphinx",
+    what: str,
+    name: str,
+    obj: "PythonObject",
+    options: dict,
+    lines: List[str],
+):
+    """Forward `autodoc-process-docstring` to the DocstringProcessor of this build"""
+    app.env.stub_docs_processor.process_docstring(app, what, name, obj, options, lines)
+
+
+def process_module_docstrings(app: "Sphinx", objects: Iterable["PythonObject"]) -> int:
+    """Process the docstrings of all the modules and packages that autoapi mapped, in one pass"""
+    modules = [obj for obj in objects if obj.type in {"module", "package"} and obj.docstring]
+    # the same form as the lines of autodoc-process-docstring, with the trailing newline
+    docstrings = [(obj.name, obj.docstring.splitlines() + [""]) for obj in modules]
+    # the profile of the batch has the same rows per module as that of autodoc-process-docstring
+    profile = current_profile(app)
+    changed = app.env.stub_docs_processor.process_docstrings(docstrings, profile and profile.add_docstring)
+    for obj, (_, lines) in zip(modules, docstrings):
+        obj.docstring = "\n".join(lines)
+    log.verbose(f"[stub_docs] processed {len(modules)} module docstrings, {changed} lines changed")
+    return changed
+
+
+def batch_processed_map(map):
+    """Wrap autoapi's `Mapper.map` to process the module docstrings once all the objects are mapped"""
+
+    @functools.wraps(map)
+    def map_and_process(self: autoapi._mapper.Mapper, *args, **kwargs):
+        result = map(self, *args, **kwargs)
+        if self.app.config.stub_docs_batch_docstrings and hasattr(self.app.env, "stub_docs_processor"):
+            process_module_docstrings(self.app, self.all_objects.values())
+        return result
+
+    return map_and_process
+
+
+def install_batch_docstrings():
+    """Patch the autoapi Mapper to process the module docstrings in a batch, once"""
+    patch_mapper("map", batch_processed_map, "stub_docs_batch")
+
+
+def autoapi_skip_member(app: "Sphinx", what: str, name: str, obj: "PythonObject", skip: bool, options: dict):
+    """`
+    Determine whether to skip a member in the AutoAPI documentation.
+
+    Return True to skip the member, False to include it, None to defer to the default implementation.
+    """
+
+    return None
+
+
+def on_source_read(app: "Sphinx", docname: str, source: List[str]):
+    """Record which autoapi objects are documented in which document"""
+    if refs := set(RE_AUTOAPI_DIRECTIVE.findall(source[0])):
+        app.env.stub_docs_autoapi_refs[docname] = refs
+
+
+def on_env_purge_doc(app: "Sphinx", env: "BuildEnvironment", docname: str):
+    env.stub_docs_autoapi_refs.pop(docname, None)
+
+
+def on_env_merge_info(app: "Sphinx", env: "BuildEnvironment", docnames: Set[str], other: "BuildEnvironment"):
+    """Merge the information collected by a parallel reader into the main environment"""
+    for docname in docnames:
+        if docname in other.stub_docs_autoapi_refs:
+            env.stub_docs_autoapi_refs[docname] = other.stub_docs_autoapi_refs[docname]
+
+
+def setup(app: "Sphinx") -> Dict[str, Any]:
+    # the micropython-lib modules that are documented, and their origin
+    app.add_config_value("stub_docs_mpy_lib_modules", {}, "env", types=[dict])
+    # leave out the autoapi folders whose modules are all provided by an earlier folder
+    app.add_config_value("stub_docs_skip_shadowed", True, "env", types=[bool])
+    # cache the parsed stubs between builds
+    app.add_config_value("stub_docs_parse_cache", True, "", types=[bool])
+    app.add_config_value("stub_docs_parse_cache_dir", "", "", types=[str])
+    app.add_config_value("stub_docs_parse_cache_size", parse_cache.DEFAULT_MAX_SIZE, "", types=[int])
+    parse_cache.install_parse_cache()
+    # process the module docstrings in one pass after autoapi mapped the objects,
+    # rather than through autodoc-process-docstring for every object
+    app.add_config_value("stub_docs_batch_docstrings", True, "env", types=[bool])
+    install_batch_docstrings()
+    app.stub_docs_docstring_listener = None
+    # more revert rule files, relative to the source folder
+    app.add_config_value("stub_docs_revert_rules", [], "env", types=[list])
+    # keep the processed docstrings between builds
+    app.add_config_value("stub_docs_docstring_cache", True, "", types=[bool])
+    app.add_config_value("stub_docs_docstring_cache_file", "", "", types=[str])
+    app.add_config_value("stub_docs_docstring_cache_size", DEFAULT_MAX_ENTRIES, "", types=[int])
+    # track the stub files that each document depends on
+    setup_dependencies(app)
+    # resolve or drop the aliased missing references, and do not warn about missing `any` references
+    setup_references(app)
+    # load the intersphinx inventories from the vendored store
+    setup_inventories(app)
+    # opt-in timing of the build phases and event handlers
+    setup_profiling(app)
+
+    # run before autoapi, that parses the stubs on builder-inited
+    app.connect("builder-inited", on_builder_inited, priority=400)
+    app.connect("builder-inited", parse_cache.on_builder_inited, priority=400)
+    app.connect("build-finished", parse_cache.on_build_finished)
+    app.connect("build-finished", on_build_finished)
+    # several autodoc events also fire with autoapi :)
+    app.connect("autoapi-skip-member", autoapi_skip_member)
+    app.connect("source-read", on_source_read)
+    app.connect("env-purge-doc", on_env_purge_doc)
+    app.connect("env-merge-info", on_env_merge_info)
+
+    return {
+        "version": "1.0",
+        "env_version": 1,
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
@@ -0,0 +1,316 @@
+"""
+Vendored store of the intersphinx inventories, so that a build never needs network access.
+
+The `objects.inv` files of the projects in `intersphinx_mapping` are kept in `docs/intersphinx`,
+with a manifest that pins the uri, the project version and the sha256 of each file, and records when it was fetched.
+On builder-inited the inventories are put in the intersphinx cache, before intersphinx would fetch them.
+This relies on the expiry check in `sphinx.ext.intersphinx._load._fetch_inventory_group`, which does not fetch an inventory
+whose cache entry is newer than `intersphinx_cache_limit` days.
+The entries are timed so that they are fresh for this build, and expired for the next one,
+so that a later online build fetches the inventories that are not in the store.
+With a negative `intersphinx_cache_limit` the entries never expire, as in intersphinx.
+The parsed inventories are pickled in `.cache` in the store, keyed on the sha256, so a clean build does not decompress and parse them.
+The cache is outside the build folder, so it survives `make clean`.
+
+Refresh the store, from the `intersphinx_mapping` in conf.py:
+
+    cd docs
+    python -m stub_docs.inventories refresh [--force] [--pin] [name ...]
+    python -m stub_docs.inventories unpin [name ...]
+
+A pinned inventory is only refreshed with `--force`, `--pin` pins the refreshed inventories.
+An inventory older than `stub_docs_inventories_max_age` days is reported with a warning, unless it is pinned.
+"""
+
+import argparse
+import ast
+import contextlib
+import hashlib
+import io
+import json
+import os
+import pickle
+import posixpath
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import sphinx.util.logging
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
+
+log = sphinx.util.logging.getLogger(__name__)
+
+MANIFEST_FILE = "inventories.json"
+# the folder of the parsed inventories in the store, not committed
+CACHE_FOLDER = ".cache"
+INVENTORY_FILENAME = "objects.inv"
+# a vendored inventory older than this is reported, in days
+DEFAULT_MAX_AGE = 180
+
+
+def parse_inventory(data: bytes, uri: str) -> Dict[str, Dict[str, Tuple[str, str, str, str]]]:
+    """Parse the content of an objects.inv file, in the same way as intersphinx"""
+    from sphinx.util.inventory import InventoryFile
+
+    join = posixpath.join if "://" in uri else os.path.join
+    return InventoryFile.load(io.BytesIO(data), uri, join)
+
+
+def inventory_version(data: bytes) -> Tuple[str, str]:
+    """The project name and version from the header of an objects.inv file"""
+    lines = data.split(b"\n", 3)
+    if len(lines) < 3:
+        return "", ""
+    return lines[1].decode("utf-8", "replace")[11:].strip(), lines[2].decode("utf-8", "replace")[11:].strip()
+
+
+class InventoryStore:
+    """The vendored objects.inv files, and a cache of the parsed inventories"""
+
+    def __init__(self, folder: Path, cache_dir: Optional[Path] = None) -> None:
+        self.folder = folder
+        self.cache_dir = cache_dir
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        with contextlib.suppress(OSError, ValueError):
+            self.manifest = json.loads((folder / MANIFEST_FILE).read_text(encoding="utf-8"))
+        self.parsed = self.unpickled = 0
+
+    def path(self, name: str) -> Path:
+        return self.folder / f"{name}.inv"
+
+    def age(self, name: str, now: Optional[float] = None) -> float:
+        """The number of days since an inventory was fetched"""
+        return ((now or time.time()) - self.manifest[name].get("fetched", 0)) / 86400
+
+    def load(self, name: str, uri: str) -> Optional[Dict[str, Dict[str, Tuple[str, str, str, str]]]]:
+        """
+        The parsed inventory of a project, or None if it is not in the store,
+        or if the store has it for another uri, or if the file does not match the pinned sha256.
+        """
+        entry = self.manifest.get(name)
+        if not entry or entry.get("uri") != uri:
+            return None
+        try:
+            data = self.path(name).read_bytes()
+        except OSError:
+            return None
+        sha = hashlib.sha256(data).hexdigest()
+        if sha != entry.get("sha256"):
+            return None
+        pickled = self.cache_dir / f"{name}-{sha[:16]}.pickle" if self.cache_dir else None
+        if pickled:
+            with contextlib.suppress(OSError, pickle.PickleError, EOFError, AttributeError):
+                with open(pickled, "rb") as f:
+                    invdata = pickle.load(f)
+                self.unpickled += 1
+                return invdata
+        invdata = parse_inventory(data, uri)
+        self.parsed += 1
+        if pickled:
+            self.write_pickle(pickled, invdata)
+        return invdata
+
+    def write_pickle(self, pickled: Path, invdata: Any):
+        pickled.parent.mkdir(parents=True, exist_ok=True)
+        # the parsed inventories of an older file of the same project, not of micropython-lib for micropython
+        name = pickled.name.rsplit("-", 1)[0]
+        for old in pickled.parent.glob(f"{name}-" + "[0-9a-f]" * 16 + ".pickle"):
+            if old != pickled:
+                old.unlink(missing_ok=True)
+        # write to a temp file first, so that concurrent builds never read a partial entry
+        fd, tmp_name = tempfile.mkstemp(dir=pickled.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(invdata, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_name, pickled)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_name)
+
+    def add(self, name: str, uri: str, data: bytes, pinned: bool = False):
+        """Store the content of an objects.inv file, it must be a valid inventory"""
+        parse_inventory(data, uri)
+        project, version = inventory_version(data)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.path(name).write_bytes(data)
+        self.manifest[name] = {
+            "uri": uri,
+            "project": project,
+            "version": version,
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "fetched": int(time.time()),
+            "pinned": pinned or self.manifest.get(name, {}).get("pinned", False),
+        }
+
+    def save(self):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.folder / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=4, sort_keys=True)
+            f.write("\n")
+
+
+################################################################################################################
+# Sphinx
+################################################################################################################
+
+
+def on_builder_inited(app: "Sphinx"):
+    """Put the vendored inventories in the intersphinx cache, before intersphinx loads the mappings"""
+    from sphinx.ext.intersphinx import InventoryAdapter
+
+    mapping = getattr(app.config, "intersphinx_mapping", None)
+    if not mapping or not app.config.stub_docs_inventories:
+        return
+    folder = Path(app.srcdir, app.config.stub_docs_inventories)
+    cache_dir = Path(app.srcdir, app.config.stub_docs_inventories_cache_dir or folder / CACHE_FOLDER)
+    store = InventoryStore(folder, cache_dir)
+    inventories = InventoryAdapter(app.env)
+    now = int(time.time())
+    # fresh when intersphinx loads the mappings of this build, but expired for the next one, never with a negative limit
+    cache_limit = app.config.intersphinx_cache_limit
+    timestamp = now if cache_limit < 0 else now - cache_limit * 86400 + 60
+    loaded, injected = [], False
+    # normalized by intersphinx: {name: (name, (uri, locations))}
+    for name, (uri, _) in mapping.values():
+        invdata = store.load(name, uri)
+        if invdata is None:
+            if not app.config.stub_docs_inventories_offline:
+                # intersphinx fetches it
+                continue
+            log.warning(
+                f"[stub_docs] no vendored intersphinx inventory for {name}, "
+                "refresh with `python -m stub_docs.inventories refresh`",
+                type="stub_docs",
+                subtype="inventories",
+            )
+            invdata = {}
+        else:
+            loaded.append(name)
+            if (age := store.age(name, now)) > app.config.stub_docs_inventories_max_age:
+                if store.manifest[name].get("pinned"):
+                    log.info(f"[stub_docs] the pinned intersphinx inventory for {name} is {age:.0f} days old")
+                else:
+                    log.warning(
+                        f"[stub_docs] the vendored intersphinx inventory for {name} is {age:.0f} days old, "
+                        f"refresh with `python -m stub_docs.inventories refresh {name}`, or pin it with --pin",
+                        type="stub_docs",
+                        subtype="inventories",
+                    )
+        # a fresh cache entry, so intersphinx does not fetch it
+        inventories.cache[uri] = (name, timestamp, invdata)
+        injected = True
+    if injected:
+        # intersphinx only fills the inventories from the cache when it fetched one, in the same order
+        inventories.clear()
+        for name, _, invdata in sorted(inventories.cache.values(), key=lambda entry: entry[:2]):
+            inventories.named_inventory[name] = invdata
+            for objtype, objects in invdata.items():
+                inventories.main_inventory.setdefault(objtype, {}).update(objects)
+    if loaded:
+        log.info(
+            f"[stub_docs] intersphinx inventories from {store.folder}: {', '.join(loaded)} "
+            f"({store.unpickled} cached, {store.parsed} parsed)"
+        )
+
+
+def setup_inventories(app: "Sphinx"):
+    # the folder of the vendored intersphinx inventories, relative to the source folder, empty to fetch them
+    app.add_config_value("stub_docs_inventories", "intersphinx", "", types=[str])
+    # never fetch an inventory, also when it is not in the store, STUB_DOCS_OFFLINE=1, true or yes
+    offline = os.getenv("STUB_DOCS_OFFLINE", "").strip().lower() in {"1", "true", "yes"}
+    app.add_config_value("stub_docs_inventories_offline", offline, "", types=[bool])
+    app.add_config_value("stub_docs_inventories_max_age", DEFAULT_MAX_AGE, "", types=[int])
+    # the folder of the parsed inventories, `.cache` in the store by default
+    app.add_config_value("stub_docs_inventories_cache_dir", "", "", types=[str])
+    # before intersphinx loads the mappings
+    app.connect("builder-inited", on_builder_inited, priority=400)
+
+
+################################################################################################################
+# Refresh
+################################################################################################################
+
+
+def mapping_from_conf(conf_file: Path) -> Dict[str, str]:
+    """The name and uri of the projects in the intersphinx_mapping of conf.py, without running conf.py"""
+    tree = ast.parse(conf_file.read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Name) and t.id == "intersphinx_mapping" for t in node.targets
+        ):
+            return {name: value[0] for name, value in ast.literal_eval(node.value).items()}
+    return {}
+
+
+def fetch(uri: str, timeout: float = 30) -> bytes:
+    with urllib.request.urlopen(posixpath.join(uri, INVENTORY_FILENAME), timeout=timeout) as response:
+        return response.read()
+
+
+def refresh(
+    store: InventoryStore, mapping: Dict[str, str], names: List[str], force: bool = False, pin: bool = False
+) -> int:
+    """Fetch the inventories into the store, and pin them with pin, returns the number of failures"""
+    failures = fetched = 0
+    for name, uri in mapping.items():
+        if names and name not in names:
+            continue
+        entry = store.manifest.get(name, {})
+        if entry.get("pinned") and entry.get("uri") == uri and not force:
+            print(f"{name}: pinned to {entry.get('project')} {entry.get('version')}, use --force to refresh")
+            continue
+        try:
+            store.add(name, uri, fetch(uri), pinned=pin)
+        except (OSError, ValueError) as e:
+            print(f"{name}: failed to fetch {uri}: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        entry = store.manifest[name]
+        print(f"{name}: {entry['project']} {entry['version']} from {uri}{', pinned' if entry['pinned'] else ''}")
+        fetched += 1
+    if fetched:
+        store.save()
+    return failures
+
+
+def unpin(store: InventoryStore, names: List[str]) -> int:
+    """Let the next refresh fetch the inventories again, returns the number of names that are not in the store"""
+    missing = [name for name in names if name not in store.manifest]
+    for name in missing:
+        print(f"{name}: not in {store.folder}", file=sys.stderr)
+    for name, entry in store.manifest.items():
+        if (not names or name in names) and entry.get("pinned"):
+            entry["pinned"] = False
+            print(f"{name}: unpinned")
+    store.save()
+    return len(missing)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["refresh", "unpin", "list"])
+    parser.add_argument("names", nargs="*", help="the projects to refresh or unpin, all by default")
+    parser.add_argument("--conf", type=Path, default=Path("conf.py"))
+    parser.add_argument("--store", type=Path, default=Path("intersphinx"))
+    parser.add_argument("--force", action="store_true", help="also refresh the pinned inventories")
+    parser.add_argument("--pin", action="store_true", help="pin the refreshed inventories")
+    args = parser.parse_args(argv)
+
+    store = InventoryStore(args.store)
+    if args.command == "list":
+        for name, entry in sorted(store.manifest.items()):
+            pinned = ", pinned" if entry.get("pinned") else ""
+            print(f"{name}: {entry['project']} {entry['version']}, {store.age(name):.0f} days old{pinned}")
+        return 0
+    if args.command == "unpin":
+        return 1 if unpin(store, args.names) else 0
+    return 1 if refresh(store, mapping_from_conf(args.conf), args.names, args.force, args.pin) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import functools
+import hashlib
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Union
+
+from .collector import DOCS_PATH, ModuleOrigin
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+################################################################################################################
+# Generate the index.rst file for the modules in micropython-lib
+################################################################################################################
+
+# Configure customizable templates for the AutoAPI extension.
+autoapi_template_dir = (DOCS_PATH / "autoapi_templates").absolute().as_posix()
+
+# the compiled templates are kept between builds
+JINJA_CACHE_PATH = DOCS_PATH / "build" / ".jinja_cache"
+
+
+@functools.lru_cache(maxsize=None)
+def template_environment(cache_path: Optional[Path] = None) -> "Environment":
+    """
+    The Jinja2 environment for the index templates.
+    Jinja2 is only imported, and the environment only created, when an index is generated.
+    """
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    cache_path = cache_path or JINJA_CACHE_PATH
+    cache_path.mkdir(parents=True, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(autoapi_template_dir),
+        bytecode_cache=FileSystemBytecodeCache(str(cache_path)),
+    )
+
+
+def write_if_changed(output_file: Union[str, Path], content: str) -> bool:
+    """
+    Write content to a file, unless the file already has that content.
+    An unchanged file keeps its mtime, so Sphinx does not see it as a changed document.
+    """
+    output_file = Path(output_file)
+    data = content.encode("utf-8")
+    try:
+        if hashlib.sha256(output_file.read_bytes()).digest() == hashlib.sha256(data).digest():
+            return False
+    except OSError:
+        pass
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_bytes(data)
+    return True
+
+
+def generate_library_index(mpylib_micropython: List[ModuleOrigin], title: str, output_file: str) -> bool:
+    """
+    Generate the index.rst file for the modules in micropython-lib
+    Args:
+        mpylib_micropython (List[Path]): List of paths to the modules
+        title (str): Title of the index.rst file
+        output_file (str): Path to the output file
+
+    Returns True if the file was written, False if it was already up to date.
+
+    The version and license of the modules come from their manifests,
+    a missing description is filled in from the module docstring by the MetadataIndex.
+
+    TODO: Add more information to the index
+        - mip icon / link to install
+        - integrate this more with Sphinx/autoapi
+    """
+    template = template_environment().get_template("mpy-lib_index.rst")
+    rendered_content = template.render(modules=mpylib_micropython, title=title)
+    return write_if_changed(output_file, rendered_content)
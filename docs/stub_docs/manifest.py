@@ -0,0 +1,438 @@
+"""
+Evaluate the manifest.py files of micropython-lib packages.
+
+A manifest declares the files of a package, its metadata and the packages it requires:
+
+    metadata(version="0.1.0", description="...")
+    require("collections")
+    package("collections", files=("defaultdict.py",))
+    module("foo.py", opt=3)
+
+The manifests are not executed, they are parsed and evaluated by a small interpreter of the statements that manifests use:
+calls to these functions and to `options.defaults()`, assignments, `if` and `for`, with literals, names, operators and `options.<name>`.
+Anything else, such as imports, other attribute access or calls, is a ManifestError,
+so that a manifest has no access to Python objects, files or the network.
+The results are cached on disk, and only re-evaluated when a manifest, or a manifest it includes, changes.
+"""
+
+import ast
+import contextlib
+import hashlib
+import json
+import operator
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+MANIFEST_FILE = "manifest.py"
+
+# the builtins that a manifest can call, they only take and return plain values
+MANIFEST_BUILTINS: Dict[str, Callable] = {
+    "bool": bool,
+    "int": int,
+    "len": len,
+    "list": list,
+    "sorted": sorted,
+    "str": str,
+    "tuple": tuple,
+}
+
+# a manifest is small, this bounds the time and memory that a manifest can take
+MAX_STEPS = 100_000
+MAX_LENGTH = 100_000
+
+
+def bounded_add(a: Any, b: Any) -> Any:
+    if isinstance(a, (str, tuple, list)) and isinstance(b, (str, tuple, list)) and len(a) + len(b) > MAX_LENGTH:
+        raise ValueError(f"values longer than {MAX_LENGTH} are not allowed in a manifest")
+    return a + b
+
+
+BINARY_OPERATORS = {ast.Add: bounded_add, ast.Sub: operator.sub}
+UNARY_OPERATORS = {ast.Not: operator.not_, ast.USub: operator.neg}
+COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+
+class ManifestError(Exception):
+    """A manifest.py could not be evaluated"""
+
+
+@dataclass
+class PackageManifest:
+    """The declarations of a package manifest"""
+
+    # the name of the folder with the manifest, as used by require()
+    name: str
+    path: Path
+    metadata: Dict[str, str] = field(default_factory=dict)
+    # (source, destination), the source relative to the manifest folder, the destination relative to the library root
+    files: List[Tuple[str, str]] = field(default_factory=list)
+    # the top-level modules and packages that are declared
+    modules: List[str] = field(default_factory=list)
+    requires: List[str] = field(default_factory=list)
+    # the manifests included by this manifest
+    includes: List[Path] = field(default_factory=list)
+
+    def to_json(self) -> dict:
+        data = asdict(self)
+        data["path"] = self.path.as_posix()
+        data["includes"] = [p.as_posix() for p in self.includes]
+        return data
+
+    @classmethod
+    def from_json(cls, data: dict) -> "PackageManifest":
+        return cls(
+            name=data["name"],
+            path=Path(data["path"]),
+            metadata=data["metadata"],
+            files=[tuple(f) for f in data["files"]],
+            modules=data["modules"],
+            requires=data["requires"],
+            includes=[Path(p) for p in data["includes"]],
+        )
+
+
+class ManifestOptions:
+    """Stand-in for `options`, options that are not set are None"""
+
+    def __init__(self) -> None:
+        self.__dict__["values"] = {}
+
+    def defaults(self, **kwargs):
+        for key, value in kwargs.items():
+            self.values.setdefault(key, value)
+
+    def __getattr__(self, name: str) -> Any:
+        return self.values.get(name)
+
+    def __setattr__(self, name: str, value: Any):
+        self.values[name] = value
+
+
+class ManifestContext:
+    """The functions that a manifest.py can call"""
+
+    def __init__(self, manifest: PackageManifest) -> None:
+        self.manifest = manifest
+        self.options = ManifestOptions()
+        # the folder of the manifest that is being evaluated, changes while evaluating includes
+        self.folder = manifest.path.parent
+
+    def _source(self, *parts: str) -> Path:
+        return (self.folder / Path(*parts)).resolve()
+
+    def _add(self, source: Path, dest: str):
+        try:
+            source_rel = os.path.relpath(source, self.manifest.path.parent.resolve())
+        except ValueError:  # other drive
+            source_rel = source.as_posix()
+        self.manifest.files.append((Path(source_rel).as_posix(), dest))
+        top = dest.split("/")[0]
+        top = top[:-3] if top.endswith(".py") else top
+        if top not in self.manifest.modules:
+            self.manifest.modules.append(top)
+
+    def metadata(self, description=None, version=None, license=None, author=None, **kwargs):
+        for key, value in dict(description=description, version=version, license=license, author=author, **kwargs).items():
+            if value is not None:
+                self.manifest.metadata[key] = str(value)
+
+    def require(self, name: str, version=None, unix_ffi=False, pypi=None, **kwargs):
+        if name not in self.manifest.requires:
+            self.manifest.requires.append(name)
+
+    def module(self, module_path: str, base_path: str = ".", opt=None):
+        source = self._source(base_path, module_path)
+        if not source.is_file():
+            raise ManifestError(f"{self.manifest.path}: module {module_path} not found")
+        self._add(source, Path(module_path).as_posix())
+
+    def package(self, package_path: str, files: Optional[Iterable[str]] = None, base_path: str = ".", opt=None):
+        folder = self._source(base_path, package_path)
+        if files is None:
+            # all the python files in the package folder
+            files = sorted(p.relative_to(folder).as_posix() for p in folder.rglob("*.py") if "__pycache__" not in p.parts)
+        for file in files:
+            source = folder / file
+            if not source.is_file():
+                raise ManifestError(f"{self.manifest.path}: package file {package_path}/{file} not found")
+            self._add(source, (Path(package_path) / file).as_posix())
+
+    def include(self, manifest_path: str, is_require: bool = False, **kwargs):
+        if "$(" in manifest_path:
+            # $(MPY_DIR) and friends are outside micropython-lib
+            return
+        path = self.folder / manifest_path
+        if path.is_dir():
+            path = path / MANIFEST_FILE
+        path = path.resolve()
+        if path in self.manifest.includes or path == self.manifest.path.resolve():
+            return
+        self.manifest.includes.append(path)
+        self.options.defaults(**kwargs)
+        folder, self.folder = self.folder, path.parent
+        try:
+            self.run(path)
+        finally:
+            self.folder = folder
+
+    def ignore(self, *args, **kwargs):
+        pass
+
+    def run(self, path: Path):
+        try:
+            tree = ast.parse(path.read_bytes(), str(path))
+        except (OSError, SyntaxError, ValueError, RecursionError) as e:
+            raise ManifestError(f"{path}: {e}") from e
+        functions = {
+            "metadata": self.metadata,
+            "require": self.require,
+            "module": self.module,
+            "package": self.package,
+            "include": self.include,
+            # only relevant when freezing firmware
+            "freeze": self.ignore,
+            "add_library": self.ignore,
+        }
+        evaluator = ManifestEvaluator(path, functions, self.options)
+        try:
+            evaluator.exec(tree.body)
+        except ManifestError:
+            raise
+        except (RecursionError, ArithmeticError, LookupError, TypeError, ValueError) as e:
+            raise ManifestError(f"{path}: {type(e).__name__}: {e}") from e
+
+
+class ManifestEvaluator:
+    """Evaluate the statements of a manifest.py, without executing Python code"""
+
+    def __init__(self, path: Path, functions: Dict[str, Callable], options: ManifestOptions) -> None:
+        self.path = path
+        self.functions = functions
+        self.options = options
+        self.variables: Dict[str, Any] = {"__file__": str(path)}
+        self.steps = 0
+
+    def error(self, node: ast.AST, message: str = "") -> ManifestError:
+        return ManifestError(
+            f"{self.path}:{getattr(node, 'lineno', 0)}: {message or f'{type(node).__name__} is not allowed in a manifest'}"
+        )
+
+    def exec(self, statements: List[ast.stmt]):
+        for node in statements:
+            self.steps += 1
+            if self.steps > MAX_STEPS:
+                raise self.error(node, f"more than {MAX_STEPS} statements evaluated")
+            if isinstance(node, ast.Expr):
+                self.eval(node.value)
+            elif isinstance(node, ast.Assign):
+                value = self.eval(node.value)
+                for target in node.targets:
+                    self.assign(target, value)
+            elif isinstance(node, ast.AugAssign) and type(node.op) in BINARY_OPERATORS:
+                value = BINARY_OPERATORS[type(node.op)](self.eval(node.target), self.eval(node.value))
+                self.assign(node.target, value)
+            elif isinstance(node, ast.If):
+                self.exec(node.body if self.eval(node.test) else node.orelse)
+            elif isinstance(node, ast.For) and not node.orelse:
+                for value in self.eval(node.iter):
+                    self.assign(node.target, value)
+                    self.exec(node.body)
+            elif not isinstance(node, ast.Pass):
+                raise self.error(node)
+
+    def assign(self, target: ast.expr, value: Any):
+        if isinstance(target, ast.Name):
+            self.variables[target.id] = value
+        elif self.is_option(target):
+            setattr(self.options, target.attr, value)
+        elif isinstance(target, ast.Tuple):
+            values = list(value)
+            if len(values) != len(target.elts):
+                raise self.error(target, f"cannot unpack {len(values)} values into {len(target.elts)} names")
+            for element, item in zip(target.elts, values):
+                self.assign(element, item)
+        else:
+            raise self.error(target)
+
+    @staticmethod
+    def is_option(node: ast.expr) -> bool:
+        return (
+            isinstance(node, ast.Attribute)
+            and isinstance(node.value, ast.Name)
+            and node.value.id == "options"
+            and not node.attr.startswith("_")
+        )
+
+    def eval(self, node: ast.expr) -> Any:
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id in self.variables:
+                return self.variables[node.id]
+            raise self.error(node, f"name {node.id!r} is not defined")
+        if self.is_option(node):
+            # only the values of the options, not the attributes of the object
+            return self.options.values.get(node.attr)
+        if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+            values = [self.eval(element) for element in node.elts]
+            return {ast.Tuple: tuple, ast.List: list, ast.Set: set}[type(node)](values)
+        if isinstance(node, ast.Dict) and None not in node.keys:
+            return {self.eval(key): self.eval(value) for key, value in zip(node.keys, node.values)}
+        if isinstance(node, ast.BoolOp):
+            value = None
+            for operand in node.values:
+                value = self.eval(operand)
+                if bool(value) == isinstance(node.op, ast.Or):
+                    break
+            return value
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            return UNARY_OPERATORS[type(node.op)](self.eval(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            return BINARY_OPERATORS[type(node.op)](self.eval(node.left), self.eval(node.right))
+        if isinstance(node, ast.Compare):
+            left = self.eval(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self.eval(comparator)
+                if not COMPARE_OPERATORS[type(op)](left, right):
+                    return False
+                left = right
+            return True
+        if isinstance(node, ast.IfExp):
+            return self.eval(node.body if self.eval(node.test) else node.orelse)
+        if isinstance(node, ast.JoinedStr):
+            return "".join(self.eval(value) for value in node.values)
+        if isinstance(node, ast.FormattedValue) and node.format_spec is None:
+            return str(self.eval(node.value))
+        if isinstance(node, ast.Call):
+            return self.call(node)
+        raise self.error(node)
+
+    def call(self, node: ast.Call) -> Any:
+        if isinstance(node.func, ast.Name) and node.func.id in self.functions:
+            function = self.functions[node.func.id]
+        elif isinstance(node.func, ast.Name) and node.func.id in MANIFEST_BUILTINS:
+            function = MANIFEST_BUILTINS[node.func.id]
+        elif self.is_option(node.func) and node.func.attr == "defaults":
+            function = self.options.defaults
+        else:
+            raise self.error(node, f"only the manifest functions can be called, not {ast.unparse(node.func)}")
+        if any(isinstance(arg, ast.Starred) for arg in node.args) or any(kw.arg is None for kw in node.keywords):
+            raise self.error(node, "* and ** arguments are not allowed in a manifest")
+        args = [self.eval(arg) for arg in node.args]
+        kwargs = {kw.arg: self.eval(kw.value) for kw in node.keywords}
+        return function(*args, **kwargs)
+
+
+def evaluate_manifest(path: Path) -> PackageManifest:
+    """Evaluate a manifest.py and return what it declares"""
+    manifest = PackageManifest(name=path.parent.name, path=path)
+    ManifestContext(manifest).run(path)
+    return manifest
+
+
+class ManifestCache:
+    """
+    On-disk cache of the evaluated manifests.
+
+    An entry is re-evaluated when the manifest, or one of the manifests it includes, changed.
+    Like the CopyManifest, the size and mtime are checked first, and the content hash when only the mtime changed.
+    """
+
+    FILENAME = ".stub_docs_manifests.json"
+
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+        self.entries: Dict[str, dict] = {}
+        self.hits = self.misses = 0
+        cache_file = folder / self.FILENAME
+        if cache_file.exists():
+            with contextlib.suppress(ValueError, OSError):
+                self.entries = json.loads(cache_file.read_text(encoding="utf-8"))
+
+    @staticmethod
+    def file_state(path: Path) -> dict:
+        stat = path.stat()
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": hashlib.sha256(path.read_bytes()).hexdigest()}
+
+    @staticmethod
+    def is_unchanged(path: Path, state: dict) -> bool:
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        if stat.st_size != state["size"]:
+            return False
+        if stat.st_mtime_ns == state["mtime"]:
+            return True
+        # touched, but possibly not changed
+        if hashlib.sha256(path.read_bytes()).hexdigest() != state["sha256"]:
+            return False
+        state["mtime"] = stat.st_mtime_ns
+        return True
+
+    def load(self, path: Path) -> PackageManifest:
+        """The evaluated manifest, from the cache if none of its files changed"""
+        key = path.resolve().as_posix()
+        entry = self.entries.get(key)
+        if entry and all(self.is_unchanged(Path(p), state) for p, state in entry["files"].items()):
+            self.hits += 1
+            return PackageManifest.from_json(entry["manifest"])
+        self.misses += 1
+        manifest = evaluate_manifest(path)
+        self.entries[key] = {
+            "files": {p.as_posix(): self.file_state(p) for p in [path.resolve(), *manifest.includes]},
+            "manifest": manifest.to_json(),
+        }
+        return manifest
+
+    def save(self):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.folder / self.FILENAME, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+
+
+class ManifestGraph:
+    """The packages and the packages they require"""
+
+    def __init__(self, manifests: Iterable[PackageManifest]) -> None:
+        self.packages: Dict[str, PackageManifest] = {m.name: m for m in manifests}
+        # required packages that are not in the graph: {package: {required by}}
+        self.missing: Dict[str, Set[str]] = {}
+        for m in self.packages.values():
+            for name in m.requires:
+                if name not in self.packages:
+                    self.missing.setdefault(name, set()).add(m.name)
+
+    def requires(self, name: str) -> List[str]:
+        """The packages that a package requires, directly or indirectly, dependencies first"""
+        return [n for n in self.closure([name]) if n != name]
+
+    def closure(self, names: Iterable[str]) -> List[str]:
+        """The packages and everything they require, dependencies first"""
+        order: List[str] = []
+        seen: Set[str] = set()
+
+        def visit(name: str):
+            if name in seen or name not in self.packages:
+                return
+            seen.add(name)
+            for required in self.packages[name].requires:
+                visit(required)
+            order.append(name)
+
+        for name in names:
+            visit(name)
+        return order
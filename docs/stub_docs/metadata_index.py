@@ -0,0 +1,97 @@
+"""
+Index of the docstring summaries of the micropython-lib modules.
+
+The version, description, author and license come from the package manifests.
+Modules without a description in their manifest use the first line of their module docstring.
+The summaries are stored as a packed JSON file, one row per module keyed on the module name,
+so modules whose source did not change are not read again on the next build.
+"""
+
+import ast
+import contextlib
+import json
+import tokenize
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from .collector import ModuleOrigin
+
+
+def docstring_summary(path: Path) -> str:
+    """
+    The first line of the module docstring of a python file.
+    Only the tokens up to the docstring are read, the module is not parsed.
+    """
+    if path.is_dir():
+        path = path / "__init__.py"
+    try:
+        with open(path, "rb") as f:
+            for token in tokenize.tokenize(f.readline):
+                if token.type in (tokenize.ENCODING, tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE):
+                    continue
+                if token.type != tokenize.STRING:
+                    return ""
+                with contextlib.suppress(ValueError, SyntaxError):
+                    text = ast.literal_eval(token.string)
+                    if isinstance(text, str):
+                        return next((line.strip() for line in text.strip().splitlines()), "")
+                return ""
+    except (OSError, SyntaxError, tokenize.TokenError):
+        pass
+    return ""
+
+
+class MetadataIndex:
+    """
+    Packed on-disk index of the docstring summaries of modules, keyed on the module name.
+
+    Each row holds the size and mtime of the module source and its docstring summary.
+    """
+
+    FILENAME = ".stub_docs_metadata.json"
+    VERSION = 2
+
+    def __init__(self, index_file: Path) -> None:
+        self.index_file = index_file
+        self.rows: Dict[str, List] = {}
+        self.read = 0
+        if index_file.exists():
+            with contextlib.suppress(ValueError, OSError, KeyError):
+                data = json.loads(index_file.read_text(encoding="utf-8"))
+                if data["version"] == self.VERSION:
+                    self.rows = data["modules"]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.rows
+
+    @staticmethod
+    def stamp(path: Path) -> List[int]:
+        if path.is_dir():
+            path = path / "__init__.py"
+        with contextlib.suppress(OSError):
+            stat = path.stat()
+            return [stat.st_size, stat.st_mtime_ns]
+        return [0, 0]
+
+    def update(self, modules: Iterable[ModuleOrigin]):
+        """
+        Index the modules, and fill in a missing description from the module docstring.
+        Only the modules that changed since they were indexed are read.
+        """
+        for mod in modules:
+            stamp = self.stamp(mod.origin_path)
+            row = self.rows.get(mod.name)
+            if row is None or row[:2] != stamp:
+                summary = docstring_summary(mod.origin_path)
+                self.read += 1
+            else:
+                summary = row[2]
+            # the manifest has priority, the docstring only provides a missing description
+            mod.description = mod.description or summary
+            self.rows[mod.name] = stamp + [summary]
+
+    def save(self):
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": self.VERSION, "modules": self.rows}
+        with open(self.index_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"), sort_keys=True)
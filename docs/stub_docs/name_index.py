@@ -0,0 +1,106 @@
+"""
+Index of the qualified names of the modules that autoapi documents, from the stubs and from micropython-lib.
+
+Some micropython-lib modules have the same name as a stub package (heapq, errno ...).
+The index is built once per build, before autoapi parses the modules, and is used to:
+- report the modules that are provided by more than one autoapi folder, only the first one is documented
+- report the micropython-lib modules that share their short name with a stub module
+- look up the micropython-lib origin of a module by its exact qualified name
+"""
+
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .collector import SKIP_MODULES, ModuleOrigin
+
+# the files that autoapi documents, .pyi files take precedence over .py files
+MODULE_SUFFIXES = (".pyi", ".py")
+
+
+def package_parents(path: str):
+    """The parent folders that are part of the package of a module, as the module name is derived from those"""
+    parents = []
+    directory = os.path.dirname(path)
+    while directory and (
+        os.path.isfile(os.path.join(directory, "__init__.py")) or os.path.isfile(os.path.join(directory, "__init__.pyi"))
+    ):
+        directory, part = os.path.split(directory)
+        parents.append(part)
+    return parents
+
+
+def module_name(path: Path) -> str:
+    """The qualified module name of a file, derived from its package folders in the same way as autoapi"""
+    parts = list(reversed(package_parents(str(path))))
+    if path.stem != "__init__":
+        parts.append(path.stem)
+    return ".".join(parts)
+
+
+class ModuleNameIndex:
+    """The qualified module names of the autoapi folders, and the micropython-lib modules among them"""
+
+    def __init__(self) -> None:
+        # qualified name -> the autoapi folders that provide it, the first one is documented
+        self.providers: Dict[str, List[Path]] = defaultdict(list)
+        # autoapi folder -> the qualified names in it
+        self.folders: Dict[Path, List[str]] = {}
+        # qualified name -> micropython-lib origin
+        self.lib_modules: Dict[str, ModuleOrigin] = {}
+        # short name -> qualified name, of the micropython-lib modules that share their name with another module
+        # None if the micropython-lib module is not in an autoapi folder
+        self.clashes: Dict[str, Optional[str]] = {}
+
+    @classmethod
+    def build(cls, autoapi_dirs: Iterable[Path], mpy_lib_modules: Dict[str, ModuleOrigin]) -> "ModuleNameIndex":
+        index = cls()
+        for folder in autoapi_dirs:
+            index.add_dir(Path(folder))
+        index.add_lib_modules(mpy_lib_modules)
+        return index
+
+    def add_dir(self, folder: Path):
+        """Add the modules in an autoapi folder"""
+        names = set()
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_MODULES and not d.startswith("."))
+            for file in files:
+                if file.endswith(MODULE_SUFFIXES):
+                    names.add(module_name(Path(root) / file))
+        self.folders[folder] = sorted(names)
+        for name in self.folders[folder]:
+            self.providers[name].append(folder)
+
+    def add_lib_modules(self, mpy_lib_modules: Dict[str, ModuleOrigin]):
+        """Index the micropython-lib modules on the qualified name that autoapi documents them under"""
+        for short_name, mod in mpy_lib_modules.items():
+            # both modules and packages are copied to foo/__init__.py
+            qualified_name = module_name(mod.path)
+            if qualified_name not in self.providers:
+                if short_name in self.providers:
+                    # not documented, and the short name is another module
+                    self.clashes[short_name] = None
+                    continue
+                # not in an autoapi folder
+                qualified_name = short_name
+            elif qualified_name != short_name and short_name in self.providers:
+                self.clashes[short_name] = qualified_name
+            self.lib_modules[qualified_name] = mod
+
+    @property
+    def conflicts(self) -> Dict[str, List[Path]]:
+        """The qualified names that are provided by more than one autoapi folder"""
+        return {name: folders for name, folders in self.providers.items() if len(folders) > 1}
+
+    def shadowed(self) -> List[Path]:
+        """The autoapi folders that only contain modules that an earlier folder already provides"""
+        return [
+            folder
+            for folder, names in self.folders.items()
+            if names and all(self.providers[name][0] != folder for name in names)
+        ]
+
+    def lib_module(self, qualified_name: str) -> Optional[ModuleOrigin]:
+        return self.lib_modules.get(qualified_name)
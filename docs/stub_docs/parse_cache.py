@@ -0,0 +1,190 @@
+"""
+Persistent cache for the output of the autoapi parser.
+
+Parsing the stubs with astroid dominates the cold build time, while most of the stubs do not change between builds.
+The parsed object model of each file is stored on disk, keyed on the file content and the autoapi, astroid and Python versions,
+so that a build only needs to parse the files that changed.
+A class also gets the members that it inherits from its base classes, which can be defined in other files.
+An entry records a digest of the stub files of its own package and of the packages of its base classes,
+and is only used while none of these files changed.
+The cache is capped in size, and the least recently used entries are evicted first.
+"""
+
+import contextlib
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+import astroid
+import autoapi
+import autoapi._mapper
+import sphinx.util.logging
+
+from .autoapi_patches import patch_mapper
+from .dependencies import package_digests, package_of, stub_packages
+from .name_index import package_parents
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
+
+log = sphinx.util.logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+# the format of the entries
+CACHE_VERSION = 2
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed stub files, with LRU eviction.
+
+    Each entry is a pickle file named after its key, the mtime of the file is used to track the last use.
+    """
+
+    SUFFIX = ".pickle"
+
+    def __init__(self, cache_dir: Path, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.sizes: Dict[Path, int] = {p: p.stat().st_size for p in self.cache_dir.glob(f"*{self.SUFFIX}")}
+        self.hits = self.misses = self.evictions = 0
+        # the parser output depends on the versions of the parser and python
+        self.version = f"{CACHE_VERSION}|{autoapi.__version__}|{astroid.__version__}|{sys.version_info[:2]}"
+        self._package_digests: Optional[Dict[str, str]] = None
+
+    @property
+    def size(self) -> int:
+        return sum(self.sizes.values())
+
+    def key(self, path: str, **kwargs) -> str:
+        """
+        Key for a file, based on its content and on everything else that determines the parser output:
+        the versions, the path and the package structure that the module name is derived from.
+        """
+        h = hashlib.sha256(self.version.encode())
+        h.update(os.path.abspath(path).encode())
+        h.update(repr(sorted(kwargs.items())).encode())
+        h.update(repr(package_parents(path)).encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+        return h.hexdigest()
+
+    def package_digests(self, source_files: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """The digest of the stub files of each package, from the (dir_root, path) pairs that autoapi found, once per build"""
+        if self._package_digests is None:
+            self._package_digests = package_digests(stub_packages(source_files), self.version)
+        return self._package_digests
+
+    def get(self, key: str, digests: Optional[Mapping[str, str]] = None) -> Optional[Any]:
+        """The cached data, unless the stub files of one of the packages that the entry depends on changed"""
+        entry = self.cache_dir / f"{key}{self.SUFFIX}"
+        try:
+            with open(entry, "rb") as f:
+                packages, data = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+            self.misses += 1
+            return None
+        digests = digests or {}
+        if any(digests.get(package) != digest for package, digest in packages.items()):
+            self.misses += 1
+            return None
+        with contextlib.suppress(OSError):
+            # mark as recently used
+            os.utime(entry)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: Any, packages: Optional[Mapping[str, str]] = None):
+        """Store the data, with the digests of the packages that it depends on"""
+        entry = self.cache_dir / f"{key}{self.SUFFIX}"
+        # write to a temp file first, so that concurrent builds never read a partial entry
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((dict(packages or {}), data), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_name, entry)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_name)
+            return
+        self.sizes[entry] = entry.stat().st_size
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_size"""
+        total = self.size
+        if total <= self.max_size:
+            return
+        by_last_use = sorted(self.sizes, key=lambda p: p.stat().st_mtime if p.exists() else 0)
+        for entry in by_last_use:
+            if total <= self.max_size:
+                break
+            total -= self.sizes.pop(entry)
+            entry.unlink(missing_ok=True)
+            self.evictions += 1
+
+
+def base_packages(data: Any) -> Set[str]:
+    """The top-level packages of the base classes in the parsed data, that the inherited members come from"""
+    packages: Set[str] = set()
+    seen: Set[int] = set()
+    todo = list(data) if isinstance(data, list) else [data]
+    while todo:
+        item = todo.pop()
+        if not isinstance(item, dict) or id(item) in seen:
+            continue
+        seen.add(id(item))
+        packages.update(base.split(".", 1)[0] for base in item.get("bases", ()))
+        todo.extend(item.get("children", ()))
+        todo.append(item.get("inherited_from"))
+    return packages
+
+
+def cached_read_file(read_file):
+    """Wrap autoapi's `Mapper.read_file` to serve the parsed data from the parse cache"""
+
+    def read_file_cached(self: autoapi._mapper.Mapper, path, **kwargs):
+        cache: Optional[ParseCache] = getattr(self.app, "stub_docs_parse_cache", None)
+        if cache is None:
+            return read_file(self, path, **kwargs)
+        try:
+            key = cache.key(path, namespace=self._use_implicit_namespace, **kwargs)
+        except OSError:
+            return read_file(self, path, **kwargs)
+        digests = cache.package_digests(getattr(self.app.env, "autoapi_source_files", []))
+        if (data := cache.get(key, digests)) is not None:
+            return data
+        data = read_file(self, path, **kwargs)
+        if data:
+            packages = base_packages(data)
+            if dir_root := kwargs.get("dir_root"):
+                packages.add(package_of(dir_root, path))
+            cache.put(key, data, {package: digests[package] for package in packages if package in digests})
+        return data
+
+    return read_file_cached
+
+
+def install_parse_cache():
+    """Patch the autoapi Mapper to use the parse cache, once"""
+    patch_mapper("read_file", cached_read_file, "stub_docs_cached")
+
+
+def on_builder_inited(app: "Sphinx"):
+    if not app.config.stub_docs_parse_cache:
+        return
+    cache_dir = app.config.stub_docs_parse_cache_dir or Path(app.doctreedir) / "stub_docs_parse_cache"
+    app.stub_docs_parse_cache = ParseCache(Path(cache_dir), app.config.stub_docs_parse_cache_size)
+
+
+def on_build_finished(app: "Sphinx", exception: Optional[Exception]):
+    if cache := getattr(app, "stub_docs_parse_cache", None):
+        log.info(
+            f"[stub_docs] parse cache: {cache.hits} hits, {cache.misses} misses, {cache.evictions} evicted, "
+            f"{cache.size / 1024:.0f} kB in {cache.cache_dir}"
+        )
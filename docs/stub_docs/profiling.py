@@ -0,0 +1,327 @@
+"""
+Opt-in profiling of the documentation build.
+
+Enable with `stub_docs_profile = True` in conf.py, or by setting the STUB_DOCS_PROFILE environment variable to 1, true or yes.
+
+Records:
+- the duration of the build phases: module copying, autoapi (parse, map, render), read and write
+- the call count and time of every event handler, of all extensions and of conf.py
+- the parse time per stub file and the docstring processing time per module
+- the peak memory use
+
+At `build-finished` a summary table is logged, and written with a Chrome trace (chrome://tracing, https://ui.perfetto.dev)
+to `stub_docs_profile.json` and `stub_docs_trace.json` in the output folder.
+The profile is kept on the build environment, so the timings of parallel readers are merged back.
+The handlers that run in parallel writers are not included.
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+import sphinx.util.logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .autoapi_patches import patch_mapper, patch_method
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
+    from sphinx.config import Config
+    from sphinx.environment import BuildEnvironment
+
+log = sphinx.util.logging.getLogger(__name__)
+
+# only calls that take longer than this are added to the trace as individual events
+TRACE_THRESHOLD = 0.0001
+
+
+@dataclass
+class Timing:
+    count: int = 0
+    seconds: float = 0.0
+
+    def add(self, seconds: float, count: int = 1):
+        self.count += count
+        self.seconds += seconds
+
+
+class BuildProfile:
+    """Timings collected during a build, per process"""
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.id = uuid.uuid4().hex
+        # (name, category, start, duration) with start in seconds since the epoch
+        self.events: List[Tuple[str, str, float, float]] = []
+        self.phases: Dict[str, Timing] = {}
+        self.handlers: Dict[str, Timing] = {}
+        self.modules: Dict[str, Timing] = {}
+        self.peak_memory = 0
+        self._open: Dict[str, float] = {}
+        self.merged: Set[int] = set()
+
+    def begin(self, phase: str):
+        self._open[phase] = time.time()
+
+    def end(self, phase: str):
+        if (start := self._open.pop(phase, None)) is not None:
+            self.add_phase(phase, start, time.time() - start)
+
+    def add_phase(self, phase: str, start: float, seconds: float):
+        self.phases.setdefault(phase, Timing()).add(seconds)
+        self.events.append((phase, "phase", start, seconds))
+
+    def add_call(self, table: Dict[str, Timing], name: str, category: str, start: float, seconds: float):
+        table.setdefault(name, Timing()).add(seconds)
+        if seconds >= TRACE_THRESHOLD:
+            self.events.append((name, category, start, seconds))
+
+    def add_docstring(self, name: str, start: float, seconds: float):
+        """The time spent processing the docstring of a module or package"""
+        self.add_call(self.modules, f"docstring: {name}", "module", start, seconds)
+
+    def merge(self, other: "BuildProfile"):
+        """Add the timings of a parallel reader"""
+        if other.id == self.id or other.id in self.merged:
+            return
+        self.merged.add(other.id)
+        for table, other_table in (
+            (self.handlers, other.handlers),
+            (self.modules, other.modules),
+        ):
+            for name, timing in other_table.items():
+                table.setdefault(name, Timing()).add(timing.seconds, timing.count)
+        self.events.extend((name, f"{category} (pid {other.pid})", start, sec) for name, category, start, sec in other.events)
+        self.peak_memory = max(self.peak_memory, other.peak_memory)
+
+    def update_peak_memory(self):
+        if resource:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # kB on Linux, bytes on macOS
+            self.peak_memory = max(self.peak_memory, peak if sys.platform == "darwin" else peak * 1024)
+        elif tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+
+    def summary(self, top: int = 15) -> Dict[str, Any]:
+        def table(timings: Dict[str, Timing], n: Optional[int] = None):
+            rows = sorted(timings.items(), key=lambda item: item[1].seconds, reverse=True)
+            return [{"name": name, "count": t.count, "seconds": round(t.seconds, 6)} for name, t in rows[:n]]
+
+        return {
+            "peak_memory_mb": round(self.peak_memory / 1024 / 1024, 1),
+            "phases": [
+                {"name": name, "count": t.count, "seconds": round(t.seconds, 6)} for name, t in self.phases.items()
+            ],
+            "handlers": table(self.handlers),
+            "modules": table(self.modules, top),
+        }
+
+    def summary_table(self, top: int = 15) -> str:
+        summary = self.summary(top)
+        lines = [f"[stub_docs] build profile, peak memory {summary['peak_memory_mb']} MB"]
+        for title in ("phases", "handlers", "modules"):
+            rows = summary[title][:top]
+            if not rows:
+                continue
+            width = max(len(r["name"]) for r in rows)
+            lines.append(f"  {title:<{width}} {'calls':>8} {'seconds':>10}")
+            lines.extend(f"  {r['name']:<{width}} {r['count']:>8} {r['seconds']:>10.3f}" for r in rows)
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """The events in the Chrome trace event format"""
+        t0 = min((start for _, _, start, _ in self.events), default=0)
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": round((start - t0) * 1e6),
+                    "dur": round(seconds * 1e6),
+                    "pid": self.pid,
+                    "tid": 0 if category == "phase" else 1,
+                }
+                for name, category, start, seconds in self.events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+
+def current_profile(app: "Sphinx") -> Optional[BuildProfile]:
+    env = getattr(app, "env", None)
+    profile = getattr(env, "stub_docs_profile", None)
+    if profile is not None and profile.pid != os.getpid():
+        # a forked parallel reader, start empty so that merging does not count the parent twice
+        profile = env.stub_docs_profile = BuildProfile()
+    return profile
+
+
+def handler_name(handler) -> str:
+    name = getattr(handler, "__qualname__", None) or type(handler).__name__
+    return f"{getattr(handler, '__module__', '?')}.{name}"
+
+
+def timed_handler(event: str, handler):
+    """Wrap an event handler to record its call count and duration"""
+    name = f"{event}: {handler_name(handler)}"
+
+    @functools.wraps(handler)
+    def wrapper(app, *args, **kwargs):
+        profile = current_profile(app)
+        if profile is None:
+            return handler(app, *args, **kwargs)
+        start = time.time()
+        t = time.perf_counter()
+        try:
+            return handler(app, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - t
+            profile.add_call(profile.handlers, name, "handler", start, seconds)
+            if event == "autodoc-process-docstring" and args and args[0] in {"module", "package"}:
+                # what, name
+                profile.add_docstring(args[1], start, seconds)
+
+    wrapper.stub_docs_timed = True
+    return wrapper
+
+
+def parse_label(path, **kwargs) -> str:
+    return f"parse: {Path(path).parent.name}/{Path(path).name}"
+
+
+def timed_method(method, label):
+    """Wrap a method of an autoapi class to record its duration as a phase or per module"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profile = current_profile(self.app)
+        if profile is None:
+            return method(self, *args, **kwargs)
+        start = time.time()
+        t = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - t
+            if callable(label):
+                profile.add_call(profile.modules, label(*args, **kwargs), "module", start, seconds)
+            else:
+                profile.add_phase(label, start, seconds)
+
+    return wrapper
+
+
+def is_timed(handler) -> bool:
+    # or profiling its own phases
+    return getattr(handler, "stub_docs_timed", False) or getattr(handler, "__module__", None) == __name__
+
+
+def timed_connect(connect):
+    """Wrap `EventManager.connect` of a build, so that the handlers that are connected later are timed as well"""
+
+    @functools.wraps(connect)
+    def connect_timed(name: str, callback, priority: int) -> int:
+        return connect(name, callback if is_timed(callback) else timed_handler(name, callback), priority)
+
+    return connect_timed
+
+
+def instrument_listeners(app: "Sphinx"):
+    """Time the event handlers that are connected, and those that are connected later"""
+    for event, listeners in app.events.listeners.items():
+        listeners[:] = [
+            listener if is_timed(listener.handler) else listener._replace(handler=timed_handler(event, listener.handler))
+            for listener in listeners
+        ]
+    patch_method(app.events, "connect", timed_connect, "stub_docs_timed")
+
+
+def instrument(app: "Sphinx"):
+    """Time all the event handlers, and the autoapi stages"""
+    instrument_listeners(app)
+    patch_mapper("read_file", lambda method: timed_method(method, parse_label), "stub_docs_timed")
+    patch_mapper("map", lambda method: timed_method(method, "autoapi map"), "stub_docs_timed")
+    patch_mapper("output_rst", lambda method: timed_method(method, "autoapi render"), "stub_docs_timed")
+
+
+def on_config_inited(app: "Sphinx", config: "Config"):
+    if not config.stub_docs_profile:
+        return
+    if not resource and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    instrument(app)
+    app.stub_docs_profile_started = time.time()
+
+
+def on_builder_inited(app: "Sphinx"):
+    """Start a fresh profile, the environment may have been loaded from a previous build"""
+    if not app.config.stub_docs_profile:
+        app.env.stub_docs_profile = None
+        return
+    profile = app.env.stub_docs_profile = BuildProfile()
+    # conf.py runs before the extension is loaded, it can pass the time it spent copying modules
+    for label, seconds in app.config.stub_docs_copy_timings.items():
+        profile.phases[f"copy modules: {label}"] = Timing(1, seconds)
+    started = getattr(app, "stub_docs_profile_started", time.time())
+    profile.add_phase("setup", started, time.time() - started)
+    profile.begin("builder-inited")
+
+
+def phase_marker(action: str, phase: str):
+    def marker(app: "Sphinx", *args):
+        if profile := current_profile(app):
+            getattr(profile, action)(phase)
+            profile.update_peak_memory()
+
+    marker.__name__ = f"{action}_{phase.replace('-', '_').replace(' ', '_')}"
+    return marker
+
+
+def on_env_merge_info(app: "Sphinx", env: "BuildEnvironment", docnames: Set[str], other: "BuildEnvironment"):
+    if (profile := getattr(env, "stub_docs_profile", None)) and (other_profile := getattr(other, "stub_docs_profile", None)):
+        profile.merge(other_profile)
+
+
+def on_build_finished(app: "Sphinx", exception: Optional[Exception]):
+    profile = current_profile(app)
+    if profile is None:
+        return
+    profile.end("write")
+    profile.update_peak_memory()
+    log.info(profile.summary_table())
+    outdir = Path(app.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    with open(outdir / "stub_docs_profile.json", "w", encoding="utf-8") as f:
+        json.dump(profile.summary(top=1000), f, indent=1)
+    with open(outdir / "stub_docs_trace.json", "w", encoding="utf-8") as f:
+        json.dump(profile.chrome_trace(), f)
+    log.info(f"[stub_docs] profile written to {outdir / 'stub_docs_profile.json'} and {outdir / 'stub_docs_trace.json'}")
+
+
+def setup_profiling(app: "Sphinx"):
+    # STUB_DOCS_PROFILE=1, true or yes, not 0
+    enabled = os.getenv("STUB_DOCS_PROFILE", "").strip().lower() in {"1", "true", "yes"}
+    app.add_config_value("stub_docs_profile", enabled, "", types=[bool])
+    # {label: seconds} for work done in conf.py, before the extension is loaded
+    app.add_config_value("stub_docs_copy_timings", {}, "", types=[dict])
+
+    app.connect("config-inited", on_config_inited, priority=900)
+    app.connect("builder-inited", on_builder_inited, priority=0)
+    app.connect("builder-inited", phase_marker("end", "builder-inited"), priority=999)
+    app.connect("env-before-read-docs", phase_marker("begin", "read"), priority=0)
+    app.connect("env-merge-info", on_env_merge_info)
+    app.connect("env-updated", phase_marker("end", "read"), priority=0)
+    app.connect("env-updated", phase_marker("begin", "write"), priority=999)
+    app.connect("build-finished", on_build_finished, priority=999)
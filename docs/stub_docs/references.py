@@ -0,0 +1,134 @@
+"""
+Resolve the references that the Sphinx domains could not resolve, with an alias table.
+
+The type hints in the stubs contain names that the domains do not resolve (`_typeshed.Incomplete`, `AbstractBlockDev` ...).
+`stub_docs_reference_aliases` maps such a target to another target, or drops the reference by mapping it to an empty string,
+so that it is rendered as its text without being looked up.
+The missing-reference handler runs ahead of intersphinx: an aliased target is resolved with the domains,
+and otherwise passed on to intersphinx, that resolves it and all other targets itself.
+The aliased targets that the domains do not resolve are cached, so that they are only looked up once.
+
+Missing `any` references are rendered as their text without a warning, this allows us to use `any` as a type hint.
+The targets that are not resolved are counted, so the most frequent ones can be reported, or added to the alias table.
+Only the references that Sphinx warns about are counted, all of them with `nitpicky = True`.
+"""
+
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+import sphinx.util.logging
+
+if TYPE_CHECKING:
+    from docutils.nodes import Element, TextElement
+    from sphinx.addnodes import pending_xref
+    from sphinx.application import Sphinx
+    from sphinx.domains import Domain
+    from sphinx.environment import BuildEnvironment
+
+log = sphinx.util.logging.getLogger(__name__)
+
+
+class ReferenceAliases:
+    """The alias table of a build, and the counts of the missing references"""
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None) -> None:
+        self.aliases = aliases or {}
+        # the aliased references that the domains did not resolve
+        self.misses: Set[Tuple] = set()
+        self.unresolved: Counter = Counter()
+        self.counts: Counter = Counter()
+        self.cache_hits = 0
+
+    @staticmethod
+    def key(node: "pending_xref", target: str) -> Tuple:
+        return (node.get("refdomain"), node["reftype"], target, node.get("py:module"), node.get("py:class"))
+
+    def resolve(
+        self, app: "Sphinx", env: "BuildEnvironment", node: "pending_xref", contnode: "TextElement"
+    ) -> Optional["Element"]:
+        """
+        The text of a dropped reference, or the reference to the target of an alias.
+        An alias that the domains do not resolve replaces the target of the node, for intersphinx.
+        """
+        target = node["reftarget"]
+        if target not in self.aliases:
+            return None
+        if not (alias := self.aliases[target]):
+            self.counts["dropped"] += 1
+            return contnode
+        key = self.key(node, alias)
+        if key in self.misses:
+            self.cache_hits += 1
+        elif (reference := resolve_with_domains(app, env, node, alias, contnode)) is not None:
+            self.counts["aliased"] += 1
+            return reference
+        else:
+            self.misses.add(key)
+        self.counts["forwarded"] += 1
+        node["reftarget"] = alias
+        return None
+
+    def most_unresolved(self, n: int = 10) -> List[Tuple[str, int]]:
+        return self.unresolved.most_common(n)
+
+
+def resolve_with_domains(
+    app: "Sphinx", env: "BuildEnvironment", node: "pending_xref", target: str, contnode: "TextElement"
+) -> Optional["Element"]:
+    """Resolve a target with the domains, in the same way as Sphinx resolves the reference"""
+    if node["reftype"] == "any":
+        for domain in env.domains.sorted():
+            if results := domain.resolve_any_xref(env, node["refdoc"], app.builder, target, node, contnode):
+                return results[0][1]
+        return None
+    if not (domain_name := node.get("refdomain")) or domain_name not in env.domains:
+        return None
+    domain: "Domain" = env.get_domain(domain_name)
+    return domain.resolve_xref(env, node["refdoc"], app.builder, node["reftype"], target, node, contnode)
+
+
+def on_builder_inited(app: "Sphinx"):
+    app.stub_docs_references = ReferenceAliases(app.config.stub_docs_reference_aliases)
+
+
+def on_missing_reference(app: "Sphinx", env: "BuildEnvironment", node: "pending_xref", contnode: "TextElement"):
+    """Resolve or drop an aliased reference, before intersphinx tries to"""
+    # https://www.sphinx-doc.org/en/master/extdev/event_callbacks.html#event-missing-reference
+    if (aliases := getattr(app, "stub_docs_references", None)) is None:
+        return None
+    return aliases.resolve(app, env, node, contnode)
+
+
+def on_warn_missing_reference(app: "Sphinx", domain: Optional["Domain"], node: "pending_xref"):
+    """
+    Count a reference that nothing resolved, and do not warn about a missing `any` reference,
+    this allows us to use `any` as a type hint without sphinx complaining.
+    """
+    # https://github.com/sphinx-doc/sphinx/issues/2709
+    if aliases := getattr(app, "stub_docs_references", None):
+        aliases.counts["unresolved"] += 1
+        aliases.unresolved[node["reftarget"]] += 1
+    return True if node["reftype"] == "any" else None
+
+
+def on_build_finished(app: "Sphinx", exception: Optional[Exception]):
+    aliases: Optional[ReferenceAliases] = getattr(app, "stub_docs_references", None)
+    if aliases is None or not aliases.counts:
+        return
+    counts = ", ".join(f"{n} {kind}" for kind, n in sorted(aliases.counts.items()))
+    log.info(f"[stub_docs] missing references: {counts}, {aliases.cache_hits} from the cache")
+    if top := aliases.most_unresolved(app.config.stub_docs_unresolved_report):
+        log.info("[stub_docs] most frequent unresolved targets: " + ", ".join(f"{t} ({n})" for t, n in top))
+
+
+def setup_references(app: "Sphinx"):
+    # target -> target, or "" to render the reference as text
+    app.add_config_value("stub_docs_reference_aliases", {}, "env", types=[dict])
+    # the number of unresolved targets to report
+    app.add_config_value("stub_docs_unresolved_report", 10, "", types=[int])
+
+    app.connect("builder-inited", on_builder_inited)
+    # ahead of intersphinx, that gets the target of an alias that the domains do not resolve
+    app.connect("missing-reference", on_missing_reference, priority=400)
+    app.connect("warn-missing-reference", on_warn_missing_reference)
+    app.connect("build-finished", on_build_finished)
@@ -0,0 +1,201 @@
+"""
+Rule sets that revert the changes that stubber makes to the docstrings.
+
+The rules are loaded from TOML files, by default from `reverts.toml` next to this module,
+and compiled by the RevertEngine into a single scan of each line.
+"""
+
+import functools
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+DEFAULT_RULES_FILE = Path(__file__).with_name("reverts.toml")
+
+
+class RevertRuleError(ValueError):
+    """A rule file that cannot be read, or a rule that is not valid"""
+
+
+@dataclass(frozen=True)
+class RevertRule:
+    name: str
+    # a regex, the literal text at the start of it is used to find the lines that the rule applies to
+    pattern: str
+    replace: str = ""
+    # remove the matching line, and the blank line after it, rather than replacing the match
+    remove: bool = False
+    # only apply to the first matching line of a docstring
+    once: bool = False
+
+
+def load_rules(*paths: Path, rules: Sequence[RevertRule] = ()) -> List[RevertRule]:
+    """
+    Load the rules from TOML files, in order.
+    A rule with the same name as an earlier rule replaces it, or removes it with `enabled = false`.
+    """
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        import tomli as tomllib
+
+    by_name: Dict[str, RevertRule] = {rule.name: rule for rule in rules}
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError) as e:
+            raise RevertRuleError(f"{path}: {e}") from e
+        for n, entry in enumerate(data.get("rules", []), start=1):
+            entry = dict(entry)
+            name = entry.setdefault("name", f"{Path(path).stem}-{n}")
+            if not entry.pop("enabled", True):
+                by_name.pop(name, None)
+                continue
+            try:
+                rule = RevertRule(**entry)
+                re.compile(rule.pattern)
+            except (TypeError, re.error) as e:
+                raise RevertRuleError(f"{path}: rule {name}: {e}") from e
+            # a replaced rule keeps its position
+            by_name[name] = rule
+    return list(by_name.values())
+
+
+@functools.lru_cache(maxsize=None)
+def default_rules() -> Tuple[RevertRule, ...]:
+    return tuple(load_rules(DEFAULT_RULES_FILE))
+
+
+class RevertEngine:
+    """
+    Compiled form of a set of revert rules.
+
+    All rules are checked in a single scan over each line.
+    A combined regex of the literal text that each rule needs finds the rules that can apply to a line,
+    so the (many) lines without stubber artifacts cost one regex search, regardless of the number of rules.
+    Rules without literal text are checked on every line.
+    Plain literal rules are applied with `str.replace` rather than `re.sub`.
+
+    The number of lines that each rule changed, and the time spent on it, are counted.
+    The time of the scan itself is not, to keep the lines without stubber artifacts cheap.
+    """
+
+    REGEX_META = set(".^$*+?{}[]\\|()")
+    QUANTIFIERS = set("*+?{")
+
+    def __init__(self, rules: Iterable[Union[RevertRule, Tuple[str, str]]]):
+        self.rules = [
+            rule if isinstance(rule, RevertRule) else RevertRule(f"rule-{n}", *rule) for n, rule in enumerate(rules)
+        ]
+        # (literal, compiled pattern or None, replacement) per rule
+        self.compiled: List[Tuple[str, Optional[re.Pattern], str]] = []
+        for rule in self.rules:
+            literal = self.literal_prefix(rule.pattern)
+            if literal == rule.pattern and "\\" not in rule.replace and not rule.remove:
+                self.compiled.append((literal, None, rule.replace))
+            else:
+                self.compiled.append((literal, re.compile(rule.pattern), rule.replace))
+        # the rules that must be checked on every line
+        self.fallback = [n for n, (literal, _, _) in enumerate(self.compiled) if not literal]
+        # literal -> the rules whose literal is present when it is found, the shorter literals within it included
+        literals = sorted({literal for literal, _, _ in self.compiled if literal}, key=lambda s: (-len(s), s))
+        self.dispatch: Dict[str, List[int]] = {
+            literal: [n for n, (other, _, _) in enumerate(self.compiled) if other and other in literal]
+            for literal in literals
+        }
+        # a cheap check for the lines without any literal, most lines
+        self.prefilter = re.compile("|".join(re.escape(s) for s in literals)) if literals else None
+        # a lookahead finds the literals at every position, also when they overlap
+        self.scanner = re.compile("(?=(" + "|".join(re.escape(s) for s in literals) + "))") if literals else None
+        self.hits = [0] * len(self.rules)
+        self.seconds = [0.0] * len(self.rules)
+        self.lines = 0
+
+    @classmethod
+    def literal_prefix(cls, pattern: str) -> str:
+        """The literal text at the start of a regex pattern, that must be present for the pattern to match"""
+        if "|" in pattern:
+            # an alternation does not need the prefix
+            return ""
+        # the literal after a start anchor must be present as well
+        pattern = pattern[1:] if pattern.startswith("^") else pattern
+        for i, c in enumerate(pattern):
+            if c in cls.REGEX_META:
+                # a quantifier applies to the preceding character
+                return pattern[: i - 1] if c in cls.QUANTIFIERS else pattern[:i]
+        return pattern
+
+    def candidates(self, line: str, start: int = 0) -> List[int]:
+        """The rules from `start` onwards that may apply to a line, in order"""
+        found = set(self.fallback)
+        if self.scanner:
+            for match in self.scanner.finditer(line):
+                found.update(self.dispatch[match.group(1)])
+        return sorted(n for n in found if n >= start)
+
+    def apply(self, lines: List[str]):
+        """Apply all rules to the lines of a docstring, in place"""
+        self.lines += len(lines)
+        if self.fallback or not self.prefilter:
+            todo = range(len(lines))
+        else:
+            search = self.prefilter.search
+            todo = [i for i, line in enumerate(lines) if search(line)]
+            if not todo:
+                return
+        removed = set()
+        applied_once = set()
+        for i in todo:
+            if i in removed:
+                continue
+            line = self.apply_line(lines[i], applied_once)
+            if line is None:
+                # remove the line, and the blank line after it
+                removed.add(i)
+                if i + 1 < len(lines) and lines[i + 1] == "":
+                    removed.add(i + 1)
+            else:
+                lines[i] = line
+        if removed:
+            lines[:] = [line for i, line in enumerate(lines) if i not in removed]
+
+    def apply_line(self, line: str, applied_once: Set[int]) -> Optional[str]:
+        """Apply the rules to a line, None if the line is removed"""
+        pending = self.candidates(line)
+        while pending:
+            n = pending.pop(0)
+            if n in applied_once:
+                continue
+            rule = self.rules[n]
+            literal, pattern, new = self.compiled[n]
+            started = time.perf_counter()
+            if rule.remove:
+                changed = bool(pattern.search(line))
+            elif pattern is None:
+                changed = literal in line
+                if changed:
+                    line = line.replace(literal, new)
+            else:
+                line, count = pattern.subn(new, line)
+                changed = count > 0
+            self.seconds[n] += time.perf_counter() - started
+            if not changed:
+                continue
+            self.hits[n] += 1
+            if rule.once:
+                applied_once.add(n)
+            if rule.remove:
+                return None
+            # a replacement may introduce the literal of a later rule
+            pending = self.candidates(line, n + 1)
+        return line
+
+    def stats(self) -> List[Dict[str, Union[str, int, float]]]:
+        """The number of changed lines and the time spent, per rule"""
+        return [
+            {"name": rule.name, "hits": hits, "seconds": seconds}
+            for rule, hits, seconds in zip(self.rules, self.hits, self.seconds)
+        ]
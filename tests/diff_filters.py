@@ -0,0 +1,240 @@
+"""
+Filters for the differences between the web and the local version of a documentation page.
+
+Each filter takes a list of `difflib.ndiff` lines and returns the lines that remain.
+The filters that pair up lines (a `+` line with its `-` counterpart) use a `DiffIndex`,
+rather than scanning and removing from a list, so that they run in linear time on large pages.
+"""
+
+import re
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+DiffFilter = Callable[[List[str]], List[str]]
+
+# things to ignore in the diff
+LINE_JUNK = {
+    "\n",
+    "\t",
+    "This is the v1.23.0 version of the MicroPython",
+    "documentation. The latest",
+    "development version of this page may be more current.",
+    "This is the documentation for the latest development branch of",
+    "MicroPython and may refer to features that are not available in released",
+    "versions.",
+    "If you are looking for the documentation for a specific release, use",
+    "the drop-down menu on the left and select the desired version.",
+}
+
+# things to ignore in the diff
+LINE_MIP_TIP = {
+    "Tip",
+    "This is a python-stdlib module from the micropython-lib repository.",
+    "It can be installed to a MicroPython board using:",
+}
+
+IGNORE_HEADINGS = {
+    "- Additional functions",
+    "- Classes",
+    "- Configuration",
+    "- Constants",
+    "- Constructor",
+    "- Constructors",
+    "- Exceptions",
+    "- Functions",
+    "- Methods",
+}
+
+RE_DROP_CLASS = re.compile(r"([+-] (\w*? )?)(\w*\.)(.*)")  # r"([+-] )(\w+\.)(.*)"
+SUBST_DROP_CLASS = "\\g<1>\\g<4>"
+
+
+class DiffIndex:
+    """
+    A list of diff lines that supports the lookups of the filters in constant time.
+
+    It behaves as the list that the filters used to modify:
+    - `line in index` is True while an occurrence of line has not been removed
+    - `remove(line)` removes the first remaining occurrence of line, and ignores lines that are not present
+    - `first_call(head)` returns the first remaining line that starts with `{head}(`
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self.lines = list(lines)
+        self.alive = [True] * len(self.lines)
+        self.count = Counter(self.lines)
+        # occurrences of each line, removals always take the first remaining one
+        self.positions: Dict[str, List[int]] = defaultdict(list)
+        self.next_position: Dict[str, int] = defaultdict(int)
+        # lines with a `(` by the text before it
+        self.calls: Dict[str, List[int]] = defaultdict(list)
+        self.next_call: Dict[str, int] = defaultdict(int)
+        for i, line in enumerate(self.lines):
+            self.positions[line].append(i)
+            if "(" in line:
+                self.calls[line.split("(", 1)[0]].append(i)
+
+    def __contains__(self, line: str) -> bool:
+        return self.count[line] > 0
+
+    def remove(self, line: str):
+        if self.count[line] <= 0:
+            return
+        n = self.next_position[line]
+        self.alive[self.positions[line][n]] = False
+        self.next_position[line] = n + 1
+        self.count[line] -= 1
+
+    def first_call(self, head: str) -> Optional[str]:
+        """The first remaining line that starts with `{head}(`, head must not contain a `(`"""
+        positions = self.calls.get(head)
+        if not positions:
+            return None
+        n = self.next_call[head]
+        while n < len(positions) and not self.alive[positions[n]]:
+            n += 1
+        self.next_call[head] = n
+        return self.lines[positions[n]] if n < len(positions) else None
+
+    def to_list(self) -> List[str]:
+        return [line for line, alive in zip(self.lines, self.alive) if alive]
+
+
+def opp_change(l):
+    # + -> - and - -> +
+    return "+" if l[0] == "-" else "-"
+
+
+def ignore_version_notice(diff_lines: List[str]):
+    return [
+        l
+        for l in diff_lines
+        if l[0] not in " ?" and l[1:].strip() != "" and l[1:].strip() not in LINE_JUNK
+    ]
+
+
+def ignore_mip_tip(diff_lines: List[str]):
+    return [
+        l
+        for l in diff_lines
+        if not (
+            l[1:].strip() in LINE_MIP_TIP
+            or l[2:].startswith("mpremote mip install")
+            or l[2:].startswith(
+                "Source: https://github.com/micropython/micropython-lib/tree/master"
+            )
+            # the version and license from the package manifest
+            or l.startswith(("+ Version ", "+ License "))
+        )
+    ]
+
+
+def ignore_known_headings(diff_lines: List[str]):
+    return [l for l in diff_lines if l not in IGNORE_HEADINGS]
+
+
+def ignore_moves(result: List[str]):
+    """remove all the lines that appear with both a + and a - prefix (they are line-moves / re-orderings)"""
+    index = DiffIndex(result)
+    for l in result:
+        opposite = f"- {l[2:]}" if l.startswith("+ ") else f"+ {l[2:]}"
+        if opposite in index:
+            index.remove(l)
+            index.remove(opposite)
+    return index.to_list()
+
+
+def ignore_assignments(diff_lines: List[str]):
+    """
+    Ignore lines that are assignments of the form `+ x = ...`
+    but only if the line is also present in the opposite form without the value.
+
+    """
+    index = DiffIndex(diff_lines)
+    for l in diff_lines:
+        if l.startswith("+ ") and "=" in l:
+            partial = l.split("=")[0].strip()
+            opposite = f"- {partial[2:]}"
+            if opposite in index:
+                index.remove(l)
+                index.remove(opposite)
+    return index.to_list()
+
+
+def allow_new_data_assignments(diff_lines: List[str]):
+    return [
+        l
+        for l in diff_lines
+        if not (
+            l.startswith("+ ")
+            and "=" in l
+            # and l[2:].strip().startswith(("b'", "u'", "f'", "r'", '"', "'"))
+        )
+    ]
+
+
+def allow_different_parameters(diff_lines: List[str]):
+    """
+    functions, methods and classes can have different parameters in the local and web versions
+    Does not deal with the case where the parameters are in a separate line ....
+    """
+    index = DiffIndex(diff_lines)
+    for l in diff_lines:
+        if "(" in l:
+            partial = l.split("(")[0].strip()
+            opposite = f"{opp_change(l)} {partial[2:]}"
+            if opposite in index:
+                index.remove(l)
+                index.remove(opposite)
+            elif l2 := index.first_call(opposite):
+                # also remove if the params dont match
+                index.remove(l)
+                index.remove(l2)
+    return index.to_list()
+
+
+def allow_omit_class_different_parameters(diff_lines: List[str]):
+    """
+    functions, methods and classes can have different parameters in the local and web versions
+    Does not deal with the case where the parameters are in a separate line ....
+
+    """
+    index = DiffIndex(diff_lines)
+    for line in diff_lines:
+        # get rid of any class name
+        l_short = RE_DROP_CLASS.sub(SUBST_DROP_CLASS, line)
+
+        opposite = f"{opp_change(l_short)} {l_short[2:]}"
+        if opposite in index:
+            index.remove(line)
+            index.remove(opposite)
+        elif oppo2 := index.first_call(opposite.split("(")[0]):
+            # also remove if the params dont match
+            index.remove(line)
+            index.remove(oppo2)
+    return index.to_list()
+
+
+DIFF_FILTERS: List[DiffFilter] = [
+    ignore_version_notice,
+    ignore_mip_tip,
+    # There are fewer headings in the autoapimodule ( TODO: could be added in the template )
+    ignore_known_headings,
+    # remove all the lines that appear with both a + and a - prefix (they are line-moves / re-orderings)
+    ignore_moves,
+    # the stubs have more precise parameter information, so likely to be different
+    allow_different_parameters,
+    allow_omit_class_different_parameters,
+    # the subs have values for data, so likely to be different
+    ignore_assignments,
+    # there are some assignments that are not present in the web version
+    allow_new_data_assignments,
+]
+
+
+def filter_diff(diff_lines: Iterable[str], filters: Iterable[DiffFilter] = DIFF_FILTERS) -> List[str]:
+    """Run the diff lines through a pipeline of filters"""
+    result = list(diff_lines)
+    for diff_filter in filters:
+        result = diff_filter(result)
+    return result
@@ -0,0 +1,335 @@
+"""
+Compare the locally generated documentation pages with the published pages.
+
+usage: python tests/page_compare.py --build docs/build/html --version v1.23.0 --report report.json
+
+The comparisons are independent of each other, so they can run in parallel:
+either in a process pool with `compare_pages`, or across pytest-xdist workers.
+All files are written under a name that is unique to the page, and are replaced atomically.
+"""
+
+import argparse
+import csv
+import difflib
+import json
+import os
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from diff_filters import filter_diff
+from page_fetcher import PageFetcher
+
+# shared by all comparisons in a process, pages are cached on disk between sessions
+FETCHER = PageFetcher.from_env()
+
+CHECKS_DIR = Path("checks")
+DEBUG_DIR = CHECKS_DIR / "debug"
+VERSION = "v1.23.0"
+
+
+def normalize_and_clean(text):
+    # Normalize the text to NFC form
+    normalized_text = unicodedata.normalize("NFC", text)
+    # Remove specific characters
+    cleaned_text = normalized_text.replace("\uf0c1", "").replace("¶", "")
+    return cleaned_text
+
+
+def read_html(file: Path):
+    with open(file, "r", encoding="utf-8") as fp:
+        return fp.read()
+
+
+def fetch_html(url: str):
+    return normalize_and_clean(FETCHER.fetch(url))
+
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# this is the most relevant section of a Sphinx-generated HTML page
+# that contains the actual documentation content
+SELECTOR = "body > div > section > div > div > div.document"
+
+
+def strainer_for(selector: str):
+    """
+    Only build the tree for the last element of the selector, and its children,
+    rather than for the whole page.
+    `div.document` -> SoupStrainer("div", class_="document")
+    """
+    tag, *classes = selector.split(">")[-1].strip().split(".")
+    return SoupStrainer(tag or None, class_=classes[0] if classes else None)
+
+
+def extract_element_text(html_content, selector):
+    last = selector.split(">")[-1].strip()
+    soup = BeautifulSoup(html_content, HTML_PARSER, parse_only=strainer_for(selector))
+    element = soup.select_one(last)
+    return normalize_and_clean(element.get_text()) if element else ""
+
+
+@lru_cache(maxsize=None)
+def page_lines(source: str, selector: str = SELECTOR) -> Tuple[str, ...]:
+    """
+    The lines of text in the selected section of a page, parsed once per page.
+    source is either a url, or the path of a local file.
+    """
+    if source.startswith(("http://", "https://")):
+        html_content = fetch_html(source)
+    else:
+        html_content = read_html(Path(source))
+    return tuple(extract_element_text(html_content, selector).splitlines())
+
+
+def load_pages(file1: Path, url: str):
+    """The (web, local) lines to compare"""
+    return list(page_lines(url)), list(page_lines(str(file1)))
+
+
+def find_title(lines: List[str]):
+    """Find the title of the module in the documentation
+    assumes that the title is the first line that is not indented or empty
+    and that the title is separated from the module name by a dash or en-dash::
+
+        foo - Description of foo
+
+    """
+    title_line = module_name = title = ""
+    for line in lines:
+        if line and not line.startswith(" "):
+            title_line = line
+            break
+    # BEWARE : "–" is not the same as "-" (en-dash vs hyphen)
+    if title_line:
+        for sep in ["–", "-"]:
+            if sep in title_line:
+                module_name, title = title_line.split(sep, 1)
+                module_name = module_name.strip()
+                title = title.strip()
+                break
+
+    return module_name, title, title_line
+
+
+def write_file(path: Path, content: str):
+    """Write a file atomically, so that parallel workers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def compare_html(file1: Path, url: str, ignore_title=True, debug_dir: Optional[Path] = DEBUG_DIR):
+    lines_web, lines_local = load_pages(file1, url)
+    if debug_dir:
+        # write to a file for debugging, one pair per page
+        name = Path(urlsplit(url).path).stem
+        write_file(debug_dir / f"{name}-web.txt", "\n".join(lines_web))
+        write_file(debug_dir / f"{name}-local.txt", "\n".join(lines_local))
+
+    module_name, title, title_line = find_title(lines_local)
+
+    diff = difflib.ndiff(
+        lines_web,
+        lines_local,
+    )
+
+    result = filter_diff(diff)
+
+    if ignore_title:
+        # The stubs have the title of the docpage in the first line, so we can ignore it
+        for t_diff in [f"+ {title.capitalize()}.", f"+ {title}"]:
+            if t_diff in result:
+                result.remove(t_diff)
+                break
+    return result
+
+
+def simularity(file1: Path, url: str, ignore_title=True):
+    lines_web, lines_local = load_pages(file1, url)
+
+    sim = difflib.SequenceMatcher(None, lines_web, lines_local).ratio()
+    return sim
+
+
+def library_pages(docs_path: Path = Path("docs")) -> List[str]:
+    """The library pages that are (partly) generated by autoapi"""
+    autoapifiles = []
+    for f in sorted((docs_path / "library").glob("*.rst")):
+        with f.open(encoding="utf-8") as fp:
+            content = fp.read()
+        if "autoapi" in content:
+            autoapifiles.append(f.relative_to(docs_path).with_suffix("").as_posix())
+    return autoapifiles
+
+
+def page_url(page: str, version: str = VERSION):
+    return f"https://docs.micropython.org/en/{version}/{page}.html"
+
+
+def write_checklist(page: str, diff: List[str], checks_dir: Path = CHECKS_DIR):
+    """write a tasklist to the "check-{page}.md" file"""
+    missing = [l for l in diff if l.startswith("- ")]
+    extras = [l for l in diff if l.startswith("+ ")]
+    content = f"# checklist for {page}\n\n"
+    content += "## Missing:\n"
+    content += "\n".join(f"- [ ] {line}" for line in missing)
+    content += "\n## Extras:\n"
+    content += "\n".join(f"- [ ] {line}" for line in extras)
+    write_file(checks_dir / f"check-{page.replace('/','-')}.md", content)
+
+
+@dataclass
+class PageResult:
+    """The outcome of comparing one page"""
+
+    page: str
+    missing: List[str] = field(default_factory=list)
+    extras: List[str] = field(default_factory=list)
+    similarity: float = 0.0
+    seconds: float = 0.0
+    error: str = ""
+
+    def summary(self) -> dict:
+        """the counts rather than the lines, for the report"""
+        return {
+            "page": self.page,
+            "missing": len(self.missing),
+            "extras": len(self.extras),
+            "similarity": round(self.similarity, 4),
+            "seconds": round(self.seconds, 4),
+            "error": self.error,
+        }
+
+
+def compare_page(
+    page: str,
+    build_dir: Path,
+    version: str = VERSION,
+    checks_dir: Optional[Path] = CHECKS_DIR,
+) -> PageResult:
+    """Compare a single page, and write its checklist"""
+    start = time.perf_counter()
+    result = PageResult(page)
+    try:
+        local_page, url = build_dir / f"{page}.html", page_url(page, version)
+        diff = compare_html(
+            local_page,
+            url,
+            ignore_title=True,
+            debug_dir=checks_dir / "debug" if checks_dir else None,
+        )
+        # uses the same parsed pages as the diff
+        result.similarity = simularity(local_page, url)
+    except Exception as e:  # reported per page, a single page should not stop a batch
+        result.error = f"{type(e).__name__}: {e}"
+    else:
+        result.missing = [l for l in diff if l.startswith("- ")]
+        result.extras = [l for l in diff if l.startswith("+ ")]
+        if checks_dir:
+            write_checklist(page, diff, checks_dir)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def use_fetched_pages():
+    """In a worker, use the cached pages without revalidating them, they were fetched by compare_pages in this run"""
+    FETCHER.revalidate = False
+
+
+def compare_pages(
+    pages: Iterable[str],
+    build_dir: Path,
+    version: str = VERSION,
+    checks_dir: Optional[Path] = CHECKS_DIR,
+    workers: Optional[int] = None,
+) -> List[PageResult]:
+    """
+    Compare pages in parallel, using a process pool with one worker per core (by default).
+    The results are returned in the order of the pages.
+    """
+    pages = list(pages)
+    # download and revalidate once in this process, the workers read the pages from the on-disk cache
+    FETCHER.fetch_all(page_url(page, version) for page in pages)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pages) <= 1:
+        return [compare_page(page, build_dir, version, checks_dir) for page in pages]
+    with ProcessPoolExecutor(max_workers=min(workers, len(pages)), initializer=use_fetched_pages) as pool:
+        futures = [pool.submit(compare_page, page, build_dir, version, checks_dir) for page in pages]
+        return [f.result() for f in futures]
+
+
+def write_report(results: List[PageResult], report: Path, **meta):
+    """Write the results as a .json or .csv report"""
+    rows = [r.summary() for r in results]
+    report.parent.mkdir(parents=True, exist_ok=True)
+    if report.suffix.lower() == ".csv":
+        with open(report, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(PageResult("").summary()))
+            writer.writeheader()
+            writer.writerows(rows)
+        return
+    totals = {
+        "pages": len(rows),
+        "errors": sum(1 for r in rows if r["error"]),
+        "missing": sum(r["missing"] for r in rows),
+        "extras": sum(r["extras"] for r in rows),
+    }
+    write_file(report, json.dumps({**meta, "totals": totals, "pages": rows}, indent=2))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare a documentation build with the published pages.")
+    parser.add_argument("--build", type=Path, default=Path("docs/build/html"), help="the html build folder")
+    parser.add_argument("--version", default=VERSION, help="the published version to compare with")
+    parser.add_argument("--docs", type=Path, default=Path("docs"), help="the docs folder, to find the library pages")
+    parser.add_argument("--pages", nargs="*", help="the pages to compare, default: all library pages that use autoapi")
+    parser.add_argument("--report", type=Path, default=Path("checks/report.json"), help="a .json or .csv file")
+    parser.add_argument("--checks", type=Path, default=CHECKS_DIR, help="folder for the checklists")
+    parser.add_argument("--no-checks", action="store_true", help="do not write the checklists")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per core")
+    args = parser.parse_args(argv)
+
+    pages = args.pages or library_pages(args.docs)
+    start = time.perf_counter()
+    results = compare_pages(
+        pages,
+        args.build,
+        version=args.version,
+        checks_dir=None if args.no_checks else args.checks,
+        workers=args.workers,
+    )
+    elapsed = time.perf_counter() - start
+    write_report(
+        results,
+        args.report,
+        version=args.version,
+        build=args.build.as_posix(),
+        seconds=round(elapsed, 3),
+    )
+    errors = [r for r in results if r.error]
+    print(
+        f"compared {len(results)} pages in {elapsed:.1f}s: "
+        f"{sum(len(r.missing) for r in results)} missing, {sum(len(r.extras) for r in results)} extra lines, "
+        f"{len(errors)} errors -> {args.report}"
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Fetch the published documentation pages to compare the generated pages with.
+
+- pages are downloaded concurrently, using a bounded thread pool
+- responses are stored in an on-disk cache, and revalidated using their ETag / Last-Modified headers,
+  a fetcher with `revalidate=False` uses the cached copy as it is, for pages that were already fetched in this run
+- with an offline folder, pages are read from that folder and the network is never used
+
+Environment variables:
+    MPY_DOCS_CACHE      folder for the on-disk cache (default: tests/.page_cache)
+    MPY_DOCS_OFFLINE    folder with a local copy of the pages, laid out as <host>/<path>
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+# bump when the layout of the cache changes
+CACHE_VERSION = "v1"
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".page_cache"
+
+
+class PageFetcher:
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+        offline_dir: Optional[Path] = None,
+        max_workers: int = 8,
+        timeout: float = 30,
+        revalidate: bool = True,
+    ):
+        self.cache_dir = cache_dir / CACHE_VERSION if cache_dir else None
+        self.offline_dir = offline_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.revalidate = revalidate
+        self._pages: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "PageFetcher":
+        if cache_dir := os.getenv("MPY_DOCS_CACHE"):
+            kwargs.setdefault("cache_dir", Path(cache_dir))
+        if offline_dir := os.getenv("MPY_DOCS_OFFLINE"):
+            kwargs.setdefault("offline_dir", Path(offline_dir))
+        return cls(**kwargs)
+
+    @property
+    def session(self) -> requests.Session:
+        # requests.Session is not thread-safe, use one per thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def url_path(self, url: str) -> Path:
+        """relative path for a url: <host>/<path>"""
+        parts = urlsplit(url)
+        return Path(parts.netloc) / parts.path.lstrip("/")
+
+    def cache_files(self, url: str):
+        name = hashlib.sha256(url.encode()).hexdigest()[:16]
+        folder = self.cache_dir / self.url_path(url).parent
+        stem = f"{Path(urlsplit(url).path).stem}-{name}"
+        return folder / f"{stem}.html", folder / f"{stem}.json"
+
+    def fetch(self, url: str) -> str:
+        """Fetch the text of a page, from memory, the offline folder, the cache or the network"""
+        with self._lock:
+            if url in self._pages:
+                return self._pages[url]
+        text = self._read_offline(url) if self.offline_dir else self._download(url)
+        with self._lock:
+            self._pages[url] = text
+        return text
+
+    def fetch_all(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Fetch multiple pages concurrently.
+        Pages that cannot be fetched are left out, fetching them again with `fetch` will raise the error.
+        """
+        urls = list(dict.fromkeys(urls))
+        results: Dict[str, str] = {}
+
+        def _fetch(url):
+            try:
+                results[url] = self.fetch(url)
+            except (OSError, requests.RequestException):
+                pass
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(_fetch, urls))
+        return results
+
+    def _read_offline(self, url: str) -> str:
+        file = self.offline_dir / self.url_path(url)
+        if not file.is_file():
+            raise FileNotFoundError(f"{url} is not available offline in {self.offline_dir}")
+        return file.read_text(encoding="utf-8")
+
+    def _download(self, url: str) -> str:
+        cached_text, meta = self._read_cache(url)
+        if cached_text is not None and not self.revalidate:
+            return cached_text
+        headers = {}
+        if cached_text is not None:
+            if etag := meta.get("etag"):
+                headers["If-None-Match"] = etag
+            if last_modified := meta.get("last_modified"):
+                headers["If-Modified-Since"] = last_modified
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.ConnectionError:
+            if cached_text is not None:
+                # no network, but we have a copy
+                return cached_text
+            raise
+        if response.status_code == 304 and cached_text is not None:
+            return cached_text
+        response.raise_for_status()  # Ensure we notice bad responses
+        response.encoding = "utf-8"  # Set the encoding to utf-8
+        self._write_cache(url, response)
+        return response.text
+
+    def _read_cache(self, url: str):
+        if not self.cache_dir:
+            return None, {}
+        html_file, meta_file = self.cache_files(url)
+        try:
+            return html_file.read_text(encoding="utf-8"), json.loads(meta_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None, {}
+
+    def _write_cache(self, url: str, response: requests.Response):
+        if not self.cache_dir:
+            return
+        html_file, meta_file = self.cache_files(url)
+        html_file.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        # write to temp files first, so that concurrent sessions never read a partial page
+        for file, content in ((html_file, response.text), (meta_file, json.dumps(meta))):
+            tmp_file = file.with_name(f"{file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_file.write_text(content, encoding="utf-8")
+            os.replace(tmp_file, file)
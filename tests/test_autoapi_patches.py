@@ -0,0 +1,40 @@
+import functools
+
+from stub_docs.autoapi_patches import patch_method
+
+
+class FakeMapper:
+    def map(self):
+        return ["mapped"]
+
+
+def counted(calls: list):
+    def wrap(method):
+        @functools.wraps(method)
+        def wrapper(self):
+            calls.append(method.__name__)
+            return method(self)
+
+        return wrapper
+
+    return wrap
+
+
+def test_patch_method_once():
+    calls = []
+
+    assert patch_method(FakeMapper, "map", counted(calls), "stub_docs_batch")
+    # the next build in the same process
+    assert not patch_method(FakeMapper, "map", counted(calls), "stub_docs_batch")
+    # another patch keeps the marker of the first one
+    assert patch_method(FakeMapper, "map", counted(calls), "stub_docs_timed")
+    assert not patch_method(FakeMapper, "map", counted(calls), "stub_docs_batch")
+
+    assert FakeMapper().map() == ["mapped"]
+    assert calls == ["map", "map"]
+
+
+def test_patch_missing_method(caplog):
+    assert not patch_method(FakeMapper, "output_rst", counted([]), "stub_docs_changed_pages")
+    assert not hasattr(FakeMapper, "output_rst")
+    assert "FakeMapper.output_rst not found" in caplog.text
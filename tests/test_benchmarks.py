@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+from corpus import make_corpus  # noqa: E402
+from run_benchmarks import compare, read_results, write_results  # noqa: E402
+
+
+def test_make_corpus(tmp_path: Path):
+    stubs = tmp_path / "stubs"
+    (stubs / "machine").mkdir(parents=True)
+    (stubs / "machine" / "__init__.pyi").write_text('"""machine module."""\n')
+    (stubs / "machine" / "Pin.pyi").write_text('"""Pin module."""\nclass Pin:\n    """A pin."""\n')
+    (stubs / "time").mkdir()
+    (stubs / "time" / "__init__.pyi").write_text('"""time module."""\n')
+
+    corpus = make_corpus(2, tmp_path / "corpus", stubs)
+
+    assert sorted(p.name for p in corpus.stub_path.iterdir()) == ["machine", "machine_1", "time", "time_1"]
+    # a single file package is a module, the others have a manifest
+    assert (corpus.lib_path / "time_1" / "time_1.py").exists()
+    assert (corpus.lib_path / "machine_1" / "manifest.py").exists()
+    assert (corpus.lib_path / "machine_1" / "machine_1" / "Pin.py").exists()
+    assert [name for name, _ in corpus.module_docstrings] == [
+        "machine.Pin",
+        "machine",
+        "time",
+        "machine_1.Pin",
+        "machine_1",
+        "time_1",
+    ]
+    assert len(corpus.docstrings) == 8
+    assert sorted(corpus.origins) == ["machine", "time_1"]
+
+
+def test_regression_gate(tmp_path: Path):
+    baseline = {"a[1x]": {"seconds": 1.0}, "b[1x]": {"seconds": 1.0}}
+    results = {"a[1x]": {"seconds": 1.4}, "b[1x]": {"seconds": 1.6}, "c[1x]": {"seconds": 9.0}}
+
+    assert compare(results, baseline, 1.5) == [("b[1x]", 1.0, 1.6, 1.6)]
+
+    write_results(tmp_path / "baseline.json", {"a[1x]": {"seconds": 1.0}})
+    write_results(tmp_path / "baseline.json", {"b[1x]": {"seconds": 2.0}}, merge=True)
+    assert read_results(tmp_path / "baseline.json")["results"] == {"a[1x]": {"seconds": 1.0}, "b[1x]": {"seconds": 2.0}}
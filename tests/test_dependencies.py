@@ -0,0 +1,149 @@
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+from stub_docs.dependencies import (
+    changed_pages_output,
+    documented_packages,
+    on_source_read,
+    stub_packages,
+    unchanged_index_output,
+)
+
+
+class FakeConfig(SimpleNamespace):
+    def __iter__(self):
+        return (SimpleNamespace(name=name) for name in vars(self))
+
+
+class FakePage:
+    def __init__(self, mapper: "FakeMapper", name: str):
+        self.mapper = mapper
+        self.name = name
+
+    def render(self, **kwargs) -> str:
+        self.mapper.rendered.append(self.name)
+        return f"{self.name}\n"
+
+    def output_dir(self, root: Path) -> Path:
+        return root.joinpath(*self.name.split("."))
+
+    def output_filename(self) -> str:
+        return "index"
+
+
+class FakeMapper:
+    """Renders and writes the pages of the objects, like autoapi"""
+
+    def __init__(self, app, dir_root: Path, names):
+        self.app = app
+        self.dir_root = dir_root
+        self.rendered = []
+        self.objects_to_render = {name: FakePage(self, name) for name in names}
+
+    def output_rst(self, source_suffix):
+        for obj in self.objects_to_render.values():
+            if rst := obj.render(is_own_page=True):
+                obj.output_dir(self.dir_root).mkdir(parents=True, exist_ok=True)
+                (obj.output_dir(self.dir_root) / f"{obj.output_filename()}{source_suffix}").write_text(rst)
+
+
+def stubs(tmp_path: Path):
+    for path in ["machine/__init__.pyi", "machine/Pin.pyi", "vfs/__init__.pyi", "utime.pyi"]:
+        (tmp_path / "stubs" / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "stubs" / path).write_text(f"# {path}\n")
+    root = str(tmp_path / "stubs")
+    return [(root, str(path)) for path in sorted((tmp_path / "stubs").rglob("*.pyi"))]
+
+
+def fake_app(tmp_path: Path, source_files):
+    config = FakeConfig(stub_docs_skip_unchanged_pages=True, autoapi_root="modules", autoapi_template_dir="")
+    env = SimpleNamespace(autoapi_source_files=source_files, stub_docs_autoapi_refs={}, dependencies=[])
+    env.note_dependency = env.dependencies.append
+    return SimpleNamespace(config=config, env=env, srcdir=str(tmp_path))
+
+
+def test_stub_packages(tmp_path: Path):
+    packages = stub_packages(stubs(tmp_path))
+
+    assert sorted(packages) == ["machine", "utime", "vfs"]
+    assert [Path(p).name for p in packages["machine"]] == ["Pin.pyi", "__init__.pyi"]
+
+
+def test_only_changed_packages_are_rendered(tmp_path: Path):
+    source_files = stubs(tmp_path)
+    app = fake_app(tmp_path, source_files)
+    output_rst = changed_pages_output(FakeMapper.output_rst)
+    names = ["machine", "machine.Pin", "vfs", "utime"]
+
+    mapper = FakeMapper(app, tmp_path / "modules", names)
+    output_rst(mapper, ".rst")
+    assert mapper.rendered == names
+
+    (tmp_path / "stubs" / "machine" / "Pin.pyi").write_text("class Pin: ...\n")
+    (tmp_path / "modules" / "utime" / "index.rst").unlink()
+    mapper = FakeMapper(app, tmp_path / "modules", names)
+    output_rst(mapper, ".rst")
+    # the pages of the changed package, and the missing page
+    assert mapper.rendered == ["machine", "machine.Pin", "utime"]
+    # the objects render again in a next build
+    assert mapper.objects_to_render["vfs"].render() == "vfs\n"
+
+    app.config.autoapi_options = ["members"]
+    mapper = FakeMapper(app, tmp_path / "modules", names)
+    output_rst(mapper, ".rst")
+    assert mapper.rendered == names
+
+
+def test_only_changed_pages_are_written(tmp_path: Path):
+    app = fake_app(tmp_path, stubs(tmp_path))
+    output_rst = changed_pages_output(FakeMapper.output_rst)
+    names = ["machine", "vfs"]
+    output_rst(FakeMapper(app, tmp_path / "modules", names), ".rst")
+    pages = {name: tmp_path / "modules" / name / "index.rst" for name in names}
+    for page in pages.values():
+        os.utime(page, ns=(0, 0))
+    pages["vfs"].write_text("outdated\n")
+    os.utime(pages["vfs"], ns=(0, 0))
+
+    # a change of the settings renders all pages
+    app.config.autoapi_options = ["members"]
+    mapper = FakeMapper(app, tmp_path / "modules", names)
+    output_rst(mapper, ".rst")
+
+    assert mapper.rendered == names
+    assert pages["machine"].stat().st_mtime_ns == 0
+    assert pages["vfs"].read_text() == "vfs\n"
+    assert pages["vfs"].stat().st_mtime_ns > 0
+
+
+def test_unchanged_index_keeps_mtime(tmp_path: Path):
+    def output_top_rst(mapper):
+        (tmp_path / "index.rst").write_text(mapper.index)
+
+    mapper = SimpleNamespace(app=fake_app(tmp_path, []), dir_root=str(tmp_path), index="machine\n")
+    output_top_rst = unchanged_index_output(output_top_rst)
+    output_top_rst(mapper)
+    os.utime(tmp_path / "index.rst", ns=(0, 0))
+
+    output_top_rst(mapper)
+    assert (tmp_path / "index.rst").stat().st_mtime_ns == 0
+
+    mapper.index = "machine\nvfs\n"
+    output_top_rst(mapper)
+    assert (tmp_path / "index.rst").stat().st_mtime_ns > 0
+
+
+def test_stub_dependencies(tmp_path: Path):
+    app = fake_app(tmp_path, stubs(tmp_path))
+    app.env.stub_docs_stub_packages = stub_packages(app.env.autoapi_source_files)
+    app.env.stub_docs_autoapi_refs["library/machine"] = {"machine", "machine.Pin"}
+    app.env.stub_docs_autoapi_refs["modules/vfs/index"] = {"vfs.AbstractBlockDev"}
+
+    assert documented_packages(app, "modules/vfs/index") == ["vfs"]
+    assert documented_packages(app, "modules/machine/Pin/index") == ["machine"]
+    assert documented_packages(app, "modules/index") == []
+    assert documented_packages(app, "library/machine") == ["machine"]
+
+    on_source_read(app, "library/machine", [""])
+    assert app.env.dependencies == ["stubs/machine/Pin.pyi", "stubs/machine/__init__.pyi"]
@@ -0,0 +1,184 @@
+"""
+Regression tests for the diff filters: the indexed filters must give exactly the same result
+as the original list based implementations, that are kept here as the reference.
+"""
+
+import contextlib
+import random
+import re
+from typing import List
+
+import pytest
+
+import diff_filters
+from diff_filters import DiffIndex, filter_diff
+
+################################################################################################################
+# Reference implementations
+################################################################################################################
+
+
+def legacy_ignore_assignments(diff_lines):
+    r2 = diff_lines.copy()
+    for l in diff_lines:
+        if l.startswith("+ ") and "=" in l:
+            partial = l.split("=")[0].strip()
+            opposite = f"- {partial[2:]}"
+            if opposite in r2:
+                r2.remove(l)
+                r2.remove(opposite)
+    return r2
+
+
+def legacy_ignore_moves(result):
+    r2 = result.copy()
+    for l in result:
+        opposite = f"- {l[2:]}" if l.startswith("+ ") else f"+ {l[2:]}"
+        if opposite in r2:
+            with contextlib.suppress(ValueError):
+                r2.remove(l)
+            with contextlib.suppress(ValueError):
+                r2.remove(opposite)
+    return r2
+
+
+def legacy_allow_different_parameters(diff_lines: List[str]):
+    r2 = diff_lines.copy()
+    for l in diff_lines:
+        if "(" in l:
+            partial = l.split("(")[0].strip()
+            opposite = f"{opp_change(l)} {partial[2:]}"
+            if opposite in r2:
+                with contextlib.suppress(ValueError):
+                    r2.remove(l)
+                with contextlib.suppress(ValueError):
+                    r2.remove(opposite)
+            elif l2 := first_startswith(r2, f"{opposite}("):
+                with contextlib.suppress(ValueError):
+                    r2.remove(l)
+                with contextlib.suppress(ValueError):
+                    r2.remove(l2)
+
+    return r2
+
+
+def legacy_allow_omit_class_different_parameters(diff_lines: List[str]):
+    r2 = diff_lines.copy()
+    for line in diff_lines:
+        re_drop_class = r"([+-] (\w*? )?)(\w*\.)(.*)"
+        subst_drop_class = "\\g<1>\\g<4>"
+        l_short = re.sub(re_drop_class, subst_drop_class, line)
+
+        opposite = f"{opp_change(l_short)} {l_short[2:]}"
+        oppo2 = opposite.split("(")[0]
+        if opposite in r2:
+            with contextlib.suppress(ValueError):
+                r2.remove(line)
+            with contextlib.suppress(ValueError):
+                r2.remove(opposite)
+        elif oppo2 := first_startswith(r2, f"{oppo2}("):
+            with contextlib.suppress(ValueError):
+                r2.remove(line)
+            with contextlib.suppress(ValueError):
+                r2.remove(oppo2)
+    return r2
+
+
+def first_startswith(diff_lines: List[str], prefix: str):
+    for l in diff_lines:
+        if l.startswith(prefix):
+            return l
+    return None
+
+
+def opp_change(l):
+    return "+" if l[0] == "-" else "-"
+
+
+LEGACY = {
+    "ignore_moves": legacy_ignore_moves,
+    "ignore_assignments": legacy_ignore_assignments,
+    "allow_different_parameters": legacy_allow_different_parameters,
+    "allow_omit_class_different_parameters": legacy_allow_omit_class_different_parameters,
+}
+
+################################################################################################################
+# Corpus
+################################################################################################################
+
+# fragments that trigger the different branches of the filters
+FRAGMENTS = [
+    "foo",
+    "foo()",
+    "foo(a, b)",
+    "foo(a: int, b: int = 2) -> None",
+    "Pin.foo(a)",
+    "Pin.foo()",
+    "class Pin(id, mode=-1)",
+    "class machine.Pin(id)",
+    "Pin",
+    "machine.Pin",
+    "x",
+    "x = 1",
+    "x = 2",
+    "Pin.IN",
+    "Pin.IN = 1",
+    "Methods",
+    "Constants",
+    "",
+    "value(x)",
+    "value(x: Any) -> None",
+    "Pin.value(x)",
+]
+
+
+def random_diff(rng: random.Random, size: int) -> List[str]:
+    return [f"{rng.choice('+-')} {rng.choice(FRAGMENTS)}" for _ in range(size)]
+
+
+CORPUS = [
+    ["+ foo", "- foo", "- foo"],
+    ["+ foo", "- foo", "+ foo", "- bar"],
+    ["+ x = 1", "- x", "+ x = 2", "- x"],
+    ["+ foo(a: int)", "- foo(a)", "- foo(b)", "+ foo"],
+    ["- Pin.foo(a)", "+ foo(a: int)", "+ foo(a: int)", "- foo()"],
+    ["+ class machine.Pin(id)", "- class Pin(id, mode=-1)"],
+] + [random_diff(random.Random(seed), size) for seed, size in enumerate([5, 10, 20, 50, 100] * 40)]
+
+
+@pytest.mark.parametrize("name", sorted(LEGACY))
+def test_filter_matches_legacy(name: str):
+    new_filter = getattr(diff_filters, name)
+    for diff in CORPUS:
+        assert new_filter(diff.copy()) == LEGACY[name](diff.copy()), diff
+
+
+def test_pipeline_matches_legacy():
+    legacy_chain = [
+        diff_filters.ignore_version_notice,
+        diff_filters.ignore_mip_tip,
+        diff_filters.ignore_known_headings,
+        legacy_ignore_moves,
+        legacy_allow_different_parameters,
+        legacy_allow_omit_class_different_parameters,
+        legacy_ignore_assignments,
+        diff_filters.allow_new_data_assignments,
+    ]
+    for diff in CORPUS:
+        expected = diff
+        for legacy_filter in legacy_chain:
+            expected = legacy_filter(expected)
+        assert filter_diff(diff) == expected, diff
+
+
+def test_diff_index():
+    index = DiffIndex(["+ a(1)", "- b", "+ a(2)", "- b"])
+    assert "- b" in index
+    index.remove("- b")
+    index.remove("- c")  # not present, ignored
+    assert "- b" in index
+    assert index.first_call("+ a") == "+ a(1)"
+    index.remove("+ a(1)")
+    assert index.first_call("+ a") == "+ a(2)"
+    assert index.first_call("+ b") is None
+    assert index.to_list() == ["+ a(2)", "- b"]
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from stub_docs import DocstringProcessor, ModuleOrigin
+from stub_docs.docstring_cache import DocstringCache
+
+
+def test_cache_lru_eviction():
+    cache = DocstringCache(max_entries=2)
+    cache.put("a", ["A"])
+    cache.put("b", ["B"])
+    assert cache.get("a") == ["A"]
+    cache.put("c", ["C"])
+
+    # b was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("c") == ["C"]
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 1, 1)
+
+
+def test_cache_key():
+    lines = ["Note: foo", ""]
+    assert DocstringCache.key(lines, "rules") == DocstringCache.key(list(lines), "rules")
+    assert DocstringCache.key(lines, "rules") != DocstringCache.key(lines, "other rules")
+    assert DocstringCache.key(lines, "rules") != DocstringCache.key(["Note: bar", ""], "rules")
+
+
+def test_cache_save_merges(tmp_path: Path):
+    cache_file = tmp_path / "docstrings.json"
+    first = DocstringCache(cache_file)
+    second = DocstringCache(cache_file)
+    first.put("a", ["A"])
+    first.save()
+    second.put("b", ["B"])
+    second.save()
+
+    cache = DocstringCache(cache_file)
+    assert cache.loaded == 2
+    assert cache.get("a") == ["A"]
+    assert cache.get("b") == ["B"]
+
+
+def test_processor_uses_cache():
+    mod = ModuleOrigin(Path("fnmatch/fnmatch.py"), Path("fnmatch/__init__.py"), category="python-stdlib")
+    cache = DocstringCache()
+    processor = DocstringProcessor({"fnmatch": mod}, cache)
+    docstrings = [("fnmatch", ["Note: foo", ""]), ("array", ["Note: foo", ""])]
+    processor.process_docstrings(docstrings)
+    expected = [list(lines) for _, lines in docstrings]
+
+    again = [("fnmatch", ["Note: foo", ""]), ("array", ["Note: foo", ""])]
+    processor.process_docstrings(again)
+
+    assert [lines for _, lines in again] == expected
+    # the micropython-lib module has a different origin, so does not share the result with the stub
+    assert expected[0] != expected[1]
+    assert (cache.hits, cache.misses) == (2, 2)
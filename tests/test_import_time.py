@@ -0,0 +1,57 @@
+"""
+Track the import time of stub_docs with `python -X importtime`.
+
+The docstring processing, module collection and indexes must not load Sphinx, autoapi or Jinja2,
+those are only imported when the extension is set up by Sphinx.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+DOCS_PATH = Path(__file__).parent.parent / "docs"
+HEAVY_PACKAGES = {"astroid", "autoapi", "docutils", "jinja2", "sphinx"}
+# cumulative import time in microseconds, generous to avoid flaky failures on slow machines
+IMPORT_BUDGET = int(os.getenv("STUB_DOCS_IMPORT_BUDGET", 250_000))
+
+
+def import_times(statement: str) -> List[Tuple[int, str, int]]:
+    """The nesting depth, name and cumulative import time in microseconds of each module imported by a statement"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=DOCS_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                depth = (len(name) - len(name.lstrip()) - 1) // 2
+                times.append((depth, name.strip(), int(cumulative)))
+    return times
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import stub_docs",
+        "from stub_docs import DocstringProcessor, RevertEngine",
+        "from stub_docs import ModuleCollector, ModuleOrigin, MetadataIndex",
+        "from stub_docs.name_index import ModuleNameIndex",
+    ],
+)
+def test_no_heavy_imports(statement: str):
+    times = import_times(statement)
+
+    assert sorted(name for _, name, _ in times if name.split(".")[0] in HEAVY_PACKAGES) == []
+    # the modules imported by the statement itself, including everything they import, but not the interpreter start-up
+    total = sum(t for depth, _, t in times if depth == 0) - sum(t for depth, _, t in import_times("pass") if depth == 0)
+    assert total < IMPORT_BUDGET, f"{statement} took {total} us"
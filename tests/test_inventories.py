@@ -0,0 +1,167 @@
+import time
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+
+from stub_docs import inventories
+from stub_docs.inventories import (
+    InventoryStore,
+    inventory_version,
+    mapping_from_conf,
+    on_builder_inited,
+    refresh,
+    unpin,
+)
+
+PYTHON_URI = "https://docs.python.org/3.5"
+
+
+def objects_inv(project: str, version: str, lines) -> bytes:
+    header = (
+        "# Sphinx inventory version 2\n"
+        f"# Project: {project}\n"
+        f"# Version: {version}\n"
+        "# The remainder of this file is compressed using zlib.\n"
+    )
+    return header.encode() + zlib.compress("\n".join(lines).encode() + b"\n")
+
+
+PYTHON_INV = objects_inv("Python", "3.5", ["int py:class 1 library/functions.html#$ -"])
+
+
+def test_store_load(tmp_path: Path):
+    store = InventoryStore(tmp_path / "store", tmp_path / "cache")
+    store.add("python", PYTHON_URI, PYTHON_INV)
+    store.save()
+
+    store = InventoryStore(tmp_path / "store", tmp_path / "cache")
+    assert store.manifest["python"]["version"] == "3.5"
+    invdata = store.load("python", PYTHON_URI)
+    assert invdata["py:class"]["int"][2] == "https://docs.python.org/3.5/library/functions.html#int"
+    # parsed once, then from the pickled cache
+    assert store.load("python", PYTHON_URI) == invdata
+    assert (store.parsed, store.unpickled) == (1, 1)
+    # not for another uri
+    assert store.load("python", "https://docs.python.org/3") is None
+    assert store.load("typing", PYTHON_URI) is None
+
+
+def test_store_cache_of_prefixed_names(tmp_path: Path):
+    store = InventoryStore(tmp_path / "store", tmp_path / "cache")
+    store.add("micropython", PYTHON_URI, PYTHON_INV)
+    store.add("micropython-lib", PYTHON_URI, objects_inv("micropython-lib", "1.0", []))
+    store.load("micropython-lib", PYTHON_URI)
+    store.load("micropython", PYTHON_URI)
+
+    # the cache of micropython-lib is not that of an older micropython inventory
+    assert len(list((tmp_path / "cache").glob("*.pickle"))) == 2
+    store.load("micropython", PYTHON_URI)
+    store.load("micropython-lib", PYTHON_URI)
+    assert (store.parsed, store.unpickled) == (2, 2)
+
+
+def test_store_pinned_sha(tmp_path: Path):
+    store = InventoryStore(tmp_path)
+    store.add("python", PYTHON_URI, PYTHON_INV)
+    store.path("python").write_bytes(objects_inv("Python", "3.12", []))
+
+    assert store.load("python", PYTHON_URI) is None
+
+
+def fake_app(tmp_path: Path, **config):
+    config = SimpleNamespace(
+        intersphinx_mapping={"python": ("python", (PYTHON_URI, (None,)))},
+        intersphinx_cache_limit=5,
+        stub_docs_inventories="intersphinx",
+        stub_docs_inventories_cache_dir="",
+        stub_docs_inventories_offline=False,
+        stub_docs_inventories_max_age=180,
+        **config,
+    )
+    return SimpleNamespace(config=config, env=SimpleNamespace(), srcdir=str(tmp_path), doctreedir=str(tmp_path / "build"))
+
+
+def test_builder_inited_cache_outside_build(tmp_path: Path):
+    store = InventoryStore(tmp_path / "intersphinx")
+    store.add("python", PYTHON_URI, PYTHON_INV)
+    store.save()
+    app = fake_app(tmp_path)
+
+    on_builder_inited(app)
+
+    assert app.env.intersphinx_named_inventory["python"]["py:class"]["int"][0] == "Python"
+    # the parsed inventory survives `make clean`
+    assert list((tmp_path / "intersphinx" / ".cache").glob("python-*.pickle"))
+    assert not (tmp_path / "build").exists()
+
+
+def test_builder_inited_cache_limit(tmp_path: Path):
+    store = InventoryStore(tmp_path / "intersphinx")
+    store.add("python", PYTHON_URI, PYTHON_INV)
+    store.save()
+    app = fake_app(tmp_path)
+    on_builder_inited(app)
+    # expires in the next build
+    assert app.env.intersphinx_cache[PYTHON_URI][1] < time.time() - 4 * 86400
+
+    # a negative limit never expires
+    app.config.intersphinx_cache_limit = -1
+    on_builder_inited(app)
+    assert app.env.intersphinx_cache[PYTHON_URI][1] >= time.time() - 60
+
+
+def test_builder_inited_warns_for_old_inventories(tmp_path: Path, monkeypatch):
+    store = InventoryStore(tmp_path / "intersphinx")
+    store.add("python", PYTHON_URI, PYTHON_INV)
+    store.manifest["python"]["fetched"] = int(time.time()) - 200 * 86400
+    store.save()
+    warnings = []
+    monkeypatch.setattr(inventories.log, "warning", lambda message, **kwargs: warnings.append(message))
+
+    on_builder_inited(fake_app(tmp_path))
+    assert len(warnings) == 1 and "python is 200 days old" in warnings[0]
+
+    # not when it is pinned
+    store.manifest["python"]["pinned"] = True
+    store.save()
+    on_builder_inited(fake_app(tmp_path))
+    assert len(warnings) == 1
+
+
+def test_inventory_version():
+    assert inventory_version(PYTHON_INV) == ("Python", "3.5")
+    assert inventory_version(b"") == ("", "")
+
+
+def test_mapping_from_conf(tmp_path: Path):
+    conf = tmp_path / "conf.py"
+    conf.write_text(
+        'import os\nintersphinx_mapping = {\n    "python": ("https://docs.python.org/3.5", None),\n'
+        '    # "python": ("https://docs.python.org/3", None),\n}\n'
+    )
+    assert mapping_from_conf(conf) == {"python": PYTHON_URI}
+
+
+def test_refresh_skips_pinned(tmp_path: Path, monkeypatch):
+    store = InventoryStore(tmp_path)
+    store.add("python", PYTHON_URI, PYTHON_INV, pinned=True)
+    fetched = []
+    monkeypatch.setattr("stub_docs.inventories.fetch", lambda uri: fetched.append(uri) or PYTHON_INV)
+
+    assert refresh(store, {"python": PYTHON_URI}, []) == 0
+    assert fetched == []
+    assert refresh(store, {"python": PYTHON_URI}, [], force=True) == 0
+    assert fetched == [PYTHON_URI]
+    assert store.manifest["python"]["pinned"]
+
+
+def test_refresh_pin_and_unpin(tmp_path: Path, monkeypatch):
+    store = InventoryStore(tmp_path)
+    monkeypatch.setattr("stub_docs.inventories.fetch", lambda uri: PYTHON_INV)
+
+    assert refresh(store, {"python": PYTHON_URI}, [], pin=True) == 0
+    assert store.manifest["python"]["pinned"]
+    assert unpin(store, ["python"]) == 0
+    assert not InventoryStore(tmp_path).manifest["python"]["pinned"]
+    # not in the store
+    assert unpin(store, ["typing"]) == 1
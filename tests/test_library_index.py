@@ -0,0 +1,60 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from stub_docs import ModuleCollector, ModuleOrigin, generate_library_index, library_index
+from stub_docs.library_index import template_environment
+
+
+@pytest.fixture(autouse=True)
+def jinja_cache(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(library_index, "JINJA_CACHE_PATH", tmp_path / "jinja_cache")
+    template_environment.cache_clear()
+    yield
+    template_environment.cache_clear()
+
+
+def test_generate_library_index(tmp_path: Path):
+    modules = [ModuleOrigin(Path("fnmatch/fnmatch.py"), tmp_path / "micropython-stdlib" / "fnmatch" / "__init__.py")]
+    output_file = tmp_path / "mpy-lib" / "micropython-stdlib.rst"
+
+    assert generate_library_index(modules, "micropython-stdlib", str(output_file))
+    assert "/modules/micropython-stdlib/fnmatch/index" in output_file.read_text(encoding="utf-8")
+    os.utime(output_file, ns=(0, 0))
+
+    # the same content is not written again, so the mtime is kept
+    assert not generate_library_index(modules, "micropython-stdlib", str(output_file))
+    assert output_file.stat().st_mtime_ns == 0
+    modules.append(ModuleOrigin(Path("heapq/heapq.py"), tmp_path / "micropython-stdlib" / "heapq" / "__init__.py"))
+    assert generate_library_index(modules, "micropython-stdlib", str(output_file))
+
+
+def test_library_index_links_packages(tmp_path: Path):
+    lib = tmp_path / "python-stdlib"
+    for path, text in {
+        "fnmatch/fnmatch.py": "def fnmatch(name, pat): ...\n",
+        "collections/manifest.py": 'package("collections")\n',
+        "collections/collections/__init__.py": "",
+    }.items():
+        (lib / path).parent.mkdir(parents=True, exist_ok=True)
+        (lib / path).write_text(text, encoding="utf-8")
+    dest = tmp_path / "micropython-stdlib"
+    modules = ModuleCollector(dest).copy_modules(lib, dest, ext=".py")
+    output_file = tmp_path / "mpy-lib" / "micropython-stdlib.rst"
+
+    # the path of a package is a file, like that of a module
+    assert [m.path for m in modules] == [dest / "collections" / "__init__.py", dest / "fnmatch" / "__init__.py"]
+    generate_library_index(modules, "micropython-stdlib", str(output_file))
+    index = output_file.read_text(encoding="utf-8")
+    assert "/modules/micropython-stdlib/collections/index" in index
+    assert "/modules/micropython-stdlib/fnmatch/index" in index
+
+
+def test_template_environment(tmp_path: Path):
+    env = template_environment()
+
+    assert template_environment() is env
+    env.get_template("mpy-lib_index.rst")
+    # the compiled template is cached on disk
+    assert list((tmp_path / "jinja_cache").iterdir())
@@ -0,0 +1,172 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from stub_docs import ModuleCollector
+from stub_docs.manifest import ManifestCache, ManifestError, ManifestGraph, evaluate_manifest
+
+
+def write(path: Path, text: str = "") -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def lib(tmp_path: Path) -> Path:
+    """a small micropython-lib folder"""
+    lib = tmp_path / "python-stdlib"
+    write(
+        lib / "collections" / "manifest.py",
+        'metadata(version="0.2.0", description="collections module", license="MIT")\npackage("collections")\n',
+    )
+    write(lib / "collections" / "collections" / "__init__.py", '"""collections"""\n')
+    write(
+        lib / "collections-defaultdict" / "manifest.py",
+        'metadata(version="0.3.0")\nrequire("collections")\npackage("collections", files=("defaultdict.py",))\n',
+    )
+    write(lib / "collections-defaultdict" / "collections" / "defaultdict.py", "class defaultdict: ...\n")
+    write(lib / "collections-defaultdict" / "collections" / "test_defaultdict.py", "assert True\n")
+    write(
+        lib / "fnmatch" / "manifest.py",
+        'metadata(version="0.6.0")\nrequire("os-path")\nmodule("fnmatch.py", opt=3)\n',
+    )
+    write(lib / "fnmatch" / "fnmatch.py", "def fnmatch(name, pat): ...\n")
+    write(lib / "fnmatch" / "test_fnmatch.py", "assert True\n")
+    write(lib / "os-path" / "manifest.py", 'include("../os-path-base")\nmodule("os-path.py")\n')
+    write(lib / "os-path" / "os-path.py", "sep = '/'\n")
+    write(lib / "os-path-base" / "manifest.py", 'metadata(author="micropython")\n')
+    # no manifest, only the module with the same name as the folder
+    write(lib / "plain" / "plain.py", "x = 1\n")
+    write(lib / "plain" / "example.py", "x = 2\n")
+    return lib
+
+
+def test_evaluate_manifest(lib: Path):
+    manifest = evaluate_manifest(lib / "collections-defaultdict" / "manifest.py")
+
+    assert manifest.name == "collections-defaultdict"
+    assert manifest.metadata == {"version": "0.3.0"}
+    assert manifest.requires == ["collections"]
+    assert manifest.files == [("collections/defaultdict.py", "collections/defaultdict.py")]
+    assert manifest.modules == ["collections"]
+
+
+def test_evaluate_manifest_include(lib: Path):
+    manifest = evaluate_manifest(lib / "os-path" / "manifest.py")
+
+    assert manifest.metadata == {"author": "micropython"}
+    assert manifest.includes == [(lib / "os-path-base" / "manifest.py").resolve()]
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "import os\n",
+        "open('/etc/passwd')\n",
+        "module('missing.py')\n",
+        "this is not python\n",
+        "().__class__.__base__.__subclasses__()\n",
+        "options.__class__\n",
+        "m = metadata\n",
+        "require(*('os',))\n",
+        "x = 'x'\nfor _ in range(100):\n    x += x\n",
+        # too long
+        "x = 'x'\nfor a in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9):\n    for b in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9):\n        x += x\n",
+    ],
+)
+def test_evaluate_manifest_sandboxed(tmp_path: Path, source: str):
+    with pytest.raises(ManifestError):
+        evaluate_manifest(write(tmp_path / "bad" / "manifest.py", source))
+
+
+def test_evaluate_manifest_options(tmp_path: Path):
+    write(tmp_path / "aioble" / "aioble" / "__init__.py")
+    write(tmp_path / "aioble" / "aioble" / "central.py")
+    write(tmp_path / "aioble" / "aioble" / "server.py")
+    source = """
+# the options and statements of the micropython-lib manifests
+metadata(version="0.4.1", description=f"Bluetooth {'LE'} library")
+_files = ("__init__.py",)
+options.defaults(central=True, server=False)
+if options.central and not options.peripheral:
+    _files += ("central.py",)
+elif options.server:
+    _files += ("server.py",)
+for name in ("aioble-core", "aioble-central"):
+    require(name, unix_ffi=name == "ffi")
+package("aioble", files=_files)
+"""
+    manifest = evaluate_manifest(write(tmp_path / "aioble" / "manifest.py", source))
+
+    assert manifest.metadata == {"version": "0.4.1", "description": "Bluetooth LE library"}
+    assert manifest.files == [("aioble/__init__.py", "aioble/__init__.py"), ("aioble/central.py", "aioble/central.py")]
+    assert manifest.requires == ["aioble-core", "aioble-central"]
+
+
+def test_manifest_cache(lib: Path, tmp_path: Path):
+    manifest_file = lib / "os-path" / "manifest.py"
+    cache = ManifestCache(tmp_path / "cache")
+    cache.load(manifest_file)
+    cache.save()
+
+    cache = ManifestCache(tmp_path / "cache")
+    assert cache.load(manifest_file) == evaluate_manifest(manifest_file)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    # a change in an included manifest invalidates the entry
+    write(lib / "os-path-base" / "manifest.py", 'metadata(author="someone else")\n')
+    os.utime(lib / "os-path-base" / "manifest.py", ns=(0, 0))
+    assert cache.load(manifest_file).metadata == {"author": "someone else"}
+    assert cache.misses == 1
+
+
+def test_manifest_graph(lib: Path):
+    graph = ManifestGraph(evaluate_manifest(p) for p in sorted(lib.glob("*/manifest.py")))
+
+    assert graph.requires("fnmatch") == ["os-path"]
+    assert graph.closure(["collections-defaultdict", "fnmatch"]) == [
+        "collections",
+        "collections-defaultdict",
+        "os-path",
+        "fnmatch",
+    ]
+    assert graph.missing == {}
+
+
+def test_copy_modules_with_manifests(lib: Path, tmp_path: Path):
+    dest = tmp_path / "dest"
+    mc = ModuleCollector(dest)
+
+    result = mc.copy_modules(lib, dest, ext=".py")
+
+    assert [m.name for m in result] == ["collections", "fnmatch", "os-path", "plain"]
+    copied = sorted(p.relative_to(dest).as_posix() for p in dest.rglob("*.py"))
+    assert copied == [
+        "collections/__init__.py",
+        "collections/defaultdict.py",
+        "fnmatch/__init__.py",
+        "os-path/__init__.py",
+        "plain/__init__.py",
+    ]
+    assert (dest / "fnmatch" / "__init__.py").read_text().startswith('"""\nfnmatch for MicroPython."""\n')
+    assert mc.graphs["python-stdlib"].requires("collections-defaultdict") == ["collections"]
+
+
+def test_copy_modules_only(lib: Path, tmp_path: Path):
+    dest = tmp_path / "dest"
+    result = ModuleCollector(dest).copy_modules(lib, dest, ext=".py", only=["fnmatch"])
+
+    # and the packages it requires
+    assert [m.name for m in result] == ["fnmatch", "os-path"]
+
+
+def test_copy_modules_metadata(lib: Path, tmp_path: Path):
+    dest = tmp_path / "dest"
+    result = {m.name: m for m in ModuleCollector(dest).copy_modules(lib, dest, ext=".py")}
+
+    assert (result["collections"].version, result["collections"].license) == ("0.2.0", "MIT")
+    assert result["collections"].description == "collections module"
+    assert result["os-path"].author == "micropython"
+    assert result["plain"].version == ""
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from stub_docs import MetadataIndex, ModuleOrigin
+from stub_docs.metadata_index import docstring_summary
+
+
+def test_docstring_summary(tmp_path: Path):
+    module = tmp_path / "foo.py"
+    module.write_text('# comment\n"""\nFoo module.\n\nMore about foo.\n"""\nx = 1\n')
+    no_docstring = tmp_path / "bar.py"
+    no_docstring.write_text('x = 1\n"""not a docstring"""\n')
+
+    assert docstring_summary(module) == "Foo module."
+    assert docstring_summary(no_docstring) == ""
+    assert docstring_summary(tmp_path / "missing.py") == ""
+
+
+def test_metadata_index(tmp_path: Path):
+    source = tmp_path / "foo.py"
+    source.write_text('"""Foo module."""\n')
+    index_file = tmp_path / "index" / MetadataIndex.FILENAME
+    modules = [
+        ModuleOrigin(source, tmp_path / "foo", category="python-stdlib", version="1.0"),
+        ModuleOrigin(source, tmp_path / "bar", description="From the manifest"),
+    ]
+    modules[1].origin_path = source.with_name("bar.py")
+    modules[1].origin_path.write_text('"""Bar module."""\n')
+
+    index = MetadataIndex(index_file)
+    index.update(modules)
+    index.save()
+
+    assert [m.description for m in modules] == ["Foo module.", "From the manifest"]
+    assert [m.version for m in modules] == ["1.0", ""]
+
+    # unchanged modules are not read again
+    index = MetadataIndex(index_file)
+    mod = ModuleOrigin(source, tmp_path / "foo")
+    index.update([mod])
+    assert index.read == 0
+    assert mod.description == "Foo module."
+    assert "bar" in index and "baz" not in index
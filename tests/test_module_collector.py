@@ -0,0 +1,132 @@
+from pathlib import Path
+
+from stub_docs import CopyManifest, ModuleCollector
+
+
+def make_lib(lib_path: Path, *names: str):
+    for name in names:
+        (lib_path / name).mkdir(parents=True, exist_ok=True)
+        (lib_path / name / f"{name}.py").write_text(f'"""{name} module"""\n\nx = 1\n')
+        # not the module itself, should not be copied
+        (lib_path / name / "test_foo.py").write_text("assert True\n")
+
+
+def test_copy_modules(tmp_path: Path):
+    lib_path = tmp_path / "lib"
+    dest_path = tmp_path / "dest"
+    make_lib(lib_path, "foo", "bar")
+
+    mc = ModuleCollector(dest_path)
+    result = mc.copy_modules(lib_path, dest_path, ext=".py")
+
+    assert sorted(m.name for m in result) == ["bar", "foo"]
+    assert (dest_path / "foo" / "__init__.py").read_text() == '"""foo module"""\n\nx = 1\n'
+    assert not (dest_path / "foo" / "test_foo.py").exists()
+    assert (dest_path / CopyManifest.FILENAME).exists()
+
+
+def test_copy_modules_skips_unchanged(tmp_path: Path):
+    lib_path = tmp_path / "lib"
+    dest_path = tmp_path / "dest"
+    make_lib(lib_path, "foo")
+    mc = ModuleCollector(dest_path)
+    mc.copy_modules(lib_path, dest_path, ext=".py")
+    dest_file = dest_path / "foo" / "__init__.py"
+    mtime = dest_file.stat().st_mtime_ns
+
+    # rewriting the same content changes the mtime, but not the content hash
+    src_file = lib_path / "foo" / "foo.py"
+    src_file.write_text(src_file.read_text())
+    result = mc.copy_modules(lib_path, dest_path, ext=".py")
+
+    assert [m.path for m in result] == [dest_file]
+    assert dest_file.stat().st_mtime_ns == mtime
+
+
+def test_copy_modules_updates_changed(tmp_path: Path):
+    lib_path = tmp_path / "lib"
+    dest_path = tmp_path / "dest"
+    make_lib(lib_path, "foo")
+    mc = ModuleCollector(dest_path)
+    mc.copy_modules(lib_path, dest_path, ext=".py")
+
+    (lib_path / "foo" / "foo.py").write_text('"""foo module"""\n\nx = 22\n')
+    mc.copy_modules(lib_path, dest_path, ext=".py")
+
+    assert (dest_path / "foo" / "__init__.py").read_text() == '"""foo module"""\n\nx = 22\n'
+
+
+def test_copy_manifest_target_and_transform(tmp_path: Path):
+    src_path = tmp_path / "lib" / "foo.py"
+    src_path.parent.mkdir()
+    src_path.write_text("x = 1\n")
+    dest_path = tmp_path / "dest" / "foo" / "__init__.py"
+    ModuleCollector.copy_file(src_path, dest_path, "foo")
+    manifest = CopyManifest(tmp_path / "dest")
+    manifest.record(src_path, dest_path, "foo")
+
+    assert manifest.is_current(src_path, dest_path, "foo")
+    # the same source copied as a file of a package, without the added docstring
+    assert not manifest.is_current(src_path, dest_path)
+    assert not manifest.is_current(src_path, dest_path, "bar")
+
+    # a manifest written before the transform changed
+    manifest.entries["foo/__init__.py"]["transform"] = CopyManifest.TRANSFORM_VERSION - 1
+    assert not manifest.is_current(src_path, dest_path, "foo")
+
+
+def test_copy_modules_prunes_deleted(tmp_path: Path):
+    lib_path = tmp_path / "lib"
+    dest_path = tmp_path / "dest"
+    make_lib(lib_path, "foo", "bar")
+    mc = ModuleCollector(dest_path)
+    mc.copy_modules(lib_path, dest_path, ext=".py")
+
+    (lib_path / "bar" / "bar.py").unlink()
+    result = mc.copy_modules(lib_path, dest_path, ext=".py")
+
+    assert [m.name for m in result] == ["foo"]
+    assert not (dest_path / "bar").exists()
+    assert (dest_path / "foo" / "__init__.py").exists()
+
+
+def test_copy_module_adds_docstring(tmp_path: Path):
+    lib_path = tmp_path / "lib"
+    (lib_path / "foo").mkdir(parents=True)
+    (lib_path / "foo" / "foo.py").write_text("# ünïcode comment\nx = 1\n", encoding="utf-8")
+    (lib_path / "foo" / "empty.py").write_bytes(b"")
+
+    mc = ModuleCollector(tmp_path / "dest")
+    origin = mc.copy_module_to_path(lib_path / "foo" / "foo.py", tmp_path / "dest", ext=".py")
+    empty = mc.copy_module_to_path(lib_path / "foo" / "empty.py", tmp_path / "dest", ext=".py")
+
+    assert origin.path.read_text(encoding="utf-8") == '"""\nfoo for MicroPython."""\n# ünïcode comment\nx = 1\n'
+    assert empty.path.read_text(encoding="utf-8") == '"""\nempty for MicroPython."""\n'
+
+
+def test_find_modules(tmp_path: Path):
+    lib_path = tmp_path / "lib"
+    make_lib(lib_path / "net", "requests", "aiohttp")
+    make_lib(lib_path, "foo")
+    (lib_path / "foo" / "__pycache__").mkdir()
+    (lib_path / "foo" / "__pycache__" / "__pycache__.py").touch()
+
+    modules = ModuleCollector(tmp_path).find_modules(lib_path, ".py")
+
+    assert modules == sorted(p for p in lib_path.rglob("*.py") if p.stem == p.parent.stem and "__pycache__" not in p.parts)
+    assert [p.stem for p in modules] == ["foo", "aiohttp", "requests"]
+
+
+def test_copy_modules_from(tmp_path: Path):
+    make_lib(tmp_path / "micropython", "foo")
+    make_lib(tmp_path / "python-stdlib", "bar", "baz")
+    mc = ModuleCollector(tmp_path / "dest")
+
+    result = mc.copy_modules_from(
+        {tmp_path / "micropython": tmp_path / "dest" / "mpy", tmp_path / "python-stdlib": tmp_path / "dest" / "stdlib"}
+    )
+
+    assert list(result) == [tmp_path / "micropython", tmp_path / "python-stdlib"]
+    assert [m.name for m in result[tmp_path / "python-stdlib"]] == ["bar", "baz"]
+    assert (tmp_path / "dest" / "stdlib" / "baz" / "__init__.py").exists()
+    assert set(mc.timings) == {"micropython", "python-stdlib"}
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+from stub_docs import ModuleOrigin
+from stub_docs.name_index import ModuleNameIndex, module_name
+
+
+def write(path: Path, text: str = "") -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_module_name(tmp_path: Path):
+    write(tmp_path / "pyb" / "__init__.pyi")
+    pin = write(tmp_path / "pyb" / "Pin.pyi")
+
+    assert module_name(pin) == "pyb.Pin"
+    assert module_name(tmp_path / "pyb" / "__init__.pyi") == "pyb"
+
+
+def test_name_index(tmp_path: Path):
+    stubs = tmp_path / "stubs"
+    write(stubs / "heapq" / "__init__.pyi")
+    write(stubs / "machine" / "__init__.pyi")
+    write(stubs / "machine" / "Pin.pyi")
+    lib = tmp_path / "temp" / "micropython-stdlib"
+    write(lib / "__init__.py")
+    heapq = write(lib / "heapq" / "__init__.py")
+    fnmatch = write(lib / "fnmatch" / "__init__.py")
+    # a second copy of the machine stubs
+    write(tmp_path / "other" / "machine" / "__init__.pyi")
+    autoapi_dirs = [stubs / "heapq", stubs / "machine", lib, tmp_path / "other" / "machine"]
+
+    index = ModuleNameIndex.build(
+        autoapi_dirs,
+        {"heapq": ModuleOrigin(Path("heapq.py"), heapq), "fnmatch": ModuleOrigin(Path("fnmatch.py"), fnmatch)},
+    )
+
+    # exact qualified names, the heapq stub is not mistaken for the micropython-lib module
+    assert sorted(index.lib_modules) == ["micropython-stdlib.fnmatch", "micropython-stdlib.heapq"]
+    assert index.lib_module("heapq") is None
+    assert index.clashes == {"heapq": "micropython-stdlib.heapq"}
+    assert index.conflicts == {"machine": [stubs / "machine", tmp_path / "other" / "machine"]}
+    assert index.shadowed() == [tmp_path / "other" / "machine"]
+
+
+def test_name_index_undocumented(tmp_path: Path):
+    write(tmp_path / "stubs" / "heapq" / "__init__.pyi")
+    mods = {
+        "heapq": ModuleOrigin(Path("heapq.py"), tmp_path / "elsewhere" / "heapq" / "__init__.py"),
+        "fnmatch": ModuleOrigin(Path("fnmatch.py"), tmp_path / "elsewhere" / "fnmatch" / "__init__.py"),
+    }
+
+    index = ModuleNameIndex.build([tmp_path / "stubs" / "heapq"], mods)
+
+    assert index.clashes == {"heapq": None}
+    assert list(index.lib_modules) == ["fnmatch"]
@@ -0,0 +1,74 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+import page_compare
+from page_compare import compare_pages
+from page_fetcher import PageFetcher
+
+PAGE = """
+<html><body><div><section><div><div>
+<div class="document">
+<h1>{name} – {title}</h1>
+<dl><dt>{name}.foo(a)</dt><dd>Do foo</dd></dl>
+{extra}
+</div>
+</div></div></section></div></body></html>
+"""
+
+
+@pytest.fixture
+def pages(tmp_path: Path, monkeypatch):
+    """a local build and an offline copy of the web version of two pages"""
+    build_dir = tmp_path / "build"
+    web_dir = tmp_path / "web" / "docs.micropython.org" / "en" / "v1.23.0" / "library"
+    for folder in (build_dir / "library", web_dir):
+        folder.mkdir(parents=True)
+    for name in ("array", "gc"):
+        (build_dir / "library" / f"{name}.html").write_text(
+            PAGE.format(name=name, title="local", extra="<p>Only local</p>"), encoding="utf-8"
+        )
+        (web_dir / f"{name}.html").write_text(
+            PAGE.format(name=name, title="local", extra="<p>Only on the web</p>"), encoding="utf-8"
+        )
+    monkeypatch.setattr(page_compare, "FETCHER", PageFetcher(cache_dir=None, offline_dir=tmp_path / "web"))
+    return build_dir
+
+
+def test_compare_pages(pages: Path, tmp_path: Path):
+    checks_dir = tmp_path / "checks"
+    results = compare_pages(["library/array", "library/gc", "library/missing"], pages, checks_dir=checks_dir, workers=1)
+
+    assert [r.page for r in results] == ["library/array", "library/gc", "library/missing"]
+    assert results[0].missing == ["- Only on the web"]
+    assert results[0].extras == ["+ Only local"]
+    assert "FileNotFoundError" in results[2].error
+    # every page has its own checklist and debug files
+    assert sorted(p.name for p in checks_dir.glob("*.md")) == ["check-library-array.md", "check-library-gc.md"]
+    assert sorted(p.name for p in (checks_dir / "debug").glob("*.txt")) == [
+        "array-local.txt",
+        "array-web.txt",
+        "gc-local.txt",
+        "gc-web.txt",
+    ]
+
+
+@pytest.mark.parametrize("suffix", [".json", ".csv"])
+def test_main_report(pages: Path, tmp_path: Path, suffix: str):
+    report = tmp_path / f"report{suffix}"
+    exit_code = page_compare.main(
+        ["--build", str(pages), "--pages", "library/array", "library/gc", "--report", str(report), "--no-checks", "--workers", "1"]
+    )
+
+    assert exit_code == 0
+    if suffix == ".json":
+        data = json.loads(report.read_text())
+        assert data["version"] == "v1.23.0"
+        assert data["totals"] == {"pages": 2, "errors": 0, "missing": 2, "extras": 2}
+        assert 0 < data["pages"][0]["similarity"] < 1
+    else:
+        rows = list(csv.DictReader(report.open()))
+        assert [r["page"] for r in rows] == ["library/array", "library/gc"]
+        assert rows[0]["missing"] == "1"
@@ -0,0 +1,104 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+import requests
+
+from page_fetcher import PageFetcher
+
+PAGES = {
+    "/en/v1.23.0/library/array.html": "<html><body>array</body></html>",
+    "/en/v1.23.0/library/gc.html": "<html><body>gc</body></html>",
+}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves PAGES with an ETag, and counts the requests"""
+
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path not in PAGES:
+            self.send_error(404)
+            return
+        body = PAGES[self.path].encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StandInHandler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_all(server: str, tmp_path: Path):
+    fetcher = PageFetcher(cache_dir=tmp_path, max_workers=4)
+    urls = [server + path for path in PAGES]
+
+    pages = fetcher.fetch_all(urls + [f"{server}/missing.html"])
+
+    assert pages == {server + path: text for path, text in PAGES.items()}
+    with pytest.raises(requests.HTTPError):
+        fetcher.fetch(f"{server}/missing.html")
+
+
+def test_fetch_revalidates_cache(server: str, tmp_path: Path):
+    url = f"{server}/en/v1.23.0/library/array.html"
+    PageFetcher(cache_dir=tmp_path).fetch(url)
+
+    # a new session revalidates the cached copy
+    assert PageFetcher(cache_dir=tmp_path).fetch(url) == PAGES["/en/v1.23.0/library/array.html"]
+    assert [etag is not None for _, etag in StandInHandler.requests] == [False, True]
+
+
+def test_fetch_without_revalidation(server: str, tmp_path: Path):
+    url = f"{server}/en/v1.23.0/library/array.html"
+    PageFetcher(cache_dir=tmp_path).fetch(url)
+
+    # the page was fetched in this run, a worker uses the cached copy as it is
+    assert PageFetcher(cache_dir=tmp_path, revalidate=False).fetch(url) == PAGES["/en/v1.23.0/library/array.html"]
+    assert len(StandInHandler.requests) == 1
+    # not cached yet
+    PageFetcher(cache_dir=tmp_path, revalidate=False).fetch(f"{server}/en/v1.23.0/library/gc.html")
+    assert len(StandInHandler.requests) == 2
+
+
+def test_fetch_memoized(server: str, tmp_path: Path):
+    fetcher = PageFetcher(cache_dir=tmp_path)
+    url = f"{server}/en/v1.23.0/library/gc.html"
+    fetcher.fetch(url)
+    fetcher.fetch(url)
+    assert len(StandInHandler.requests) == 1
+
+
+def test_fetch_offline(tmp_path: Path):
+    offline = tmp_path / "offline"
+    page = offline / "docs.micropython.org/en/v1.23.0/library/array.html"
+    page.parent.mkdir(parents=True)
+    page.write_text("<html>offline</html>", encoding="utf-8")
+    fetcher = PageFetcher(cache_dir=None, offline_dir=offline)
+
+    assert fetcher.fetch("https://docs.micropython.org/en/v1.23.0/library/array.html") == "<html>offline</html>"
+    with pytest.raises(FileNotFoundError):
+        fetcher.fetch("https://docs.micropython.org/en/v1.23.0/library/gc.html")
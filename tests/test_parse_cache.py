@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+from stub_docs.parse_cache import ParseCache, cached_read_file
+
+
+def test_parse_cache_roundtrip(tmp_path: Path):
+    stub = tmp_path / "foo.pyi"
+    stub.write_text("def foo() -> None: ...\n")
+    cache = ParseCache(tmp_path / "cache")
+
+    key = cache.key(str(stub))
+    assert cache.get(key) is None
+    cache.put(key, {"name": "foo", "children": []})
+
+    assert cache.get(key) == {"name": "foo", "children": []}
+    assert (cache.hits, cache.misses) == (1, 1)
+    # survives a new build
+    assert ParseCache(tmp_path / "cache").get(key) == {"name": "foo", "children": []}
+
+
+def test_parse_cache_key_content(tmp_path: Path):
+    stub = tmp_path / "foo.pyi"
+    stub.write_text("def foo() -> None: ...\n")
+    cache = ParseCache(tmp_path / "cache")
+    key = cache.key(str(stub))
+
+    stub.write_text("def foo() -> int: ...\n")
+    assert cache.key(str(stub)) != key
+    # the package structure determines the module name
+    stub.write_text("def foo() -> None: ...\n")
+    (tmp_path / "__init__.pyi").touch()
+    assert cache.key(str(stub)) != key
+
+
+def test_parse_cache_evicts_lru(tmp_path: Path):
+    cache = ParseCache(tmp_path / "cache", max_size=10_000)
+    data = {"doc": "x" * 3_000}
+    for n, key in enumerate(["a", "b", "c"]):
+        cache.put(key, data)
+        # make sure the last use is ordered
+        os.utime(cache.cache_dir / f"{key}{cache.SUFFIX}", (n, n))
+    cache.get("a")
+
+    cache.put("d", data)
+
+    assert cache.size <= 10_000
+    assert cache.evictions == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == data
+
+
+def test_parse_cache_invalidated_by_bases(tmp_path: Path):
+    """A class inherits the members of its bases, the entry is stale when the package of a base changes"""
+    for path, content in {
+        "machine/Pin.pyi": "class Pin: ...\n",
+        "vfs/__init__.pyi": "class AbstractBlockDev: ...\n",
+        "os/__init__.pyi": "class VfsFat: ...\n",
+    }.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(content)
+    source_files = [(str(tmp_path), str(path)) for path in sorted(tmp_path.rglob("*.pyi"))]
+    parsed = []
+
+    def read_file(mapper, path, **kwargs):
+        parsed.append(Path(path).parent.name)
+        bases = ["vfs.AbstractBlockDev"] if "os" in path else []
+        return {"type": "module", "children": [{"type": "class", "bases": bases, "children": []}]}
+
+    def build():
+        app = SimpleNamespace(
+            env=SimpleNamespace(autoapi_source_files=source_files),
+            stub_docs_parse_cache=ParseCache(tmp_path / "cache"),
+        )
+        mapper = SimpleNamespace(app=app, _use_implicit_namespace=False)
+        parsed.clear()
+        for dir_root, path in source_files:
+            cached_read_file(read_file)(mapper, path, dir_root=dir_root)
+        return sorted(parsed)
+
+    assert build() == ["machine", "os", "vfs"]
+    assert build() == []
+    # the package of the base class changed
+    (tmp_path / "vfs" / "__init__.pyi").write_text("class AbstractBlockDev:\n    def readblocks(self) -> None: ...\n")
+    assert build() == ["os", "vfs"]
+    # another file of the own package changed
+    (tmp_path / "machine" / "Signal.pyi").write_text("class Signal: ...\n")
+    source_files.append((str(tmp_path), str(tmp_path / "machine" / "Signal.pyi")))
+    assert build() == ["machine", "machine"]
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from sphinx.events import EventManager
+
+from stub_docs import DocstringProcessor
+from stub_docs.extension import process_module_docstrings
+from stub_docs.profiling import BuildProfile, instrument_listeners, timed_handler
+
+
+def test_timed_handler():
+    profile = BuildProfile()
+    app = SimpleNamespace(env=SimpleNamespace(stub_docs_profile=profile))
+    calls = []
+
+    def process_docstring(app, what, name, obj, options, lines):
+        calls.append(name)
+        return "result"
+
+    handler = timed_handler("autodoc-process-docstring", process_docstring)
+    assert handler(app, "module", "machine", None, {}, []) == "result"
+    assert handler(app, "class", "machine.Pin", None, {}, []) == "result"
+
+    assert calls == ["machine", "machine.Pin"]
+    [(name, timing)] = profile.handlers.items()
+    assert name.startswith("autodoc-process-docstring: ") and name.endswith("process_docstring")
+    assert timing.count == 2
+    # only modules and packages are timed per module
+    assert list(profile.modules) == ["docstring: machine"]
+
+
+def test_instrument_later_listeners():
+    profile = BuildProfile()
+    app = SimpleNamespace(env=SimpleNamespace(stub_docs_profile=profile))
+    app.events = EventManager(app)
+
+    def early(app, doctree):
+        pass
+
+    def late(app, doctree):
+        pass
+
+    app.events.connect("doctree-read", early, 500)
+    instrument_listeners(app)
+    # connected after config-inited, by an extension that is loaded later
+    app.events.connect("doctree-read", late, 500)
+    instrument_listeners(app)
+    app.events.emit("doctree-read", None)
+
+    assert sorted(name.rsplit(".", 1)[-1] for name in profile.handlers) == ["early", "late"]
+    assert all(timing.count == 1 for timing in profile.handlers.values())
+
+
+def test_batch_docstrings_per_module():
+    profile = BuildProfile()
+    app = SimpleNamespace(env=SimpleNamespace(stub_docs_profile=profile, stub_docs_processor=DocstringProcessor()))
+    objects = [
+        SimpleNamespace(type="package", name="machine", docstring="MicroPython module: machine"),
+        SimpleNamespace(type="module", name="machine.Pin", docstring="Pins."),
+        SimpleNamespace(type="class", name="machine.Pin.Pin", docstring="A pin."),
+    ]
+
+    process_module_docstrings(app, objects)
+
+    # the same rows as autodoc-process-docstring, also when the docstrings are processed in a batch
+    assert sorted(profile.modules) == ["docstring: machine", "docstring: machine.Pin"]
+    assert profile.modules["docstring: machine"].count == 1
+
+
+def test_merge_and_trace():
+    profile, reader = BuildProfile(), BuildProfile()
+    profile.add_phase("read", 100.0, 2.0)
+    reader.add_call(reader.handlers, "doctree-read: foo", "handler", 100.5, 0.5)
+    profile.merge(reader)
+    # merging the same reader twice does not count it twice
+    profile.merge(reader)
+
+    assert profile.handlers["doctree-read: foo"].count == 1
+    summary = profile.summary()
+    assert summary["phases"] == [{"name": "read", "count": 1, "seconds": 2.0}]
+    assert "doctree-read: foo" in profile.summary_table()
+    trace = profile.chrome_trace()["traceEvents"]
+    assert [(e["name"], e["ts"], e["dur"]) for e in trace] == [("read", 0, 2000000), ("doctree-read: foo", 500000, 500000)]
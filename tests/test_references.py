@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+from docutils import nodes
+from sphinx.addnodes import pending_xref
+from sphinx.events import EventManager
+from stub_docs.references import ReferenceAliases, on_missing_reference, on_warn_missing_reference
+
+# the local python objects, by full name
+OBJECTS = {"vfs.AbstractBlockDev", "machine.Pin", "pyb.Pin"}
+
+
+class Domains(dict):
+    def sorted(self):
+        return [self[name] for name in sorted(self)]
+
+
+def python_domain(lookups: list):
+    def resolve_xref(env, fromdocname, builder, typ, target, node, contnode):
+        lookups.append(target)
+        if target in OBJECTS:
+            return nodes.reference("", "", contnode, refuri=f"{target}.html")
+        return None
+
+    def resolve_any_xref(env, fromdocname, builder, target, node, contnode):
+        reference = resolve_xref(env, fromdocname, builder, "class", target, node, contnode)
+        return [("py:class", reference)] if reference is not None else []
+
+    return SimpleNamespace(name="py", resolve_xref=resolve_xref, resolve_any_xref=resolve_any_xref)
+
+
+def fake_app(lookups: list):
+    domains = Domains(py=python_domain(lookups))
+    env = SimpleNamespace(domains=domains, get_domain=domains.__getitem__)
+    aliases = {"_typeshed.Incomplete": "", "AbstractBlockDev": "vfs.AbstractBlockDev", "Stream": "io.Stream"}
+    return SimpleNamespace(builder=None, stub_docs_references=ReferenceAliases(aliases)), env
+
+
+def xref(target: str, reftype: str = "class", **attributes) -> pending_xref:
+    attributes = {"refdomain": "py", "refdoc": "library/machine", **attributes}
+    return pending_xref("", reftype=reftype, reftarget=target, **attributes)
+
+
+def test_dropped_and_aliased():
+    lookups = []
+    app, env = fake_app(lookups)
+
+    contnode = nodes.literal("Incomplete", "Incomplete")
+    assert on_missing_reference(app, env, xref("_typeshed.Incomplete"), contnode) is contnode
+    reference = on_missing_reference(app, env, xref("AbstractBlockDev"), nodes.literal("x", "x"))
+    assert reference["refuri"] == "vfs.AbstractBlockDev.html"
+    reference = on_missing_reference(app, env, xref("AbstractBlockDev", "any", refdomain=""), nodes.literal("x", "x"))
+    assert reference["refuri"] == "vfs.AbstractBlockDev.html"
+    # not aliased, left to intersphinx, and not resolved by the unqualified name
+    assert on_missing_reference(app, env, xref("Pin"), nodes.literal("Pin", "Pin")) is None
+    assert lookups == ["vfs.AbstractBlockDev", "vfs.AbstractBlockDev"]
+
+
+def test_alias_forwarded_to_intersphinx():
+    lookups = []
+    app, env = fake_app(lookups)
+
+    for _ in range(3):
+        node = xref("Stream")
+        assert on_missing_reference(app, env, node, nodes.literal("Stream", "Stream")) is None
+        # intersphinx looks up the target of the alias
+        assert node["reftarget"] == "io.Stream"
+
+    # the domains are only asked once
+    assert lookups == ["io.Stream"]
+    assert app.stub_docs_references.cache_hits == 2
+    assert app.stub_docs_references.counts == {"forwarded": 3}
+
+
+def test_warn_missing_reference():
+    app, env = fake_app([])
+
+    # no warning for a missing `any` reference
+    assert on_warn_missing_reference(app, None, xref("stream", "any", refdomain=""))
+    assert on_warn_missing_reference(app, None, xref("stream")) is None
+    assert on_warn_missing_reference(app, None, xref("Pin")) is None
+
+    assert app.stub_docs_references.most_unresolved() == [("stream", 2), ("Pin", 1)]
+
+
+def test_intersphinx_resolves_the_rest():
+    app, env = fake_app([])
+    app.events = EventManager(app)
+    forwarded = []
+
+    def intersphinx(app, env, node, contnode):
+        forwarded.append(node["reftarget"])
+        return nodes.reference("", "", contnode, refuri="https://docs.python.org/3/library/io.html")
+
+    app.events.connect("missing-reference", intersphinx, priority=500)
+    app.events.connect("missing-reference", on_missing_reference, priority=400)
+
+    for target in ("Stream", "bytes"):
+        reference = app.events.emit_firstresult("missing-reference", env, xref(target), nodes.literal(target, target))
+        assert reference["refuri"].startswith("https://docs.python.org/")
+    assert forwarded == ["io.Stream", "bytes"]
+
+    contnode = nodes.literal("Incomplete", "Incomplete")
+    assert app.events.emit_firstresult("missing-reference", env, xref("_typeshed.Incomplete"), contnode) is contnode
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+import pytest
+from stub_docs import RevertEngine, RevertRule, load_rules
+from stub_docs.revert_rules import RevertRuleError, default_rules
+
+
+def test_default_rules():
+    names = [rule.name for rule in default_rules()]
+    assert names[0] == "micropython-module"
+    assert "note" in names
+
+
+def test_load_rules_override(tmp_path: Path):
+    rule_file = tmp_path / "extra.toml"
+    rule_file.write_text(
+        """
+[[rules]]
+name = "note"
+pattern = 'Note: '
+replace = '.. warning:: '
+
+[[rules]]
+name = "admonition"
+enabled = false
+
+[[rules]]
+pattern = 'Warning: '
+replace = '.. warning:: '
+"""
+    )
+    rules = load_rules(rule_file, rules=default_rules())
+    names = [rule.name for rule in rules]
+
+    # an overridden rule keeps its position
+    assert names.index("note") == [rule.name for rule in default_rules()].index("note")
+    assert "admonition" not in names
+    assert names[-1] == "extra-3"
+    lines = ["Note: foo", "Warning: bar", "Admonition: baz"]
+    RevertEngine(rules).apply(lines)
+    assert lines == [".. warning:: foo", ".. warning:: bar", "Admonition: baz"]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "[[rules]\n",
+        "[[rules]]\nname = 'x'\npattern = '(unbalanced'\n",
+        "[[rules]]\nname = 'x'\npattern = 'x'\nunknown = 1\n",
+    ],
+)
+def test_load_rules_error(tmp_path: Path, content: str):
+    rule_file = tmp_path / "bad.toml"
+    rule_file.write_text(content)
+    with pytest.raises(RevertRuleError):
+        load_rules(rule_file)
+
+
+def test_engine_dispatch():
+    engine = RevertEngine(
+        [
+            RevertRule("header", "^Header:", remove=True, once=True),
+            RevertRule("ab", "ab", "X"),
+            RevertRule("bc", "bc", "Y"),
+            # introduced by an earlier rule
+            RevertRule("chain", "XY", "Z"),
+            RevertRule("digits", r"\d+", "#"),
+        ]
+    )
+    lines = ["Header: foo", "", "abc", "Header: again", "abcabc 12", "nothing"]
+    engine.apply(lines)
+
+    assert lines == ["Xc", "Header: again", "XcXc #", "nothing"]
+    assert dict((stat["name"], stat["hits"]) for stat in engine.stats()) == {
+        "header": 1,
+        "ab": 2,
+        "bc": 0,
+        "chain": 0,
+        "digits": 1,
+    }
+    assert engine.lines == 6
+
+
+def test_engine_overlapping_literals():
+    engine = RevertEngine([("bc", "Y"), ("ab", "X"), ("b", "-")])
+    lines = ["abc"]
+    engine.apply(lines)
+    assert lines == ["aY"]
+
+
+def test_engine_chained_rules():
+    engine = RevertEngine([("foo", "bar"), ("bar", "baz")])
+    lines = ["foo"]
+    engine.apply(lines)
+    assert lines == ["baz"]
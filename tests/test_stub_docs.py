@@ -1,6 +1,9 @@
+import re
+from pathlib import Path
 from typing import List
 import pytest
-from stub_docs import DocstringProcessor
+from stub_docs import DocstringProcessor, ModuleOrigin, RevertEngine
+from stub_docs.revert_rules import default_rules
 
 
 @pytest.mark.parametrize(
@@ -45,3 +48,85 @@ def test_process_docstring(what, lines, expected):
 
     processor.process_docstring(app, what, name, obj, options, lines)
     assert lines == expected
+
+
+@pytest.mark.parametrize(
+    "lines, expected",
+    [
+        (["Note: foo"], [".. note:: foo"]),
+        (["``Note:`` foo"], [".. note:: foo"]),
+        (["Admonition: foo"], [".. admonition:: foo"]),
+        (["#### Need placeholder ####FOO"], [".. data:: FOO"]),
+        (["foo", "  Note: bar", "baz"], ["foo", "  .. note:: bar", "baz"]),
+    ],
+)
+def test_revert_stubber_mods_literals(lines: List[str], expected: List[str]):
+    processor = DocstringProcessor()
+    processor.revert_stubber_mods(lines)
+    assert lines == expected
+
+
+@pytest.mark.parametrize(
+    "pattern, literal",
+    [
+        ("Note: ", "Note: "),
+        (r"CPython module: *([:\w`]+).*", "CPython module:"),
+        (r"foo\.bar", "foo"),
+        ("^foo", "foo"),
+        ("foo|bar", ""),
+    ],
+)
+def test_revert_engine_literal_prefix(pattern: str, literal: str):
+    assert RevertEngine.literal_prefix(pattern) == literal
+
+
+def test_revert_engine_matches_re_sub():
+    reverts = [(rule.pattern, rule.replace) for rule in default_rules() if not rule.remove]
+    reverts += [("foo|bar", "baz"), (r"(\d+) items", r"\1 things")]
+    lines = ["foo 12 items", "bar", "Note: bar", "CPython module: `x` trailer", "nothing here"]
+    expected = lines.copy()
+    for i, line in enumerate(expected):
+        for old, new in reverts:
+            expected[i] = re.sub(old, new, expected[i])
+
+    RevertEngine(reverts).apply(lines)
+    assert lines == expected
+
+
+def test_add_micropython_lib_note():
+    mod = ModuleOrigin(
+        Path("fnmatch/fnmatch.py"),
+        Path("fnmatch/__init__.py"),
+        category="python-stdlib",
+        repo="https://github.com/micropython/micropython-lib/tree/master/python-stdlib/fnmatch/fnmatch.py",
+        version="0.6.0",
+        license="MIT",
+    )
+    processor = DocstringProcessor({"fnmatch": mod})
+    lines = ["Unix filename pattern matching."]
+    processor.add_micropython_lib_note(lines, "fnmatch")
+    processor.add_micropython_lib_note(lines, "not_from_micropython_lib")
+
+    assert lines[1:4] == ["", ".. tip::", "    This is a `python-stdlib` module from the ``micropython-lib`` repository."]
+    assert "        mpremote mip install fnmatch" in lines
+    assert lines[-1] == "    Version 0.6.0, License MIT"
+
+
+def test_process_docstrings():
+    mod = ModuleOrigin(Path("fnmatch/fnmatch.py"), Path("fnmatch/__init__.py"), category="python-stdlib")
+    processor = DocstringProcessor({"fnmatch": mod})
+    docstrings = [
+        ("machine", ["MicroPython module: https://docs.micropython.org/en/v1.21.0/library/machine.html", "", "Note: foo", ""]),
+        ("fnmatch", ["Unix filename pattern matching.", ""]),
+        ("array", ["Nothing to change.", ""]),
+        ("sys", ["MicroPython module: https://docs.micropython.org/en/v1.21.0/library/sys.html", "a", "b", "c", ""]),
+    ]
+
+    changed = processor.process_docstrings(docstrings)
+
+    assert docstrings[0][1] == [".. note:: foo", ""]
+    assert "        mpremote mip install fnmatch" in docstrings[1][1]
+    assert docstrings[2][1] == ["Nothing to change.", ""]
+    assert docstrings[3][1] == ["a", "b", "c", ""]
+    # 2 lines removed and 1 changed, the 8 lines of the tip added, and 1 line removed, not the lines that moved up
+    assert changed == 3 + 8 + 1